@@ -0,0 +1,401 @@
+from Database import connect
+import logging
+
+logger = logging.getLogger(__name__)
+
+SALARY_BAND_WIDTH = 25000
+
+
+def salary_number(column):
+    """
+    SQL expression converting a scraped salary column ("120K", "1M", "85000") into dollars, NULL if it doesn't parse
+    """
+    return (f"CASE WHEN {column} REGEXP '^[0-9]+[Kk]$' THEN CAST(LEFT({column}, CHAR_LENGTH({column}) - 1) "
+            f"AS UNSIGNED) * 1000 "
+            f"WHEN {column} REGEXP '^[0-9]+[Mm]$' THEN CAST(LEFT({column}, CHAR_LENGTH({column}) - 1) "
+            f"AS UNSIGNED) * 1000000 "
+            f"WHEN {column} REGEXP '^[0-9]+$' THEN CAST({column} AS UNSIGNED) END")
+
+
+# Numeric salaries, computed by mySQL out of the scraped texts, so they can be indexed and compared
+GENERATED_COLUMNS = {('Job_post', 'Min_Salary_num'): f"INT UNSIGNED AS ({salary_number('Min_Salary')}) STORED",
+                     ('Job_post', 'Max_Salary_num'): f"INT UNSIGNED AS ({salary_number('Max_Salary')}) STORED"}
+
+# Secondary indexes (InnoDB appends the primary key to them), covering the analytics queries and the summaries
+# refresh: Company_name and (City, State) are already indexed by their unique keys
+INDEXES = {('Company', 'idx_company_industry'): "(Industry, idCompany)",
+           ('Company', 'idx_company_size'): "(Size, idCompany)",
+           ('Ratings', 'idx_ratings_company_overall'): "(idCompany, Overall)",
+           ('Job_location', 'idx_location_state'): "(State, City)",
+           ('Job_post', 'idx_job_post_company_salary'): "(idCompany, Min_Salary_num, Max_Salary_num)",
+           ('Job_post', 'idx_job_post_salary'): "(Min_Salary_num, Max_Salary_num)",
+           ('Job_post_location', 'idx_post_location_location'): "(idJob_location, idJob_post)"}
+
+
+class Summary:
+    """
+    A summary table, maintained at load time: after a load, only its keys touched by the new job posts
+    are computed again (deleted and re-inserted, in the loader's transaction)
+    """
+
+    def __init__(self, table, ddl, summary_key, source_key, affected_query, insert_columns, select_query, params=()):
+        """
+        :param table - str - The summary table name
+        :param ddl - str - mySQL command creating the table
+        :param summary_key - str - The key column of the summary table
+        :param source_key - str - The column the key is computed from, in select_query (NULL is stored as '')
+        :param affected_query - str - Query of the keys touched by the job posts newer than a given id
+        :param insert_columns - str - The summary table columns select_query fills
+        :param select_query - str - Aggregate query computing the summary rows, filtered by a {where} condition
+        :param params - tuple - Parameters of select_query, before the ones of the {where} condition
+        """
+        self.table = table
+        self.ddl = ddl
+        self.summary_key = summary_key
+        self.source_key = source_key
+        self.affected_query = affected_query
+        self.insert_columns = insert_columns
+        self.select_query = select_query
+        self.params = tuple(params)
+
+    def affected_keys(self, cursor, since_job_post):
+        """
+        The source keys of the job posts newer than since_job_post (None included)
+        """
+        cursor.execute(self.affected_query, (since_job_post,))
+        return {key for key, in cursor.fetchall()}
+
+    def source_query(self, keys=None):
+        """
+        The aggregate query and its parameters, computing the summary rows of the given keys (all if None)
+        """
+        if keys is None:
+            return self.select_query.format(where="TRUE"), self.params
+
+        keys = list(keys)
+        values = [key for key in keys if key is not None]
+        conditions = [f"{self.source_key} IN ({', '.join(['%s'] * len(values))})"] if values else []
+        if len(values) < len(keys):
+            conditions.append(f"{self.source_key} IS NULL")
+
+        return self.select_query.format(where=f"({' OR '.join(conditions)})"), self.params + tuple(values)
+
+    def refresh(self, cursor, since_job_post=0):
+        """
+        Compute again the summary rows touched by the job posts newer than since_job_post (all if 0).
+        Returns the amount of keys refreshed
+        """
+        keys = self.affected_keys(cursor, since_job_post) if since_job_post else None
+        if keys is not None and not keys:
+            return 0
+
+        if keys is None:
+            cursor.execute(f"DELETE FROM {self.table}")
+        else:
+            stored_keys = list({'' if key is None else key for key in keys})
+            cursor.execute(f"DELETE FROM {self.table} WHERE {self.summary_key} IN "
+                           f"({', '.join(['%s'] * len(stored_keys))})", stored_keys)
+
+        select_query, params = self.source_query(keys)
+        cursor.execute(f"INSERT INTO {self.table} ({self.insert_columns}) {select_query}", params)
+
+        return len(keys) if keys is not None else cursor.rowcount
+
+
+SUMMARIES = [Summary('Industry_jobs',
+                     '''CREATE TABLE IF NOT EXISTS Industry_jobs(
+                                                   Industry VARCHAR(50) NOT NULL PRIMARY KEY,
+                                                   Jobs INT NOT NULL,
+                                                   Companies INT NOT NULL,
+                                                   Avg_Min_Salary FLOAT,
+                                                   Avg_Max_Salary FLOAT)''',
+                     summary_key='Industry',
+                     source_key='c.Industry',
+                     affected_query='''SELECT DISTINCT c.Industry
+                                       FROM Job_post jp JOIN Company c ON c.idCompany = jp.idCompany
+                                       WHERE jp.idJob_post > %s''',
+                     insert_columns='Industry, Jobs, Companies, Avg_Min_Salary, Avg_Max_Salary',
+                     select_query='''SELECT COALESCE(c.Industry, ''), COUNT(*), COUNT(DISTINCT c.idCompany),
+                                            AVG(jp.Min_Salary_num), AVG(jp.Max_Salary_num)
+                                     FROM Company c JOIN Job_post jp ON jp.idCompany = c.idCompany
+                                     WHERE {where}
+                                     GROUP BY COALESCE(c.Industry, '')'''),
+             Summary('Size_ratings',
+                     '''CREATE TABLE IF NOT EXISTS Size_ratings(
+                                                   Size VARCHAR(45) NOT NULL PRIMARY KEY,
+                                                   Companies INT NOT NULL,
+                                                   Rated_Companies INT NOT NULL,
+                                                   Avg_Overall FLOAT)''',
+                     summary_key='Size',
+                     source_key='c.Size',
+                     affected_query='''SELECT DISTINCT c.Size
+                                       FROM Job_post jp JOIN Company c ON c.idCompany = jp.idCompany
+                                       WHERE jp.idJob_post > %s''',
+                     insert_columns='Size, Companies, Rated_Companies, Avg_Overall',
+                     select_query='''SELECT COALESCE(c.Size, ''), COUNT(*), COUNT(r.Overall), AVG(r.Overall)
+                                     FROM Company c LEFT JOIN Ratings r ON r.idCompany = c.idCompany
+                                     WHERE {where}
+                                     GROUP BY COALESCE(c.Size, '')'''),
+             Summary('City_salary_bands',
+                     '''CREATE TABLE IF NOT EXISTS City_salary_bands(
+                                                   idJob_location INT NOT NULL,
+                                                   City VARCHAR(45) NOT NULL,
+                                                   State VARCHAR(10) NOT NULL,
+                                                   Band_Start INT UNSIGNED NOT NULL,
+                                                   Jobs INT NOT NULL,
+                                                   PRIMARY KEY (idJob_location, Band_Start),
+                                                   KEY (State, City))''',
+                     summary_key='idJob_location',
+                     source_key='l.idJob_location',
+                     affected_query='''SELECT DISTINCT idJob_location
+                                       FROM Job_post_location
+                                       WHERE idJob_post > %s''',
+                     insert_columns='idJob_location, City, State, Band_Start, Jobs',
+                     # The band of a job post is the one of its salary range midpoint
+                     select_query='''SELECT l.idJob_location, l.City, l.State,
+                                            FLOOR((jp.Min_Salary_num + jp.Max_Salary_num) / 2 / %s) * %s AS Band,
+                                            COUNT(*)
+                                     FROM Job_location l
+                                     JOIN Job_post_location jpl ON jpl.idJob_location = l.idJob_location
+                                     JOIN Job_post jp ON jp.idJob_post = jpl.idJob_post
+                                     WHERE {where} AND jp.Min_Salary_num IS NOT NULL
+                                           AND jp.Max_Salary_num IS NOT NULL
+                                     GROUP BY l.idJob_location, Band''',
+                     params=(SALARY_BAND_WIDTH, SALARY_BAND_WIDTH))]
+
+
+@connect
+def create_analytics_schema(my_db, cursor, db_name):
+    """
+    Add the generated salary columns, the secondary indexes and the summary tables missing from the database
+    (all of them for a new one). Summary tables created over already stored job posts are built from scratch
+    """
+    cursor.execute(f"USE {db_name}")
+
+    cursor.execute("SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s",
+                   (db_name,))
+    columns = {(table.lower(), column.lower()) for table, column in cursor.fetchall()}
+    for (table_name, column_name), definition in GENERATED_COLUMNS.items():
+        if (table_name.lower(), column_name.lower()) not in columns:
+            logger.info(f"Adding the generated column {table_name}.{column_name}")
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+
+    cursor.execute("SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS "
+                   "WHERE TABLE_SCHEMA = %s", (db_name,))
+    indexes = {(table.lower(), index.lower()) for table, index in cursor.fetchall()}
+    for (table_name, index_name), index_columns in INDEXES.items():
+        if (table_name.lower(), index_name.lower()) not in indexes:
+            logger.info(f"Creating the index {index_name} on {table_name}{index_columns}")
+            cursor.execute(f"CREATE INDEX {index_name} ON {table_name} {index_columns}")
+
+    tables = {table.lower() for table, column in columns}
+    for summary in SUMMARIES:
+        if summary.table.lower() in tables:
+            continue
+        logger.info(f"Creating the {summary.table} summary table")
+        cursor.execute(summary.ddl)
+        summary.refresh(cursor)
+
+    my_db.commit()
+    logger.info("Analytics schema is up to date")
+
+
+def last_job_post(cursor):
+    """
+    The id of the last job post stored, 0 if none
+    """
+    cursor.execute("SELECT COALESCE(MAX(idJob_post), 0) FROM Job_post")
+    return cursor.fetchone()[0]
+
+
+def refresh_summaries(cursor, since_job_post=0):
+    """
+    Bring the summary tables up to date with the job posts newer than since_job_post (rebuild them if 0),
+    in the current transaction.
+    Being called by the loaders, at the end of every load
+    """
+    for summary in SUMMARIES:
+        refreshed = summary.refresh(cursor, since_job_post)
+        logger.info(f"Refreshed {refreshed} {summary.table} rows")
+
+
+@connect
+def missing_summaries(my_db, cursor, db_name):
+    """
+    The summary tables missing from the database (all of them if the database doesn't exist yet)
+    """
+    cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s", (db_name,))
+    tables = {table.lower() for table, in cursor.fetchall()}
+
+    return [summary.table for summary in SUMMARIES if summary.table.lower() not in tables]
+
+
+@connect
+def rebuild_summaries(my_db, cursor, db_name):
+    """
+    Build all the summary tables from scratch
+    """
+    cursor.execute(f"USE {db_name}")
+    refresh_summaries(cursor)
+    my_db.commit()
+
+
+def _fetch_records(cursor):
+    """
+    The rows of the last query, as dicts of column name to value
+    """
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+JOBS_PER_INDUSTRY_QUERY = '''SELECT Industry, Jobs, Companies, Avg_Min_Salary, Avg_Max_Salary
+                             FROM Industry_jobs
+                             ORDER BY Jobs DESC'''
+
+RATINGS_PER_SIZE_QUERY = '''SELECT Size, Companies, Rated_Companies, Avg_Overall
+                            FROM Size_ratings
+                            ORDER BY Avg_Overall DESC'''
+
+SALARY_BANDS_QUERY = '''SELECT City, State, Band_Start, Jobs
+                        FROM City_salary_bands
+                        WHERE {where}
+                        ORDER BY State, City, Band_Start'''
+
+INDUSTRY_COMPANIES_QUERY = '''SELECT c.Company_name, c.Size, r.Overall
+                              FROM Company c LEFT JOIN Ratings r ON r.idCompany = c.idCompany
+                              WHERE c.Industry = %s
+                              ORDER BY c.Company_name'''
+
+SALARY_RANGE_QUERY = '''SELECT jp.idJob_post, jp.Job_Title, c.Company_name, jp.Min_Salary_num, jp.Max_Salary_num
+                        FROM Job_post jp JOIN Company c ON c.idCompany = jp.idCompany
+                        WHERE jp.Min_Salary_num >= %s AND jp.Max_Salary_num <= %s
+                        ORDER BY jp.Min_Salary_num'''
+
+
+def _salary_bands_query(city=None, state=None):
+    conditions, params = [], []
+    if state is not None:
+        conditions.append("State = %s")
+        params.append(state)
+    if city is not None:
+        conditions.append("City = %s")
+        params.append(city)
+
+    return SALARY_BANDS_QUERY.format(where=' AND '.join(conditions) or 'TRUE'), tuple(params)
+
+
+@connect
+def jobs_per_industry(my_db, cursor, db_name, limit=None):
+    """
+    Amount of job posts and companies, and average salary range, per industry (most job posts first)
+    :param limit - int - Amount of industries to return, all if None
+    """
+    cursor.execute(f"USE {db_name}")
+    cursor.execute(JOBS_PER_INDUSTRY_QUERY + (f" LIMIT {int(limit)}" if limit else ""))
+    return _fetch_records(cursor)
+
+
+@connect
+def ratings_per_size(my_db, cursor, db_name):
+    """
+    Amount of companies (rated ones apart) and average overall rating, per company size
+    """
+    cursor.execute(f"USE {db_name}")
+    cursor.execute(RATINGS_PER_SIZE_QUERY)
+    return _fetch_records(cursor)
+
+
+@connect
+def salary_bands(my_db, cursor, db_name, city=None, state=None):
+    """
+    Amount of job posts per salary band (SALARY_BAND_WIDTH dollars wide, by salary range midpoint) per city
+    :param city - str - Only the bands of this city, all the cities if None
+    :param state - str - Only the bands of this state's cities, all the states if None
+    """
+    cursor.execute(f"USE {db_name}")
+    cursor.execute(*_salary_bands_query(city, state))
+    return _fetch_records(cursor)
+
+
+@connect
+def companies_in_industry(my_db, cursor, db_name, industry):
+    """
+    The companies of an industry, with their size and overall rating
+    """
+    cursor.execute(f"USE {db_name}")
+    cursor.execute(INDUSTRY_COMPANIES_QUERY, (industry,))
+    return _fetch_records(cursor)
+
+
+@connect
+def jobs_in_salary_range(my_db, cursor, db_name, min_salary, max_salary):
+    """
+    The job posts whose whole salary range is within min_salary and max_salary (dollars)
+    """
+    cursor.execute(f"USE {db_name}")
+    cursor.execute(SALARY_RANGE_QUERY, (min_salary, max_salary))
+    return _fetch_records(cursor)
+
+
+def plan_queries(cursor):
+    """
+    The queries whose plans are checked: the query API ones and the aggregates of the summaries refresh,
+    with parameters taken from the stored data
+    """
+    cursor.execute("SELECT Industry, Size FROM Company WHERE Industry IS NOT NULL LIMIT 1")
+    industry, size = cursor.fetchone() or ('', '')
+    cursor.execute("SELECT idJob_location, City, State FROM Job_location LIMIT 1")
+    id_location, city, state = cursor.fetchone() or (0, '', '')
+
+    queries = {'jobs_per_industry': (JOBS_PER_INDUSTRY_QUERY, ()),
+               'ratings_per_size': (RATINGS_PER_SIZE_QUERY, ()),
+               'salary_bands': _salary_bands_query(city, state),
+               'companies_in_industry': (INDUSTRY_COMPANIES_QUERY, (industry,)),
+               'jobs_in_salary_range': (SALARY_RANGE_QUERY, (100000, 150000))}
+    for summary, key in zip(SUMMARIES, (industry, size, id_location)):
+        queries[f"refresh {summary.table}"] = summary.source_query([key])
+
+    return queries
+
+
+def explain(cursor, query, params=()):
+    """
+    The plan of a query (EXPLAIN), a dict per table access
+    """
+    cursor.execute(f"EXPLAIN {query}", params)
+    return _fetch_records(cursor)
+
+
+@connect
+def check_query_plans(my_db, cursor, db_name):
+    """
+    EXPLAIN the analytics queries and report the plan regressions: full scans (access type ALL) and
+    joins without an index, of every table but the (small) summary tables.
+    Meaningful over a loaded database only - over a few rows, mySQL rightly prefers full scans.
+    Returns a dict of query name to the regressions found (empty lists if none)
+    """
+    cursor.execute(f"USE {db_name}")
+    summary_tables = {summary.table.lower() for summary in SUMMARIES}
+
+    regressions = {}
+    for name, (query, params) in plan_queries(cursor).items():
+        problems = []
+        for access in explain(cursor, query, params):
+            table = access.get('table') or ''
+            if table.lower() in summary_tables or table.startswith('<'):
+                continue
+            extra = access.get('Extra') or ''
+            if access.get('type') == 'ALL':
+                problems.append(f"full scan of {table} ({access.get('rows')} rows)")
+            elif access.get('type') is not None and access.get('key') is None:
+                problems.append(f"no index used on {table}")
+            if 'join buffer' in extra.lower():
+                problems.append(f"join without an index on {table}: {extra}")
+        regressions[name] = problems
+
+        if problems:
+            logger.warning(f"Query plan regression in {name}: {'; '.join(problems)}")
+        else:
+            logger.info(f"Query plan of {name} uses the indexes")
+
+    return regressions
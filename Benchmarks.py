@@ -0,0 +1,468 @@
+from bs4 import BeautifulSoup
+import argparse
+import logging
+import tracemalloc
+import subprocess
+import datetime
+import tempfile
+import threading
+import random
+import json
+import time
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+
+PARSERS = ['html.parser', 'lxml']
+IMPORT_COMMANDS = {'Gg_scrap -h': ['Gg_scrap.py', '-h'],
+                   'GlassdoorScraper -h': ['GlassdoorScraper.py', '-h']}
+DEFAULT_IMPORT_BUDGET = 250
+DEFAULT_IMPORT_TIMES_PATH = "import_times.jsonl"
+DETAIL_PANE_ID = "JDCol"
+COMPANY_SIZES = ["1 to 50 Employees", "51 to 200 Employees", "201 to 500 Employees", "1001 to 5000 Employees",
+                 "10000+ Employees"]
+
+
+def time_it(func, repeat):
+    """
+    Execute func repeat times and return the average execution time in milliseconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def available_parsers():
+    """
+    Return the BeautifulSoup parser backends installed in the current environment
+    """
+    parsers = []
+    for parser in PARSERS:
+        try:
+            BeautifulSoup("<html></html>", parser)
+        except Exception:
+            continue
+        parsers.append(parser)
+
+    return parsers
+
+
+def bench_parsing(html_files, repeat):
+    """
+    Compare parsing a whole saved page against parsing only its job-detail pane (as returned by
+    the element's outerHTML), for every available parser backend
+    """
+    for html_file in html_files:
+        with open(html_file, encoding='utf8') as f:
+            page_source = f.read()
+
+        pane = BeautifulSoup(page_source, "html.parser").find(id=DETAIL_PANE_ID)
+        pane_source = str(pane) if pane else None
+
+        print(f"{html_file} ({len(page_source) / 1024:.0f} KB)")
+        for parser in available_parsers():
+            full_ms = time_it(lambda: BeautifulSoup(page_source, parser), repeat)
+            print(f"\t{parser:<12} whole page: {full_ms:8.2f} ms")
+            if pane_source:
+                pane_ms = time_it(lambda: BeautifulSoup(pane_source, parser), repeat)
+                print(f"\t{parser:<12} detail pane: {pane_ms:8.2f} ms")
+
+
+def generate_rows(amount):
+    """
+    Generate synthetic results rows, in the layout of the results CSV file (index column first)
+    """
+    rows = []
+    for idx in range(amount):
+        company = idx % 150
+        rows.append([str(idx), f"Company {company}", "Data Scientist", f"City {idx % 40}", "CA",
+                     f"{random.randint(60, 120)}K", f"{random.randint(121, 250)}K",
+                     COMPANY_SIZES[company % len(COMPANY_SIZES)], "1999", "Company - Private",
+                     f"Industry {company % 30}", "Information Technology", "$100 to $500 million (USD)"] +
+                    [f"{random.uniform(1, 5):.1f}" for _ in range(7)])
+
+    return rows
+
+
+def bench_loader(amount, batch_size):
+    """
+    Compare the rows per second of the row by row loader against the set-based bulk loader.
+    ATTENTION: drops and re-creates the database configured in config.json
+    """
+    from Database import connect, create_database, create_scarping_tables, insert_rows, bulk_insert_rows
+
+    @connect
+    def timed_load(my_db, cursor, db_name, loader, rows):
+        cursor.execute(f"USE {db_name}")
+        start = time.perf_counter()
+        loader(my_db, cursor, iter(rows))
+        my_db.commit()
+        return time.perf_counter() - start
+
+    with open('config.json') as config_file:
+        configurations = json.load(config_file)
+
+    rows = generate_rows(amount)
+    loaders = {'row by row': insert_rows,
+               f'bulk (batch {batch_size})': lambda db, cursor, it: bulk_insert_rows(db, cursor, it, batch_size)}
+
+    for name, loader in loaders.items():
+        create_database(configurations)
+        create_scarping_tables()
+        elapsed = timed_load(loader, rows)
+        print(f"{name:<20} {amount} rows in {elapsed:6.2f}s: {amount / elapsed:10.0f} rows/sec")
+
+
+class ParseTimer:
+    """
+    Thread safe BeautifulSoup wrapper, accumulating the time spent parsing
+    """
+
+    def __init__(self, soup_class):
+        self.soup_class = soup_class
+        self.elapsed = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        soup = self.soup_class(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.elapsed += elapsed
+            self.calls += 1
+
+        return soup
+
+
+def bench_replay(fixture_dir, number_of_jobs, workers, repeat):
+    """
+    Replay a run recorded with Gg_scrap.py --record, offline, and report the scraper's jobs per second
+    and parsing time per job (no browser, network or throttling involved)
+    """
+    import Scraping_handler
+    from Results_handler import RecordSink
+    from Gg_scrap import parse_args as parse_scraper_args
+
+    class NullSink(RecordSink):
+        def write(self, record):
+            pass
+
+    with open('config.json') as config_file:
+        configurations = json.load(config_file)
+
+    argv = ['--replay', fixture_dir, '--workers', str(workers)]
+    if number_of_jobs:
+        argv += ['--number_of_jobs', str(number_of_jobs)]
+    args = parse_scraper_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configurations['Scraping']['checkpoint_path'] = os.path.join(tmp_dir, "checkpoint.jsonl")
+        for run in range(1, repeat + 1):
+            timer = ParseTimer(BeautifulSoup)
+            Scraping_handler.BeautifulSoup = timer
+            try:
+                start = time.perf_counter()
+                jobs = Scraping_handler.do_scraping(args, configurations, NullSink())
+                elapsed = time.perf_counter() - start
+            finally:
+                Scraping_handler.BeautifulSoup = timer.soup_class
+
+            per_job = timer.elapsed / jobs * 1000 if jobs else 0
+            print(f"Run {run}: {jobs} jobs in {elapsed:6.2f}s: {jobs / elapsed:8.1f} jobs/sec, "
+                  f"parsing {per_job:6.2f} ms/job ({timer.calls} parses)")
+
+
+def bench_browser(urls, repeat, settle):
+    """
+    Compare the regular Chrome profile against the configured lean profile (see Browser_handler):
+    bytes transferred per page, and milliseconds until the driver gets the page back and until its DOM is ready
+    """
+    from Scraping_handler import get_chromedriver_path, BASE_URL
+    from Browser_handler import launch_chrome, measure_page, document_ready, get_browser_config
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    with open('config.json') as config_file:
+        configurations = json.load(config_file)
+
+    driver_path = get_chromedriver_path(configurations)
+    lean_config = dict(get_browser_config(configurations), lean=True)
+    profiles = {'regular': {'lean': False}, 'lean': lean_config}
+    urls = urls or [BASE_URL]
+
+    for name, browser_config in profiles.items():
+        driver = launch_chrome(driver_path, headless=True, browser_config=browser_config)
+        samples = []
+        try:
+            for _ in range(repeat):
+                for url in urls:
+                    start = time.perf_counter()
+                    driver.get(url)
+                    WebDriverWait(driver, 30, poll_frequency=0.05).until(document_ready)
+                    get_ms = (time.perf_counter() - start) * 1000
+                    time.sleep(settle)
+                    samples.append((get_ms, measure_page(driver)))
+        finally:
+            driver.quit()
+
+        get_ms = sum(sample[0] for sample in samples) / len(samples)
+        kilobytes = sum(sample[1]['bytes'] for sample in samples) / len(samples) / 1024
+        resources = sum(sample[1]['resources'] for sample in samples) / len(samples)
+        dom_ready = sum(sample[1]['dom_ready'] or 0 for sample in samples) / len(samples)
+        print(f"{name:<8} {kilobytes:8.0f} KB/page, {resources:5.0f} resources/page, "
+              f"page ready {get_ms:7.0f} ms, DOM ready {dom_ready:7.0f} ms")
+
+
+def generate_jobs(amount, seed=0):
+    """
+    Generate synthetic jobs, as scraped by GlassdoorScraper.py: common fields and a random subset of the ratings.
+    The jobs are generated on the fly, so the store under test is the only one holding them
+    """
+    from Results_handler import RATING_FIELDS
+
+    labels = [field for field in RATING_FIELDS if field != 'Overall']
+    generator = random.Random(seed)
+    for idx in range(amount):
+        ratings = {label: round(generator.uniform(1, 5), 1)
+                   for label in generator.sample(labels, generator.randint(0, 6))}
+        if ratings:
+            ratings['Overall Rating'] = round(sum(ratings.values()) / len(ratings), 2)
+        yield ({'Company': f"Company {idx % 150}", 'City': f"City {idx % 40}", 'State': "CA",
+                'Title': "Data Scientist", 'Min Salary': f"{generator.randint(60, 120)}K",
+                'Max Salary': f"{generator.randint(121, 250)}K", 'Min Company Size': "1001",
+                'Max Company Size': "5000", 'Revenue': float('nan'), 'Industry': "Internet"}, ratings)
+
+
+def store_with_backfill(jobs):
+    """
+    The former ScraperManager.jobs_data store: a list per field, rating fields discovered on the fly
+    and back-filled with NaNs
+    """
+    nan = float('nan')
+    common_keys = []
+    jobs_data = {}
+    for common, ratings in jobs:
+        if not common_keys:
+            common_keys = list(common)
+            jobs_data = {key: [] for key in common_keys}
+        for key in common_keys:
+            jobs_data[key].append(common[key])
+        for label, score in ratings.items():
+            if label not in jobs_data:
+                jobs_data[label] = [nan for _ in jobs_data['Company'][:-1]]
+            jobs_data[label].append(score)
+        for field in jobs_data:
+            if field not in ratings and field not in common_keys:
+                jobs_data[field].append(nan)
+
+    return jobs_data
+
+
+def bench_store(amount, file_path):
+    """
+    Compare the former dict of lists jobs store (NaN back-filling) against the RecordStore:
+    time per stored job, memory held once all the jobs are stored, and time for writing the results CSV file
+    """
+    from GlassdoorScraper import JOB_COLUMNS
+    from Record_store import RecordStore
+    import csv
+
+    def dict_of_lists_export(jobs_data):
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(jobs_data.keys())
+            writer.writerows(zip(*jobs_data.values()))
+
+    def record_store(jobs):
+        store = RecordStore(JOB_COLUMNS)
+        for common, ratings in jobs:
+            record = dict(common)
+            record.update(ratings)
+            store.append(record)
+        return store
+
+    stores = (('dict of lists', store_with_backfill, dict_of_lists_export),
+              ('record store', record_store, lambda store: store.to_csv(file_path)))
+    for name, build, export in stores:
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = build(generate_jobs(amount))
+        build_time = time.perf_counter() - start
+        held = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        export(store)
+        export_time = time.perf_counter() - start
+        tracemalloc.stop()
+        del store
+        print(f"{name:<14} {amount} jobs: {build_time / amount * 1e6:6.1f} us/job, "
+              f"holding {held / 1024 / 1024:6.1f} MB, CSV written in {export_time:5.2f}s")
+
+
+def measure_imports(command):
+    """
+    Run a command of the scraper (script and arguments) under python -X importtime.
+    Returns the total import time in milliseconds, and the cumulative milliseconds of every top level import
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command, capture_output=True, text=True)
+
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module importing them
+        if not name.startswith('  '):
+            top_level[name.strip()] = top_level.get(name.strip(), 0) + int(cumulative) / 1000
+
+    return sum(top_level.values()), top_level
+
+
+def bench_importtime(budget, repeat, path):
+    """
+    Measure the import time of the scraper's commands (the best of repeat runs, as the first run
+    may pay for compiling the modules), compare it against the budget (milliseconds) and append it
+    to path (a JSON line per check, for tracking the trend).
+    Exits with an error when a command is over the budget
+    """
+    results = {}
+    over_budget = []
+    for name, command in IMPORT_COMMANDS.items():
+        total, top_level = min((measure_imports(command) for _ in range(repeat)), key=lambda run: run[0])
+        results[name] = {'total_ms': total,
+                         'heaviest': dict(sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:5])}
+        status = "OK" if total <= budget else "OVER BUDGET"
+        print(f"{name:<22} {total:8.1f} ms imports (budget {budget} ms) {status}")
+        for module, elapsed in results[name]['heaviest'].items():
+            print(f"	{module:<30} {elapsed:8.1f} ms")
+        if total > budget:
+            over_budget.append(name)
+
+    if path:
+        with open(path, 'a', encoding='utf8') as f:
+            f.write(json.dumps({'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                                'budget_ms': budget, 'commands': results}) + '\n')
+
+    if over_budget:
+        sys.exit(f"Import time over budget: {', '.join(over_budget)}")
+
+
+def bench_plans(rows, batch_size):
+    """
+    EXPLAIN the analytics queries (see Analytics_handler.check_query_plans) over the configured database,
+    loaded with synthetic rows first if rows is given.
+    Exits with an error when a query plan regressed (full scan or join without an index).
+    ATTENTION: re-creates the configured database if rows is given
+    """
+    from Database import connect, create_database, create_scarping_tables, bulk_insert_rows
+    from Analytics_handler import check_query_plans
+
+    @connect
+    def load(my_db, cursor, db_name, rows):
+        cursor.execute(f"USE {db_name}")
+        bulk_insert_rows(my_db, cursor, iter(rows), batch_size)
+
+    if rows:
+        with open('config.json') as config_file:
+            configurations = json.load(config_file)
+        create_database(configurations)
+        create_scarping_tables()
+        load(generate_rows(rows))
+
+    regressions = check_query_plans()
+    for name, problems in regressions.items():
+        print(f"{name:<32} {'; '.join(problems) if problems else 'OK'}")
+
+    regressed = [name for name, problems in regressions.items() if problems]
+    if regressed:
+        sys.exit(f"Query plan regressions: {', '.join(regressed)}")
+
+
+def parse_args():
+    """
+    Parse CLI user arguments.
+    Being used in main()
+    """
+    parser = argparse.ArgumentParser(description="Micro benchmarks for the Glassdoor scraper",
+                                     prog='Benchmarks.py')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    parsing = subparsers.add_parser('parsing', help="Page parsing time, over saved page fixtures")
+    parsing.add_argument('html_files', nargs='+', help="Saved Glassdoor result pages (HTML files)")
+    parsing.add_argument('-r', '--repeat', action='store', type=int, default=20,
+                         help="Amount of times to parse each file")
+
+    loader = subparsers.add_parser('loader', help="Database loaders throughput. "
+                                                  "ATTENTION: re-creates the configured database")
+    loader.add_argument('-n', '--rows', action='store', type=int, default=300,
+                        help="Amount of synthetic rows to load (the bundled dumps hold ~300 jobs)")
+    loader.add_argument('-b', '--batch_size', action='store', type=int, default=1000,
+                        help="Bulk loader batch size")
+
+    replay = subparsers.add_parser('replay', help="End to end scraper throughput, over a recorded run "
+                                                  "(see Gg_scrap.py --record)")
+    replay.add_argument('fixture_dir', help="Directory the run was recorded into")
+    replay.add_argument('-n', '--number_of_jobs', action='store', type=int, default=None,
+                        help="Amount of jobs to scrap (all the recorded jobs if not given)")
+    replay.add_argument('-w', '--workers', action='store', type=int, default=1,
+                        help="Amount of replay drivers scraping the pages in parallel")
+    replay.add_argument('-r', '--repeat', action='store', type=int, default=3,
+                        help="Amount of replays")
+
+    browser = subparsers.add_parser('browser', help="Bytes transferred and page ready time, "
+                                                    "regular against lean Chrome profile")
+    browser.add_argument('urls', nargs='*', help="Pages to load (the default search page if not given)")
+    browser.add_argument('-r', '--repeat', action='store', type=int, default=3,
+                         help="Amount of times to load each page")
+    browser.add_argument('-s', '--settle', action='store', type=float, default=2.0,
+                         help="Seconds to let a page settle before measuring its transferred bytes")
+
+    store = subparsers.add_parser('store', help="Scraped jobs store: cost per job and memory, "
+                                                "former dict of lists against the record store")
+    store.add_argument('-n', '--jobs', action='store', type=int, default=10000,
+                       help="Amount of synthetic jobs to store")
+    store.add_argument('-o', '--output', action='store', default=os.path.join(tempfile.gettempdir(), "store.csv"),
+                       help="CSV file the results are written into")
+
+    importtime = subparsers.add_parser('importtime', help="Import time of the scraper's commands (python -X "
+                                                          "importtime), checked against a budget")
+    importtime.add_argument('-b', '--budget', action='store', type=float, default=DEFAULT_IMPORT_BUDGET,
+                            help="Maximal import time of a command, in milliseconds")
+    importtime.add_argument('-r', '--repeat', action='store', type=int, default=3,
+                            help="Amount of runs of every command (the best one counts)")
+    importtime.add_argument('-o', '--output', action='store', default=DEFAULT_IMPORT_TIMES_PATH,
+                            help="JSON lines file the measures are appended to")
+
+    plans = subparsers.add_parser('plans', help="EXPLAIN based check of the analytics queries plans. "
+                                                "ATTENTION: re-creates the configured database if --rows is given")
+    plans.add_argument('-n', '--rows', action='store', type=int, default=0,
+                       help="Amount of synthetic rows to load first (the plans over a few rows are full scans)")
+    plans.add_argument('-b', '--batch_size', action='store', type=int, default=1000,
+                       help="Bulk loader batch size")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.benchmark == 'parsing':
+        bench_parsing(args.html_files, args.repeat)
+    elif args.benchmark == 'loader':
+        bench_loader(args.rows, args.batch_size)
+    elif args.benchmark == 'replay':
+        bench_replay(args.fixture_dir, args.number_of_jobs, args.workers, args.repeat)
+    elif args.benchmark == 'browser':
+        bench_browser(args.urls, args.repeat, args.settle)
+    elif args.benchmark == 'store':
+        bench_store(args.jobs, args.output)
+    elif args.benchmark == 'importtime':
+        bench_importtime(args.budget, args.repeat, args.output)
+    elif args.benchmark == 'plans':
+        bench_plans(args.rows, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
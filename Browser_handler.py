@@ -0,0 +1,188 @@
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Stylesheets are not blocked: the clicks on the search button and on the pagination rely on the page layout
+BLOCKED_RESOURCES = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+                     "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4"]
+BLOCKED_DOMAINS = ["*doubleclick.net*", "*googlesyndication.com*", "*google-analytics.com*",
+                   "*googletagmanager.com*", "*googletagservices.com*", "*facebook.net*", "*facebook.com/tr*",
+                   "*amazon-adsystem.com*", "*adsrvr.org*", "*scorecardresearch.com*", "*quantserve.com*",
+                   "*hotjar.com*", "*optimizely.com*", "*newrelic.com*", "*nr-data.net*", "*bing.com*"]
+LEAN_ARGUMENTS = ['--disable-extensions', '--disable-gpu', '--disable-dev-shm-usage', '--no-first-run',
+                  '--disable-background-networking', '--disable-sync', '--disable-default-apps',
+                  '--disable-component-update', '--mute-audio']
+DEFAULT_BROWSER_CONFIG = {'lean': False, 'page_load_strategy': 'eager', 'profile_dir': None,
+                          'block_resources': True, 'block_third_party': True, 'blocked_urls': []}
+
+MEASURE_SCRIPT = """
+var navigation = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = navigation ? navigation.transferSize : 0;
+for (var i = 0; i < resources.length; i++) { bytes += resources[i].transferSize || 0; }
+return {'bytes': bytes,
+        'resources': resources.length,
+        'dom_ready': navigation ? navigation.domContentLoadedEventEnd - navigation.startTime : null,
+        'load': navigation ? navigation.loadEventEnd - navigation.startTime : null};
+"""
+
+PROFILE_LOCK_FILE = "scraper.lock"
+_PROFILES_LOCK = threading.Lock()
+
+
+def get_browser_config(configurations):
+    """
+    Get the Browser section of the configuration, completed with the default values
+    """
+    browser_config = dict(DEFAULT_BROWSER_CONFIG)
+    browser_config.update(configurations.get('Browser', {}))
+
+    return browser_config
+
+
+def _try_lock(lock_file):
+    """
+    Take a non blocking exclusive OS lock on an open file, released when the file is closed
+    (or when the process ends, a crashed run included). Returns whether the lock was taken
+    """
+    try:
+        import fcntl
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:
+        import msvcrt
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+    except OSError:
+        return False
+
+    return True
+
+
+def acquire_profile_dir(profile_root):
+    """
+    Get a profile directory of its own for the next Chrome instance (Chrome refuses a profile already in use):
+    the first profile-<n> directory not locked by another driver, of this process or of a concurrent one.
+    Returns the directory and its lock file, to keep open for as long as the driver runs.
+    The profiles are allocated from profile-1 on every run, so their caches are reused from run to run
+    """
+    with _PROFILES_LOCK:
+        number = 1
+        while True:
+            profile_dir = os.path.abspath(os.path.join(profile_root, f"profile-{number}"))
+            os.makedirs(profile_dir, exist_ok=True)
+            lock_file = open(os.path.join(profile_dir, PROFILE_LOCK_FILE), 'a')
+            if _try_lock(lock_file):
+                return profile_dir, lock_file
+            lock_file.close()
+            number += 1
+
+
+def build_chrome_options(headless=False, browser_config=None):
+    """
+    Build the Chrome options and capabilities, along with the lock file of the profile directory (None if none).
+    The lean profile disables extensions, GPU and images, doesn't wait for the sub-resources of the pages
+    ('eager' page load strategy) and keeps a profile directory (cache included) between runs
+    """
+    from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
+    from selenium import webdriver
+
+    browser_config = browser_config or DEFAULT_BROWSER_CONFIG
+
+    options = webdriver.ChromeOptions()
+    options.add_argument('--ignore-certificate-errors')
+    if headless:
+        options.add_argument('--headless')
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+
+    capabilities = DesiredCapabilities.CHROME.copy()
+    if not browser_config.get('lean'):
+        options.add_argument('--incognito')
+        return options, capabilities, None
+
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    profile_lock = None
+    if browser_config.get('profile_dir'):
+        profile_dir, profile_lock = acquire_profile_dir(browser_config['profile_dir'])
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    else:
+        options.add_argument('--incognito')
+
+    capabilities['pageLoadStrategy'] = browser_config.get('page_load_strategy', 'eager')
+
+    return options, capabilities, profile_lock
+
+
+def get_blocked_urls(browser_config):
+    """
+    URL patterns the lean profile doesn't download
+    """
+    blocked_urls = list(browser_config.get('blocked_urls', []))
+    if browser_config.get('block_resources'):
+        blocked_urls += BLOCKED_RESOURCES
+    if browser_config.get('block_third_party'):
+        blocked_urls += BLOCKED_DOMAINS
+
+    return blocked_urls
+
+
+def block_requests(driver, browser_config=None):
+    """
+    Make Chrome drop the requests to images, stylesheets, fonts and third party (ads, tracking) URLs,
+    through the DevTools protocol. Does nothing unless the profile is lean
+    """
+    browser_config = browser_config or DEFAULT_BROWSER_CONFIG
+    if not browser_config.get('lean'):
+        return
+
+    blocked_urls = get_blocked_urls(browser_config)
+    if not blocked_urls:
+        return
+
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls})
+    logger.info(f"Blocking {len(blocked_urls)} URL patterns")
+
+
+def launch_chrome(chromedriver_path, headless=False, browser_config=None):
+    """
+    Start a Chrome driver with the configured browser profile.
+    The driver holds the lock of its profile directory, released once the driver is discarded
+    """
+    from selenium import webdriver
+
+    options, capabilities, profile_lock = build_chrome_options(headless, browser_config)
+    try:
+        driver = webdriver.Chrome(executable_path=chromedriver_path, options=options,
+                                  desired_capabilities=capabilities)
+    except Exception:
+        if profile_lock is not None:
+            profile_lock.close()
+        raise
+    driver.profile_lock = profile_lock
+    block_requests(driver, browser_config)
+
+    return driver
+
+
+def document_ready(driver):
+    """
+    Selenium expected condition: the DOM of the page has been parsed
+    (sub-resources may still be loading, as with the 'eager' page load strategy)
+    """
+    return driver.execute_script("return document.readyState") in ("interactive", "complete")
+
+
+def measure_page(driver):
+    """
+    Measure the page the driver is currently at, from the browser's performance timeline:
+    bytes transferred (page and sub-resources), amount of sub-resources, and the milliseconds
+    until the DOM was ready and until the page was fully loaded
+    """
+    return driver.execute_script(MEASURE_SCRIPT)
@@ -0,0 +1,94 @@
+import threading
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class CompanyCache:
+    """
+    Company-keyed cache of the Company and Rating tabs data.
+    A company already scraped during the run (or, when a path is given, during a previous run,
+    no longer than ttl seconds ago) is served from the cache, without clicking its tabs
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.incomplete = 0
+
+        self._entries = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def get(self, company_name):
+        """
+        Get the cached (company_data, ratings_data) of a company, None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(company_name)
+            if entry is None or (self.ttl and time.time() - entry['time'] > self.ttl):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry['company'], entry['ratings']
+
+    def put(self, company_name, company_data, ratings_data):
+        """
+        Cache the Company and Rating tabs data of a company.
+        Incomplete data (an empty tab, usually a failed scrape) isn't cached, so the company is scraped again
+        """
+        if not company_data or not ratings_data:
+            with self._lock:
+                self.incomplete += 1
+            logger.info(f"Not caching the incomplete tabs data of {company_name}")
+            return
+
+        with self._lock:
+            self._entries[company_name] = {'time': time.time(), 'company': company_data, 'ratings': ratings_data}
+
+    def load(self):
+        """
+        Load the cache entries persisted on disk (expired entries are dropped)
+        """
+        with open(self.path, encoding='utf8') as f:
+            entries = json.load(f)
+
+        now = time.time()
+        with self._lock:
+            self._entries = {name: entry for name, entry in entries.items()
+                             if not self.ttl or now - entry['time'] <= self.ttl}
+        logger.info(f"Loaded {len(self._entries)} companies from the cache {self.path}")
+
+    def save(self):
+        """
+        Persist the cache entries on disk (if the cache has a path)
+        """
+        if not self.path:
+            return
+
+        with self._lock:
+            entries = dict(self._entries)
+
+        with open(self.path, 'w', encoding='utf8') as f:
+            json.dump(entries, f)
+        logger.info(f"Saved {len(entries)} companies to the cache {self.path}")
+
+    def report(self):
+        """
+        Log and print the cache hits and misses, at the end of a run
+        """
+        message = f"Company cache: {self.hits} hits, {self.misses} misses, {self.incomplete} incomplete not cached"
+        logger.info(message)
+        print(message)
+
+        return {'hits': self.hits, 'misses': self.misses, 'incomplete': self.incomplete}
@@ -0,0 +1,126 @@
+import threading
+import logging
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = "scraping_checkpoint.jsonl"
+
+
+class Checkpoint:
+    """
+    Append-only checkpoint file (JSON lines) of a scraping run.
+    Holds a header line describing the search, a line for every scraped (or skipped) job
+    and a line for every completed page, so an interrupted run can be resumed from where it stopped.
+    Jobs are written to disk every `every` jobs, bounding the work lost on a crash.
+    """
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH, every=10):
+        self.path = path
+        self.every = max(1, every)
+        self.records = []
+        self.done_jobs = set()
+        self.done_pages = set()
+        self.header = None
+
+        self._buffer = []
+        self._file = None
+        self._lock = threading.Lock()
+
+    def start(self, args, search_url, resume=False):
+        """
+        Open the checkpoint file.
+        When resume is True, load the previous run's checkpoint and keep appending to it,
+        otherwise start a new checkpoint file
+        """
+        if resume:
+            self.load()
+            if self.header and (self.header['job_type'], self.header['location']) != (args.job_type, args.location):
+                raise ValueError(f"The checkpoint {self.path} belongs to another search: "
+                                 f"{self.header['job_type']} in {self.header['location']}")
+            self._file = open(self.path, 'a', encoding='utf8')
+            logger.info(f"Resuming from checkpoint: {len(self.records)} jobs, {len(self.done_pages)} pages done")
+
+        else:
+            self._file = open(self.path, 'w', encoding='utf8')
+
+        if self.header is None:
+            self.header = {'type': 'run', 'job_type': args.job_type, 'location': args.location,
+                           'number_of_jobs': args.number_of_jobs, 'search_url': search_url}
+            self._write([self.header])
+
+    def load(self):
+        """
+        Load the records of an existing checkpoint file.
+        A truncated last line (crash while writing) is ignored
+        """
+        if not os.path.exists(self.path):
+            logger.warning(f"No checkpoint found at {self.path}, starting from scratch")
+            return
+
+        with open(self.path, encoding='utf8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Ignoring a truncated checkpoint line")
+                    continue
+
+                if entry['type'] == 'run':
+                    self.header = entry
+                elif entry['type'] == 'job':
+                    self.records.append((entry['page'], entry['index'], entry['common'],
+                                         entry['company'], entry['ratings']))
+                    self.done_jobs.add((entry['page'], entry['index']))
+                elif entry['type'] == 'skip':
+                    self.done_jobs.add((entry['page'], entry['index']))
+                elif entry['type'] == 'page':
+                    self.done_pages.add(entry['page'])
+
+    def add_job(self, page, index, common_data, company_data, ratings_data):
+        """
+        Checkpoint a scraped job
+        """
+        self._add({'type': 'job', 'page': page, 'index': index, 'common': common_data,
+                   'company': company_data, 'ratings': ratings_data})
+
+    def skip_job(self, page, index):
+        """
+        Checkpoint a job that has been filtered out, so it won't be clicked again on resume
+        """
+        self._add({'type': 'skip', 'page': page, 'index': index})
+
+    def page_done(self, page):
+        """
+        Checkpoint a completed page (written to disk right away)
+        """
+        with self._lock:
+            self._buffer.append({'type': 'page', 'page': page})
+            self._flush()
+
+    def close(self):
+        """
+        Write whatever is left in the buffer and close the checkpoint file
+        """
+        with self._lock:
+            if self._file is not None:
+                self._flush()
+                self._file.close()
+                self._file = None
+
+    def _add(self, entry):
+        with self._lock:
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.every:
+                self._flush()
+
+    def _flush(self):
+        if self._buffer and self._file is not None:
+            self._write(self._buffer)
+            self._buffer = []
+
+    def _write(self, entries):
+        self._file.writelines(json.dumps(entry) + '\n' for entry in entries)
+        self._file.flush()
+        os.fsync(self._file.fileno())
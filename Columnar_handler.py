@@ -0,0 +1,182 @@
+from Results_handler import RecordSink, RATING_FIELDS
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import pyarrow as pa
+import datetime
+import logging
+import uuid
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARQUET_ROOT = "results_parquet"
+RUN_PARTITION = "run"
+SALARY_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([KkMm]?)")
+SIZE_PATTERN = re.compile(r"(\d[\d,]*)")
+RATING_COLUMNS = {field: re.sub(r"\W+", "_", field).strip('_') for field in RATING_FIELDS}
+
+SCHEMA = pa.schema([('Company_Name', pa.string()),
+                    ('Job_Title', pa.string()),
+                    ('City', pa.string()),
+                    ('State', pa.string()),
+                    ('Min_Salary', pa.float64()),
+                    ('Max_Salary', pa.float64()),
+                    ('Min_Size', pa.int32()),
+                    ('Max_Size', pa.int32()),
+                    ('Founded', pa.int16()),
+                    ('Type', pa.string()),
+                    ('Industry', pa.string()),
+                    ('Sector', pa.string()),
+                    ('Revenue', pa.string())] +
+                   [(column, pa.float32()) for column in RATING_COLUMNS.values()] +
+                   [('Search_Job_Type', pa.string()),
+                    ('Search_Location', pa.string())])
+
+
+def parse_salary(raw_salary):
+    """
+    Convert a scraped salary ("120K", "1.2M", "85000") into a number, None if missing
+    """
+    if raw_salary is None:
+        return None
+
+    match = SALARY_PATTERN.search(str(raw_salary))
+    if match is None:
+        return None
+
+    multiplier = {'k': 1e3, 'm': 1e6}.get(match.group(2).lower(), 1)
+    return float(match.group(1)) * multiplier
+
+
+def parse_company_size(raw_size):
+    """
+    Convert a scraped company size ("1001 to 5000 Employees", "10000+ Employees")
+    into a (min, max) employees range, None for the missing bounds
+    """
+    if raw_size is None:
+        return None, None
+
+    numbers = [int(number.replace(',', '')) for number in SIZE_PATTERN.findall(str(raw_size))]
+    if not numbers:
+        return None, None
+
+    return numbers[0], numbers[1] if len(numbers) > 1 else None
+
+
+def parse_number(raw_value, number_type=float):
+    """
+    Convert a scraped numeric value (a rating, a year) into a number, None if missing or invalid
+    """
+    if raw_value is None or raw_value == '':
+        return None
+
+    try:
+        return number_type(float(raw_value))
+    except ValueError:
+        return None
+
+
+def clean_text(raw_value):
+    """
+    Strip a scraped text value, None if missing or empty
+    """
+    if raw_value is None:
+        return None
+
+    value = str(raw_value).strip()
+    return value or None
+
+
+def normalize_record(record, job_type=None, location=None):
+    """
+    Normalize a result record (Results_handler.RESULT_FIELDS) into a typed row of SCHEMA
+    """
+    min_size, max_size = parse_company_size(record.get('Size'))
+    row = {'Company_Name': clean_text(record.get('Company_Name')),
+           'Job_Title': clean_text(record.get('Job_Title')),
+           'City': clean_text(record.get('City')),
+           'State': clean_text(record.get('State')),
+           'Min_Salary': parse_salary(record.get('Min_Salary')),
+           'Max_Salary': parse_salary(record.get('Max_Salary')),
+           'Min_Size': min_size,
+           'Max_Size': max_size,
+           'Founded': parse_number(record.get('Founded'), int),
+           'Type': clean_text(record.get('Type')),
+           'Industry': clean_text(record.get('Industry')),
+           'Sector': clean_text(record.get('Sector')),
+           'Revenue': clean_text(record.get('Revenue')),
+           'Search_Job_Type': clean_text(job_type),
+           'Search_Location': clean_text(location)}
+    row.update({column: parse_number(record.get(field)) for field, column in RATING_COLUMNS.items()})
+
+    return row
+
+
+def new_run_id():
+    """
+    Identifier of a new search run: its starting time (sorting the runs chronologically), made unique by the process
+    id and a random suffix, as concurrent searches (queue workers, batches) may start within the same microsecond
+    """
+    return f"{datetime.datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class ParquetSink(RecordSink):
+    """
+    Stream the records into a typed Parquet dataset, partitioned by search run:
+    <root_dir>/run=<run_id>/part-0.parquet, a row group every batch_size records
+    """
+
+    def __init__(self, root_dir=DEFAULT_PARQUET_ROOT, run_id=None, job_type=None, location=None, batch_size=1000):
+        self.run_id = run_id or new_run_id()
+        self.job_type = job_type
+        self.location = location
+        self.batch_size = batch_size
+
+        run_dir = os.path.join(root_dir, f"{RUN_PARTITION}={self.run_id}")
+        os.makedirs(run_dir, exist_ok=True)
+        self.file_path = os.path.join(run_dir, "part-0.parquet")
+        self._writer = pq.ParquetWriter(self.file_path, SCHEMA, compression='snappy')
+        self._rows = []
+
+    def prepare(self, record):
+        return normalize_record(record, self.job_type, self.location)
+
+    def write_prepared(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records as a row group
+        """
+        if self._rows:
+            self._writer.write_table(pa.Table.from_pylist(self._rows, schema=SCHEMA))
+            self._rows = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        logger.info(f"Saved run {self.run_id} into {self.file_path}")
+
+
+def list_runs(root_dir=DEFAULT_PARQUET_ROOT):
+    """
+    Get the identifiers of the runs stored in a Parquet dataset, oldest first
+    """
+    prefix = f"{RUN_PARTITION}="
+    return sorted(entry[len(prefix):] for entry in os.listdir(root_dir) if entry.startswith(prefix))
+
+
+def read_runs(root_dir=DEFAULT_PARQUET_ROOT, runs=None, columns=None):
+    """
+    Load the scraped results of the given runs (all the runs if None) into a pandas DataFrame,
+    with a 'run' column identifying the run of every row
+    """
+    dataset = ds.dataset(root_dir, format='parquet', partitioning='hive')
+    row_filter = ds.field(RUN_PARTITION).isin(list(runs)) if runs is not None else None
+    if columns is not None and RUN_PARTITION not in columns:
+        columns = list(columns) + [RUN_PARTITION]
+
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
@@ -1,39 +1,229 @@
-from Stocks_API import *
-import mysql.connector
-from tqdm import tqdm
+from mysql.connector.errors import PoolError
+from contextlib import contextmanager
+from mysql.connector import pooling
+from Results_handler import RecordSink, job_fingerprint, record_to_row, read_result_rows
+from Timing_handler import timed
+import functools
+import threading
 import logging
 import json
-import csv
+import time
 
 logger = logging.getLogger(__name__)
 
 
-def connect(func):
-    def inner(*args, **kwargs):
-        host, username, password, db_name = _parse_json('config.json')
+class KeyCache:
+    """
+    In-memory natural key -> id cache of the entities already stored in the database during a run:
+    companies (by company name) and job locations (by city and state),
+    along with the fingerprints of the job posts already stored.
+    Being used by the loaders for skipping the inserts of repeated entities: a loader collects the keys
+    it inserts into a KeyCache of its own, merged into KEY_CACHE only once committed (a rolled back
+    load must not leave behind keys which aren't stored)
+    """
+
+    def __init__(self):
+        self.companies = {}
+        self.locations = {}
+        self.fingerprints = set()
+        self.db_name = None
+
+    def merge(self, keys):
+        """
+        Add the keys of another KeyCache (the ones a loader just committed)
+        """
+        self.companies.update(keys.companies)
+        self.locations.update(keys.locations)
+        self.fingerprints.update(keys.fingerprints)
+
+    def clear(self):
+        """
+        Forget every cached key (the database has been re-created)
+        """
+        self.companies.clear()
+        self.locations.clear()
+        self.fingerprints.clear()
+        self.db_name = None
+
+    def warm(self, cursor, db_name):
+        """
+        Load the keys already stored in the database, once per database
+        """
+        if self.db_name == db_name:
+            return
+
+        self.clear()
+        cursor.execute("SELECT Company_name, idCompany FROM Company")
+        self.companies.update(cursor.fetchall())
+        cursor.execute("SELECT City, State, idJob_location FROM Job_location")
+        self.locations.update({(city, state): id_location for city, state, id_location in cursor.fetchall()})
+        cursor.execute("SELECT Fingerprint FROM Job_post WHERE Fingerprint IS NOT NULL")
+        self.fingerprints.update(fingerprint for fingerprint, in cursor.fetchall())
+        self.db_name = db_name
+        logger.info(f"Key cache warmed with {len(self.companies)} companies, "
+                    f"{len(self.locations)} locations and {len(self.fingerprints)} job posts")
+
+
+KEY_CACHE = KeyCache()
+
+
+POOL_NAME = "glassdoor_pool"
+DEFAULT_POOL_SIZE = 5
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_SESSION = threading.local()
+_METRICS_LOCK = threading.Lock()
+_LOAD_LOCK = threading.RLock()
+CONNECTION_METRICS = {'sessions': 0, 'wait_time': 0.0, 'max_wait_time': 0.0,
+                      'hold_time': 0.0, 'max_hold_time': 0.0}
+
+
+def _get_pool():
+    """
+    Create the mySQL connection pool on first use (the configuration is parsed only once)
+    """
+    global _POOL
 
-        logger.info("Establishing mySQL connection")
-        db_connection = mysql.connector.connect(host=host, user=username, passwd=password)
-        mysql_cursor = db_connection.cursor()
-        logger.info("Connection established successfully")
-        # mysql_cursor.execute(f"USE {db_name}")
+    with _POOL_LOCK:
+        if _POOL is None:
+            host, username, password, db_name = _parse_json('config.json')
+            pool_size = _load_config('config.json')['Database'].get('pool_size', DEFAULT_POOL_SIZE)
+            logger.info(f"Creating mySQL connection pool of size {pool_size}")
+            _POOL = pooling.MySQLConnectionPool(pool_name=POOL_NAME, pool_size=pool_size,
+                                                host=host, user=username, passwd=password)
 
-        func(db_connection, mysql_cursor, db_name, *args, **kwargs)
+    return _POOL
 
+
+def _acquire_connection(timeout=30):
+    """
+    Borrow a connection from the pool, waiting for one to be released if the pool is exhausted
+    """
+    pool = _get_pool()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return pool.get_connection()
+        except PoolError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def _update_metrics(wait_time, hold_time):
+    with _METRICS_LOCK:
+        CONNECTION_METRICS['sessions'] += 1
+        CONNECTION_METRICS['wait_time'] += wait_time
+        CONNECTION_METRICS['hold_time'] += hold_time
+        CONNECTION_METRICS['max_wait_time'] = max(CONNECTION_METRICS['max_wait_time'], wait_time)
+        CONNECTION_METRICS['max_hold_time'] = max(CONNECTION_METRICS['max_hold_time'], hold_time)
+
+
+@contextmanager
+def session():
+    """
+    Get a (connection, cursor) pair out of the connection pool, for the duration of the with block.
+    Nested sessions in the same thread reuse the outer session's connection, so a group of
+    functions decorated with @connect can share a single connection.
+    The outermost session commits on success, rolls back on failure and returns the connection to the pool
+    """
+    current = getattr(_SESSION, 'connection', None)
+    if current is not None:
+        yield current
+        return
+
+    logger.info("Establishing mySQL connection")
+    start = time.perf_counter()
+    db_connection = _acquire_connection()
+    acquired = time.perf_counter()
+    mysql_cursor = db_connection.cursor()
+    _SESSION.connection = (db_connection, mysql_cursor)
+    logger.info("Connection established successfully")
+
+    try:
+        yield db_connection, mysql_cursor
         db_connection.commit()
+    except Exception:
+        db_connection.rollback()
+        raise
+    finally:
+        _SESSION.connection = None
         mysql_cursor.close()
         db_connection.close()
-        logger.info("mySQL connection closed")
+        _update_metrics(acquired - start, time.perf_counter() - acquired)
+        logger.info("mySQL connection returned to the pool")
+
+
+@contextmanager
+def transaction():
+    """
+    Run a batch of statements as a single transaction, on the current session (or a new one).
+    Yields the cursor, commits when the with block ends and rolls back if it raises
+    """
+    with session() as (db_connection, mysql_cursor):
+        try:
+            yield mysql_cursor
+            db_connection.commit()
+        except Exception:
+            db_connection.rollback()
+            raise
+
+
+def connection_metrics():
+    """
+    Get the connection pool metrics: amount of sessions, total and maximal wait and hold times (seconds)
+    """
+    with _METRICS_LOCK:
+        return dict(CONNECTION_METRICS)
+
+
+def report_connection_metrics():
+    """
+    Log the connection pool metrics, at the end of a run
+    """
+    metrics = connection_metrics()
+    logger.info(f"mySQL connections: {metrics['sessions']} sessions, "
+                f"waited {metrics['wait_time']:.3f}s (max {metrics['max_wait_time']:.3f}s), "
+                f"held {metrics['hold_time']:.3f}s (max {metrics['max_hold_time']:.3f}s)")
+
+    return metrics
+
+
+def connect(func):
+    """
+    Provide the decorated function with a pooled session: (connection, cursor, database name, ...)
+    """
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        db_name = _parse_json('config.json')[3]
+        with session() as (db_connection, mysql_cursor):
+            return func(db_connection, mysql_cursor, db_name, *args, **kwargs)
+
+    return inner
+
+
+def serialized_load(func):
+    """
+    Run the decorated loader holding the load lock, a single load at a time over all the threads:
+    the loaders share the KeyCache and derive the ids of the new job posts from the current maximum
+    """
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        with _LOAD_LOCK:
+            return func(*args, **kwargs)
 
     return inner
 
 
 @connect
-def create_database(my_db, cursor, db_name, configurations, *args, **kwargs):
+def create_database(my_db, cursor, db_name, configurations, drop=True, *args, **kwargs):
     """
     Create new mySQL database (if not exists yet)
+    :param drop - bool - Drop the existing database first (False for incremental runs)
     """
-    cursor.execute(f"DROP DATABASE IF EXISTS {db_name}")
+    if drop:
+        cursor.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        KEY_CACHE.clear()
     logger.info(f"Creating Database: {db_name}")
     cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
     my_db.commit()
@@ -62,14 +252,16 @@ def create_scarping_tables():
                                                           `Work/Life Balance` FLOAT,
                                                           `Senior Management` FLOAT, 
                                                           `Comp & Benefits` FLOAT,
-                                                          `Career Opportunities` FLOAT)'''
+                                                          `Career Opportunities` FLOAT,
+                                                          idCompany INT,
+                                                          UNIQUE KEY (idCompany))'''
 
     crate_table_commands["Ratings"] = job_ratings
 
     company = '''
     CREATE TABLE IF NOT EXISTS Company(
                                         idCompany INT NOT NULL AUTO_INCREMENT PRIMARY KEY, 
-                                        Company_name VARCHAR(45) NOT NULL, 
+                                        Company_name VARCHAR(45) NOT NULL UNIQUE, 
                                         Size VARCHAR(45), 
                                         Revenue TEXT,
                                         Sector TEXT,
@@ -88,6 +280,8 @@ def create_scarping_tables():
                                         Min_Salary VARCHAR(10),
                                         Max_Salary VARCHAR(10), 
                                         idCompany INT, 
+                                        Fingerprint CHAR(40),
+                                        UNIQUE KEY (Fingerprint),
                                         FOREIGN KEY (idCompany) REFERENCES Company(idCompany))'''
 
     crate_table_commands["Job_post"] = job_post
@@ -95,8 +289,9 @@ def create_scarping_tables():
     job_location = '''
     CREATE TABLE IF NOT EXISTS Job_location(
                                             idJob_location INT NOT NULL AUTO_INCREMENT PRIMARY KEY, 
-                                            City VARCHAR(45), 
-                                            State VARCHAR(10))'''
+                                            City VARCHAR(45) NOT NULL DEFAULT '', 
+                                            State VARCHAR(10) NOT NULL DEFAULT '',
+                                            UNIQUE KEY (City, State))'''
 
     crate_table_commands["Job_location"] = job_location
 
@@ -112,8 +307,139 @@ def create_scarping_tables():
 
     logger.info("Done constructing tables commands")
 
-    for table_name, sql_query in crate_table_commands.items():
-        create_table(table_name, sql_query)
+    # All the DDL runs in a single session
+    with session():
+        for table_name, sql_query in crate_table_commands.items():
+            create_table(table_name, sql_query)
+
+        migrate_schema()
+
+        from Analytics_handler import create_analytics_schema
+        create_analytics_schema()
+
+
+def _has_column(cursor, db_name, table_name, column_name):
+    cursor.execute('''SELECT COUNT(*) FROM information_schema.COLUMNS
+                      WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s''',
+                   (db_name, table_name, column_name))
+    return cursor.fetchone()[0] > 0
+
+
+def _has_unique_key(cursor, db_name, table_name, column_name):
+    cursor.execute('''SELECT COUNT(*) FROM information_schema.STATISTICS
+                      WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s AND NON_UNIQUE = 0
+                            AND INDEX_NAME <> 'PRIMARY' AND SEQ_IN_INDEX = 1''',
+                   (db_name, table_name, column_name))
+    return cursor.fetchone()[0] > 0
+
+
+def add_natural_keys(my_db, cursor, db_name):
+    """
+    Migrate tables created before the natural keys the loaders upsert by: merge the repeated companies
+    (same company name) and locations (same city and state, a missing one stored as ''), keeping the first row
+    of each, link the ratings to their company (Ratings.idCompany) and add the unique keys.
+    Nothing to do for the keys already there.
+    An auxiliary function to migrate_schema() and get_known_fingerprints()
+    """
+    cursor.execute(f"USE {db_name}")
+    migrated = False
+
+    if not _has_unique_key(cursor, db_name, 'Company', 'Company_name'):
+        logger.info("Merging the repeated companies and adding the company name unique key")
+        cursor.execute('''CREATE TEMPORARY TABLE Company_drop
+                          SELECT c.idCompany, c.idRatings, k.idKeep
+                          FROM Company c
+                          JOIN (SELECT Company_name, MIN(idCompany) AS idKeep
+                                FROM Company GROUP BY Company_name HAVING COUNT(*) > 1) k
+                                ON k.Company_name = c.Company_name
+                          WHERE c.idCompany <> k.idKeep''')
+        cursor.execute('''UPDATE Job_post jp JOIN Company_drop d ON d.idCompany = jp.idCompany
+                          SET jp.idCompany = d.idKeep''')
+        if _has_column(cursor, db_name, 'Company_stock_details', 'idCompany'):
+            cursor.execute('''UPDATE Company_stock_details s JOIN Company_drop d ON d.idCompany = s.idCompany
+                              SET s.idCompany = d.idKeep''')
+        cursor.execute("DELETE c FROM Company c JOIN Company_drop d ON d.idCompany = c.idCompany")
+        logger.info(f"Merged {cursor.rowcount} repeated companies")
+        cursor.execute("DELETE r FROM Ratings r JOIN Company_drop d ON d.idRatings = r.idRatings")
+        cursor.execute("DROP TEMPORARY TABLE Company_drop")
+        cursor.execute("ALTER TABLE Company ADD UNIQUE KEY (Company_name)")
+        migrated = True
+
+    if not _has_column(cursor, db_name, 'Ratings', 'idCompany'):
+        logger.info("Linking the ratings to their company")
+        cursor.execute("ALTER TABLE Ratings ADD COLUMN idCompany INT")
+        cursor.execute('''UPDATE Ratings r JOIN Company c ON c.idRatings = r.idRatings
+                          SET r.idCompany = c.idCompany''')
+        cursor.execute("ALTER TABLE Ratings ADD UNIQUE KEY (idCompany)")
+        migrated = True
+
+    if not _has_unique_key(cursor, db_name, 'Job_location', 'City'):
+        logger.info("Merging the repeated locations and adding the city and state unique key")
+        cursor.execute("UPDATE Job_location SET City = COALESCE(City, ''), State = COALESCE(State, '')")
+        cursor.execute('''CREATE TEMPORARY TABLE Location_drop
+                          SELECT l.idJob_location, k.idKeep
+                          FROM Job_location l
+                          JOIN (SELECT City, State, MIN(idJob_location) AS idKeep
+                                FROM Job_location GROUP BY City, State HAVING COUNT(*) > 1) k
+                                ON k.City = l.City AND k.State = l.State
+                          WHERE l.idJob_location <> k.idKeep''')
+        cursor.execute('''UPDATE Job_post_location jpl JOIN Location_drop d ON d.idJob_location = jpl.idJob_location
+                          SET jpl.idJob_location = d.idKeep''')
+        cursor.execute("DELETE l FROM Job_location l JOIN Location_drop d ON d.idJob_location = l.idJob_location")
+        logger.info(f"Merged {cursor.rowcount} repeated locations")
+        cursor.execute("DROP TEMPORARY TABLE Location_drop")
+        cursor.execute('''ALTER TABLE Job_location MODIFY City VARCHAR(45) NOT NULL DEFAULT '',
+                                                   MODIFY State VARCHAR(10) NOT NULL DEFAULT '',
+                                                   ADD UNIQUE KEY (City, State)''')
+        migrated = True
+
+    my_db.commit()
+    if migrated:
+        # The ids of the merged rows may be cached
+        KEY_CACHE.clear()
+        logger.info("Added the natural keys to the stored tables")
+
+
+def add_fingerprints(my_db, cursor, db_name):
+    """
+    Migrate a Job_post table created before the job fingerprints: add the Fingerprint column,
+    fill it in for the stored job posts and add its unique key (nothing to do if the column already exists).
+    Repeated job posts (same fingerprint) keep the fingerprint on their first row only.
+    An auxiliary function to migrate_schema() and get_known_fingerprints()
+    """
+    if _has_column(cursor, db_name, 'Job_post', 'Fingerprint'):
+        return
+
+    logger.info("Adding fingerprints to the stored job posts")
+    cursor.execute(f"USE {db_name}")
+    cursor.execute("ALTER TABLE Job_post ADD COLUMN Fingerprint CHAR(40)")
+    cursor.execute('''SELECT jp.idJob_post, c.Company_name, jp.Job_Title, l.City, l.State, jp.Min_Salary, jp.Max_Salary
+                      FROM Job_post jp
+                      LEFT JOIN Company c ON c.idCompany = jp.idCompany
+                      LEFT JOIN Job_post_location jpl ON jpl.idJob_post = jp.idJob_post
+                      LEFT JOIN Job_location l ON l.idJob_location = jpl.idJob_location
+                      ORDER BY jp.idJob_post''')
+
+    fingerprints = {}
+    for id_job_post, *fields in cursor.fetchall():
+        fingerprints.setdefault(job_fingerprint(*fields), id_job_post)
+
+    rows = list(fingerprints.items())
+    for start in range(0, len(rows), 1000):
+        cursor.executemany("UPDATE Job_post SET Fingerprint = %s WHERE idJob_post = %s", rows[start:start + 1000])
+    cursor.execute("ALTER TABLE Job_post ADD UNIQUE KEY (Fingerprint)")
+    my_db.commit()
+    logger.info(f"Added the fingerprints of {len(rows)} job posts")
+
+
+@connect
+def migrate_schema(my_db, cursor, db_name):
+    """
+    Bring tables created by former versions up to date: natural keys (see add_natural_keys())
+    and job fingerprints (see add_fingerprints())
+    """
+    add_natural_keys(my_db, cursor, db_name)
+    add_fingerprints(my_db, cursor, db_name)
 
 
 def create_api_table():
@@ -173,97 +499,379 @@ def show_query(my_db, cursor, db_name, show_what, table_name=None):
     return res
 
 
+STAGING_TABLE = '''CREATE TEMPORARY TABLE IF NOT EXISTS Staging_jobs(
+                                                       row_num INT NOT NULL PRIMARY KEY,
+                                                       Company_name VARCHAR(45),
+                                                       Job_Title TEXT,
+                                                       City VARCHAR(45),
+                                                       State VARCHAR(10),
+                                                       Min_Salary VARCHAR(10),
+                                                       Max_Salary VARCHAR(10),
+                                                       Size VARCHAR(45),
+                                                       Founded INT,
+                                                       Type VARCHAR(50),
+                                                       Industry VARCHAR(50),
+                                                       Sector TEXT,
+                                                       Revenue TEXT,
+                                                       Overall FLOAT,
+                                                       `Culture & Values` FLOAT,
+                                                       `Diversity & Inclusion` FLOAT,
+                                                       `Work/Life Balance` FLOAT,
+                                                       `Senior Management` FLOAT,
+                                                       `Comp & Benefits` FLOAT,
+                                                       `Career Opportunities` FLOAT,
+                                                       is_new_company BOOL,
+                                                       is_new_location BOOL,
+                                                       Fingerprint CHAR(40))'''
+
+# Set-based statements moving the staged rows into the tables.
+# Companies (and their ratings) and locations are upserted by their natural keys, only for the keys
+# the loader didn't know yet (is_new_* flags). Job posts get their ids as an offset (row_num) over the
+# current maximal id, and all the foreign keys are resolved by joining on the natural keys
+BULK_INSERT_COMMANDS = ['''INSERT INTO Company (Company_name, Size, Revenue, Sector, Industry, Type, Founded)
+                         SELECT Company_name, MAX(Size), MAX(Revenue), MAX(Sector), MAX(Industry), MAX(Type),
+                                MAX(Founded)
+                         FROM Staging_jobs
+                         WHERE is_new_company AND Company_name IS NOT NULL
+                         GROUP BY Company_name
+                         ON DUPLICATE KEY UPDATE idCompany = idCompany''',
+                        '''INSERT INTO Ratings (idCompany, Overall, `Culture & Values`, `Diversity & Inclusion`,
+                                             `Work/Life Balance`, `Senior Management`, `Comp & Benefits`,
+                                             `Career Opportunities`)
+                         SELECT c.idCompany, MAX(s.Overall), MAX(s.`Culture & Values`),
+                                MAX(s.`Diversity & Inclusion`), MAX(s.`Work/Life Balance`),
+                                MAX(s.`Senior Management`), MAX(s.`Comp & Benefits`), MAX(s.`Career Opportunities`)
+                         FROM Staging_jobs s JOIN Company c ON c.Company_name = s.Company_name
+                         WHERE s.is_new_company
+                         GROUP BY c.idCompany
+                         ON DUPLICATE KEY UPDATE Ratings.idRatings = Ratings.idRatings''',
+                        '''UPDATE Company c JOIN Ratings r ON r.idCompany = c.idCompany
+                         SET c.idRatings = r.idRatings
+                         WHERE c.idRatings IS NULL''',
+                        '''INSERT INTO Job_location (City, State)
+                         SELECT DISTINCT City, State
+                         FROM Staging_jobs
+                         WHERE is_new_location
+                         ON DUPLICATE KEY UPDATE idJob_location = idJob_location''',
+                        '''INSERT INTO Job_post (idJob_post, Job_Title, Min_Salary, Max_Salary, idCompany, Fingerprint)
+                         SELECT @base_job_post + s.row_num, s.Job_Title, s.Min_Salary, s.Max_Salary, c.idCompany,
+                                s.Fingerprint
+                         FROM Staging_jobs s JOIN Company c ON c.Company_name = s.Company_name''',
+                        '''INSERT INTO Job_post_location (idJob_post, idJob_location)
+                         SELECT jp.idJob_post, l.idJob_location
+                         FROM Staging_jobs s
+                         JOIN Job_post jp ON jp.idJob_post = @base_job_post + s.row_num
+                         JOIN Job_location l ON l.City = s.City AND l.State = s.State''']
+
+
+@timed()
 @connect
-def insert_values(my_db, cursor, db_name, where_from='file'):
+def insert_values(my_db, cursor, db_name, where_from='file', batch_size=1000, bulk=True, data_file=None):
     """
     Insert values into given mySQL table.
     :param my_db - mySQL database connection
     :param cursor - mySQL connection cursor
     :param db_name - str - The database name you'd like to work on
-    :param where_from - str - Whether insert values from a CSV file ('file') from an API output ('api')
+    :param where_from - str - Whether insert values from a results file ('file') from an API output ('api')
+    :param batch_size - int - Amount of rows sent to the database in a single round trip
+    :param bulk - bool - Use the set-based bulk loader (True) or the row by row one (False)
+    :param data_file - str - The results file (CSV or JSON lines), the configured results_path if None
     """
-    with open('config.json') as config_file:
-        config_params = json.load(config_file)
-
-    data_file = config_params['Scraping']['results_path']
+    if data_file is None:
+        data_file = _load_config('config.json')['Scraping']['results_path']
     cursor.execute(f"USE {db_name}")
-    # Extracting relevant data from the csv file
+    # Extracting relevant data from the results file
     if where_from.lower() == 'file':
 
-        with open(fr"{data_file}", 'r') as f:
-            reader = csv.reader(f)
-            headers = next(reader)
-
-            for line_num, line in enumerate(reader):
-                line = replace_nans(line)
-                ratings_data = line[13:]
-
-                cursor.execute('''INSERT INTO Ratings (
-                                                        Overall,
-                                                       `Culture & Values`, 
-                                                       `Diversity & Inclusion`,
-                                                       `Work/Life Balance`,  
-                                                       `Senior Management`,
-                                                       `Comp & Benefits`,
-                                                       `Career Opportunities`)
-                                 VALUES (%s, %s, %s, %s, %s, %s, %s )''', ratings_data)
-
-                idRatings = cursor.lastrowid
-
-                cursor.execute('''INSERT INTO Company (Company_name,
-                                                       Size, 
-                                                       Revenue,
-                                                       Sector, 
-                                                       Industry,
-                                                       Type, 
-                                                       Founded,
-                                                       idRatings
-                                                       ) 
-                                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s)''',
-                               (line[1], line[7], line[12], line[11], line[10], line[9], line[8], idRatings))
-
-                idCompany = cursor.lastrowid
-
-                cursor.execute('''INSERT INTO Job_post (Job_Title, 
-                                                        Min_Salary, 
-                                                        Max_Salary, 
-                                                        idCompany)
-                                  VALUES (%s, %s, %s, %s)''', (line[2], line[5], line[6], idCompany))
-
-                idJob_post = cursor.lastrowid
-
-                cursor.execute('''INSERT INTO Job_location (City, State) 
-                                  VALUES (%s, %s)''', (line[3], line[4]))
-
-                idJob_location = cursor.lastrowid
-
-                cursor.execute('''INSERT INTO Job_post_location (idJob_post, idJob_location) 
-                                  VALUES (%s, %s)''', (idJob_post, idJob_location))
-
-                if line_num % 50 == 0:
-                    logger.info("Committing changes")
-                    my_db.commit()
-                    logger.info("Done committing changes")
+        rows = read_result_rows(data_file)
+        if bulk:
+            bulk_insert_rows(my_db, cursor, rows, batch_size)
+        else:
+            insert_rows(my_db, cursor, rows)
 
     elif where_from.lower() == 'api':
-        sql_query = "SELECT idCompany, Company_name from company"
+        sql_query = "SELECT idCompany, Company_name from Company"
         cursor.execute(sql_query)
         companies = cursor.fetchall()
-        for idx, company in tqdm(companies, desc="Extracting Stocks Data", ncols=100):
 
-            stock_price, market_cap, currency, website, exchange_market = extract_info_API(company[0])
-            sql_query = """INSERT INTO Company_stock_details (Stock_price,
-                                                              Market_cap,
-                                                              Currency ,
-                                                              Website,
-                                                              Ex_Market,
-                                                              idCompany)
-                          VALUES (%s, %s, %s, %s, %s, %s)"""
+        from Stocks_API import StocksEnricher, DEFAULT_CACHE_PATH
+
+        api_params = _load_config('config.json').get('API', {})
+        enricher = StocksEnricher(max_workers=api_params.get('max_workers', 8),
+                                  cache_path=api_params.get('cache_path', DEFAULT_CACHE_PATH))
+        stocks_info = enricher.enrich([company_name for idx, company_name in companies])
+
+        sql_query = """INSERT INTO Company_stock_details (Stock_price,
+                                                          Market_cap,
+                                                          Currency ,
+                                                          Website,
+                                                          Ex_Market,
+                                                          idCompany)
+                      VALUES (%s, %s, %s, %s, %s, %s)"""
+
+        rows = [stocks_info[company_name] + (idx,) for idx, company_name in companies]
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql_query, rows[start:start + batch_size])
+        my_db.commit()
+
+
+@timed()
+@serialized_load
+def bulk_insert_rows(my_db, cursor, rows, batch_size=1000):
+    """
+    Set-based loader: stages the CSV rows into a temporary table, batch_size rows per round trip
+    (executemany is sent as a multi-row INSERT), and moves them into the tables
+    with one INSERT ... SELECT per table.
+    Companies and locations already known (see KeyCache) cost no inserts at all,
+    and job posts already stored (same fingerprint) are skipped.
+    Rows without a company name (which no job post can reference) are rejected and logged.
+    The summary tables (see Analytics_handler) are refreshed for the new job posts, in the same transaction.
+    An auxiliary function to insert_values()
+    """
+    db_name = get_current_database(cursor)
+    KEY_CACHE.warm(cursor, db_name)
+
+    logger.info("Staging the results rows")
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS Staging_jobs")
+    cursor.execute(STAGING_TABLE)
+
+    staging_query = f"INSERT INTO Staging_jobs VALUES ({', '.join(['%s'] * 23)})"
+    batch = []
+    staged = 0
+    skipped = 0
+    rejected = 0
+    new_keys = KeyCache()
+    new_companies = set()
+    new_locations = set()
+    for row_num, line in enumerate(rows, start=1):
+        line = (replace_nans(line)[1:20] + [None] * 19)[:19]
+        line[2], line[3] = line[2] or '', line[3] or ''
+        company, location = line[0], (line[2], line[3])
+        if company is None:
+            rejected += 1
+            continue
+
+        fingerprint = job_fingerprint(*line[:6])
+        if fingerprint in KEY_CACHE.fingerprints or fingerprint in new_keys.fingerprints:
+            skipped += 1
+            continue
+        new_keys.fingerprints.add(fingerprint)
+
+        is_new_company = company not in KEY_CACHE.companies
+        is_new_location = location not in KEY_CACHE.locations
+        if is_new_company:
+            new_companies.add(company)
+        if is_new_location:
+            new_locations.add(location)
+
+        batch.append([row_num] + line + [is_new_company, is_new_location, fingerprint])
+        if len(batch) == batch_size:
+            cursor.executemany(staging_query, batch)
+            staged += len(batch)
+            batch = []
+
+    if batch:
+        cursor.executemany(staging_query, batch)
+        staged += len(batch)
+
+    if rejected:
+        logger.warning(f"Rejected {rejected} rows without a company name")
+    logger.info(f"Staged {staged} rows ({len(new_companies)} new companies, {len(new_locations)} new locations, "
+                f"{skipped} job posts already stored), moving them into the tables")
+    cursor.execute("SELECT COALESCE(MAX(idJob_post), 0) INTO @base_job_post FROM Job_post")
+
+    for sql_query in BULK_INSERT_COMMANDS:
+        cursor.execute(sql_query)
+
+    from Analytics_handler import refresh_summaries
+    cursor.execute("SELECT @base_job_post")
+    refresh_summaries(cursor, cursor.fetchone()[0])
+
+    # The ids of the newly inserted entities, cached once committed
+    if new_companies:
+        cursor.execute('''SELECT DISTINCT c.Company_name, c.idCompany
+                          FROM Company c JOIN Staging_jobs s ON s.Company_name = c.Company_name
+                          WHERE s.is_new_company''')
+        new_keys.companies.update(cursor.fetchall())
+    if new_locations:
+        cursor.execute('''SELECT DISTINCT l.City, l.State, l.idJob_location
+                          FROM Job_location l JOIN Staging_jobs s ON s.City = l.City AND s.State = l.State
+                          WHERE s.is_new_location''')
+        new_keys.locations.update({(city, state): id_location for city, state, id_location in cursor.fetchall()})
+
+    cursor.execute("DROP TEMPORARY TABLE Staging_jobs")
+    my_db.commit()
+    KEY_CACHE.merge(new_keys)
+    logger.info("Done committing changes")
+
+    return staged
+
+
+@timed()
+@serialized_load
+def insert_rows(my_db, cursor, rows):
+    """
+    Row by row loader: upserts the company (and its ratings) and the location by their natural keys,
+    unless they are already in the KeyCache, then inserts the job post (unless already stored).
+    Commits every 50 rows (the keys inserted are cached once committed),
+    and refreshes the summary tables (see Analytics_handler) at the end.
+    An auxiliary function to insert_values()
+    """
+    from Analytics_handler import last_job_post, refresh_summaries
+
+    KEY_CACHE.warm(cursor, get_current_database(cursor))
+    since_job_post = last_job_post(cursor)
+    new_keys = KeyCache()
+
+    for line_num, line in enumerate(rows):
+        line = replace_nans(line)
+        ratings_data = line[13:20]
+        if line[1] is None:
+            logger.warning(f"Rejected row {line_num}: no company name")
+            continue
+
+        fingerprint = job_fingerprint(*line[1:7])
+        if fingerprint in KEY_CACHE.fingerprints or fingerprint in new_keys.fingerprints:
+            continue
+        new_keys.fingerprints.add(fingerprint)
+
+        idCompany = KEY_CACHE.companies.get(line[1], new_keys.companies.get(line[1]))
+        if idCompany is None:
+            cursor.execute('''INSERT INTO Company (Company_name,
+                                                   Size, 
+                                                   Revenue,
+                                                   Sector, 
+                                                   Industry,
+                                                   Type, 
+                                                   Founded
+                                                   ) 
+                              VALUES (%s, %s, %s, %s, %s, %s, %s)
+                              ON DUPLICATE KEY UPDATE idCompany = LAST_INSERT_ID(idCompany)''',
+                           (line[1], line[7], line[12], line[11], line[10], line[9], line[8]))
+
+            idCompany = cursor.lastrowid
+
+            cursor.execute('''INSERT INTO Ratings (
+                                                    Overall,
+                                                   `Culture & Values`, 
+                                                   `Diversity & Inclusion`,
+                                                   `Work/Life Balance`,  
+                                                   `Senior Management`,
+                                                   `Comp & Benefits`,
+                                                   `Career Opportunities`,
+                                                   idCompany)
+                             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                             ON DUPLICATE KEY UPDATE idRatings = LAST_INSERT_ID(idRatings)''',
+                           ratings_data + [idCompany])
+
+            idRatings = cursor.lastrowid
+
+            cursor.execute("UPDATE Company SET idRatings = %s WHERE idCompany = %s", (idRatings, idCompany))
+            new_keys.companies[line[1]] = idCompany
+
+        cursor.execute('''INSERT INTO Job_post (Job_Title, 
+                                                Min_Salary, 
+                                                Max_Salary, 
+                                                idCompany,
+                                                Fingerprint)
+                          VALUES (%s, %s, %s, %s, %s)''', (line[2], line[5], line[6], idCompany, fingerprint))
+
+        idJob_post = cursor.lastrowid
+
+        location = (line[3] or '', line[4] or '')
+        idJob_location = KEY_CACHE.locations.get(location, new_keys.locations.get(location))
+        if idJob_location is None:
+            cursor.execute('''INSERT INTO Job_location (City, State) 
+                              VALUES (%s, %s)
+                              ON DUPLICATE KEY UPDATE idJob_location = LAST_INSERT_ID(idJob_location)''',
+                           location)
+
+            idJob_location = cursor.lastrowid
+            new_keys.locations[location] = idJob_location
+
+        cursor.execute('''INSERT INTO Job_post_location (idJob_post, idJob_location) 
+                          VALUES (%s, %s)''', (idJob_post, idJob_location))
+
+        if line_num % 50 == 0:
+            logger.info("Committing changes")
+            my_db.commit()
+            KEY_CACHE.merge(new_keys)
+            new_keys = KeyCache()
+            logger.info("Done committing changes")
+
+    refresh_summaries(cursor, since_job_post)
+    my_db.commit()
+    KEY_CACHE.merge(new_keys)
+
+
+@connect
+def get_known_fingerprints(my_db, cursor, db_name):
+    """
+    Get the fingerprints of all the job posts already stored in the database
+    (an empty set if the database doesn't exist yet)
+    """
+    cursor.execute("SHOW DATABASES LIKE %s", (db_name,))
+    if not cursor.fetchall():
+        return set()
+
+    cursor.execute(f"USE {db_name}")
+    cursor.execute("SHOW TABLES LIKE 'Job_post'")
+    if not cursor.fetchall():
+        return set()
+    add_natural_keys(my_db, cursor, db_name)
+    add_fingerprints(my_db, cursor, db_name)
+
+    cursor.execute("SELECT Fingerprint FROM Job_post WHERE Fingerprint IS NOT NULL")
+    fingerprints = {fingerprint for fingerprint, in cursor.fetchall()}
+    logger.info(f"Found {len(fingerprints)} job posts already stored")
+
+    return fingerprints
+
+
+class DatabaseSink(RecordSink):
+    """
+    Stream the scraped records straight into the database: every batch_size records
+    are loaded by the bulk loader, in their own transaction
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.loaded = 0
+        self._rows = []
 
-            cursor.execute(sql_query, (stock_price, market_cap, currency, website, exchange_market, idx))
+    def prepare(self, record):
+        return record_to_row('', record)
 
-            if idx % 50 == 0:
-                my_db.commit()
+    def write_prepared(self, row):
+        row[0] = self.loaded + len(self._rows)
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Load the buffered records into the database
+        """
+        if not self._rows:
+            return
+
+        db_name = _parse_json('config.json')[3]
+        with session() as (db_connection, mysql_cursor):
+            mysql_cursor.execute(f"USE {db_name}")
+            bulk_insert_rows(db_connection, mysql_cursor, self._rows, self.batch_size)
+        self.loaded += len(self._rows)
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def get_current_database(cursor):
+    """
+    Get the name of the database the cursor currently uses
+    """
+    cursor.execute("SELECT DATABASE()")
+    return cursor.fetchone()[0]
 
 
 def replace_nans(val_list):
@@ -277,13 +885,21 @@ def replace_nans(val_list):
     return fixed_list
 
 
+@functools.lru_cache(maxsize=None)
+def _load_config(json_file):
+    """
+    Internal function for parsing JSON configuration file, only once per file
+    """
+    with open(json_file, 'r') as config_file:
+        return json.load(config_file)
+
+
 def _parse_json(json_file):
     """
     Internal function for parsing JSON configuration file
     This function extracts database parameters out of given JSON file
     """
-    with open(json_file, 'r') as config_file:
-        db_params = json.load(config_file)['Database']
+    db_params = _load_config(json_file)['Database']
 
     host = db_params['host']
     user = db_params['username']
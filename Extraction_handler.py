@@ -0,0 +1,111 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every job of the listing page, with its element (returned as a WebElement) and the texts of its fields
+LISTING_SCRIPT = """
+var text = function (job, selector) {
+    var el = job.querySelector(selector);
+    return el ? el.innerText.trim() : null;
+};
+var jobs = document.querySelectorAll('.jl');
+var data = [];
+for (var i = 0; i < jobs.length; i++) {
+    data.push({'element': jobs[i],
+               'company': text(jobs[i], '.jobHeader'),
+               'location': text(jobs[i], '.loc'),
+               'title': text(jobs[i], '.jobTitle'),
+               'salary': text(jobs[i], '.salaryEstimate'),
+               'rating': text(jobs[i], '.compactStars')});
+}
+return data;
+"""
+
+# Label to value of every entity of the opened Company tab
+COMPANY_TAB_SCRIPT = """
+var entities = document.querySelectorAll('div.infoEntity');
+var data = {};
+for (var i = 0; i < entities.length; i++) {
+    var label = entities[i].querySelector('label');
+    if (label && label.nextElementSibling) {
+        data[label.innerText.trim()] = label.nextElementSibling.innerText.trim();
+    }
+}
+return data;
+"""
+
+# [rating type, rating value] pairs of the opened Rating tab
+RATING_TAB_SCRIPT = """
+var items = document.querySelectorAll('div.stars ul li');
+var data = [];
+for (var i = 0; i < items.length; i++) {
+    var type = items[i].querySelector('span.ratingType');
+    var value = items[i].querySelector('span.ratingValue span.ratingNum');
+    if (type && value) {
+        data.push([type.innerText.trim(), value.innerText.trim()]);
+    }
+}
+return data;
+"""
+
+
+def extract_listing(driver):
+    """
+    Extract every job of the listing page the driver is at, in a single WebDriver command.
+    Returns a dict per job: its element, and the texts of its company, location, title, salary and rating
+    (None when missing)
+    """
+    return driver.execute_script(LISTING_SCRIPT)
+
+
+def extract_company_tab(driver):
+    """
+    Extract the opened Company tab (label to value of its entities), in a single WebDriver command
+    """
+    return driver.execute_script(COMPANY_TAB_SCRIPT)
+
+
+def extract_rating_tab(driver):
+    """
+    Extract the opened Rating tab ([rating type, rating value] pairs), in a single WebDriver command
+    """
+    return driver.execute_script(RATING_TAB_SCRIPT)
+
+
+class CommandCounter:
+    """
+    Count the WebDriver commands (HTTP round trips to the driver) a driver sends, by command name.
+    Wraps driver.execute, which the elements found by the driver go through as well
+    """
+
+    def __init__(self, driver):
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._execute = driver.execute
+        driver.execute = self._counted_execute
+
+    def _counted_execute(self, driver_command, params=None):
+        with self._lock:
+            self.counts[driver_command] = self.counts.get(driver_command, 0) + 1
+
+        return self._execute(driver_command, params)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def report(self, jobs, label=""):
+        """
+        Log and print the amount of commands sent, in total, per job and by command name (most sent first)
+        """
+        per_job = self.total / jobs if jobs else 0
+        lines = [f"WebDriver commands{f' ({label})' if label else ''}: {self.total} for {jobs} jobs, "
+                 f"{per_job:.1f} per job"]
+        for command, count in sorted(self.counts.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"\t{command:<28}{count:>8}{count / jobs if jobs else 0:>8.1f} per job")
+        message = '\n'.join(lines)
+        logger.info(message)
+        print(message)
+
+        return {'total': self.total, 'per_job': per_job, 'commands': dict(self.counts)}
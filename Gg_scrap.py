@@ -3,22 +3,33 @@ import argparse
 import logging
 import sys
 import json
-from Scraping_handler import do_scraping
-from Results_handler import create_csv_res_file
-from Database import create_database, create_scarping_tables, create_api_table, insert_values
+import csv
+import re
+from Checkpoint_handler import DEFAULT_CHECKPOINT_PATH
+from Results_handler import make_sink, TeeSink
+from Timing_handler import TIMINGS, DEFAULT_PROFILE_PATH
+from Resilience_handler import ERRORS
+# The scraping (selenium, BeautifulSoup) and database (mysql) modules are imported by the command paths using them
 
 
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
 
-file_handler = logging.FileHandler('glassdoor_scraping.log', encoding='utf8', mode='w')
-file_handler.setLevel(logging.DEBUG)
 
-file_format = logging.Formatter("'%(asctime)s - %(levelname)s - In: %(filename)s - LINE: %(lineno)d - %(funcName)s- "
-                                "-%(message)s'")
-file_handler.setFormatter(file_format)
+def setup_logging():
+    """
+    Log everything into a new glassdoor_scraping.log file.
+    Being called by main() only, so importing this module (e.g. by Benchmarks.py) leaves the log file alone
+    """
+    logger.setLevel(logging.DEBUG)
+
+    file_handler = logging.FileHandler('glassdoor_scraping.log', encoding='utf8', mode='w')
+    file_handler.setLevel(logging.DEBUG)
+
+    file_format = logging.Formatter("'%(asctime)s - %(levelname)s - In: %(filename)s - LINE: %(lineno)d - "
+                                    "%(funcName)s- -%(message)s'")
+    file_handler.setFormatter(file_format)
 
-logger.addHandler(file_handler)
+    logger.addHandler(file_handler)
 
 
 def parse_json():
@@ -33,9 +44,9 @@ def parse_json():
     return configurations
 
 
-def parse_args():
+def parse_args(argv=None):
     """
-    Parse CLI user arguments.
+    Parse CLI user arguments (argv, the command line arguments if None).
     Being used in main()
     """
     logger.info("Parse user CLI parameters")
@@ -51,7 +62,7 @@ def parse_args():
     your glassdoor database exists! 
     """
 
-    usage = """%(prog)s [-h] [-l] [-jt] [-n] [--api] [--headless/-hl]"""
+    usage = """%(prog)s [-h] [-l] [-jt] [-n] [--api] [--headless/-hl] [--workers/-w] [--rate] [--jitter] [--batch_size/-bs] [--incremental] [--resume] [--checkpoint_every] [--company_cache] [--cache_ttl] [--output_format/-of] [--stream_to_db] [--parquet] [--record] [--replay] [--http] [--search_url] [--pipeline] [--queries] [--queue] [--enqueue] [--queue_workers] [--max_attempts] [--retry_delay] [--report]"""
 
     parser = argparse.ArgumentParser(description=desc,
                                      prog='GlassdoorScraper.py',
@@ -69,7 +80,8 @@ def parse_args():
     parser.add_argument('-n', '--number_of_jobs', action='store', type=int, default=None,
                         help="Amount of jobs to scrap, "
                              "if you'll insert 'n' greater than amount of jobs found\n"
-                             "the scraper will simply scrap whatever it founds, obviously")
+                             "the scraper will simply scrap whatever it founds, obviously.\n"
+                             "With several --workers, which jobs fill it depends on timing")
 
     parser.add_argument('-rt', '--rating_threshold', action='store', type=float, default=0,
                         help="Get jobs info above certain overall rating threshold")
@@ -80,50 +92,338 @@ def parse_args():
     parser.add_argument("-hl", "--headless", action='store_true',
                         help="Choose whether or not displaying the google chrome window while scraping")
 
-    args = parser.parse_args()
+    parser.add_argument("-w", "--workers", action='store', type=int, default=1,
+                        help="Amount of Chrome driver instances scraping the result pages in parallel")
+
+    parser.add_argument("--rate", action='store', type=float, default=0.5,
+                        help="Maximal amount of requests per second, over all the workers together")
+
+    parser.add_argument("--jitter", action='store', type=float, default=0.5,
+                        help="Maximal random delay (in seconds) added to the interval between requests")
+
+    parser.add_argument("-bs", "--batch_size", action='store', type=int, default=1000,
+                        help="Amount of rows sent to the database in a single round trip")
+
+    parser.add_argument("--incremental", action='store_true',
+                        help="Keep the existing database and only scrap and insert job posts not already in it")
+
+    parser.add_argument("--resume", action='store_true',
+                        help="Continue an interrupted run from its last checkpoint")
+
+    parser.add_argument("--checkpoint_every", action='store', type=int, default=10,
+                        help="Amount of scraped jobs between two checkpoints")
+
+    parser.add_argument("--company_cache", action='store', type=str, default=None,
+                        help="JSON file persisting the companies' tabs data between runs "
+                             "(the companies are cached only for the current run if not given)")
+
+    parser.add_argument("--cache_ttl", action='store', type=float, default=7 * 24 * 3600,
+                        help="Seconds a cached company remains valid")
+
+    parser.add_argument("-of", "--output_format", action='store', choices=['csv', 'jsonl'], default='csv',
+                        help="Format of the results file")
+
+    parser.add_argument("--stream_to_db", action='store_true',
+                        help="Load the jobs into the database while scraping, rather than once the scraping is over")
+
+    parser.add_argument("--parquet", action='store_true',
+                        help="Also save the jobs as a typed Parquet dataset, partitioned by run")
+
+    parser.add_argument("--record", action='store', type=str, default=None, metavar='DIR',
+                        help="Save the HTML of every page state scraped into DIR, for replaying the run offline")
+
+    parser.add_argument("--replay", action='store', type=str, default=None, metavar='DIR',
+                        help="Scrap the HTML recorded into DIR by --record instead of the website "
+                             "(no browser, no network)")
+
+    parser.add_argument("--http", action='store_true',
+                        help="Fetch the result and job pages over plain HTTP rather than rendering them in Chrome "
+                             "(falls back to Chrome when the pages need JavaScript)")
+
+    parser.add_argument("--search_url", action='store', type=str, default=None,
+                        help="URL of a Glassdoor search result page, for --http runs without starting Chrome at all")
+
+    parser.add_argument("--pipeline", action='store_true',
+                        help="Normalize and persist the jobs (results file and database) in pipeline stages running "
+                             "alongside the scraping, implies --stream_to_db")
+
+    parser.add_argument("--queries", action='store', type=str, default=None, metavar='FILE',
+                        help="CSV file of searches (job_type,location[,number_of_jobs[,rating_threshold]] lines) "
+                             "to scrap one after the other on the same browser sessions, instead of -jt and -l")
+
+    parser.add_argument("--queue", action='store', type=str, default=None, metavar='PATH',
+                        help="SQLite search queue to scrap the pending searches of, by priority, instead of -jt and -l")
+
+    parser.add_argument("--enqueue", action='store', type=str, default=None, metavar='FILE',
+                        help="CSV file of searches (job_type,location[,number_of_jobs[,rating_threshold[,priority]]] "
+                             "lines) to add to the --queue before scraping it")
+
+    parser.add_argument("--queue_workers", action='store', type=int, default=1,
+                        help="Amount of queued searches scraped at a time (each one by --workers drivers)")
+
+    parser.add_argument("--max_attempts", action='store', type=int, default=3,
+                        help="Amount of times a queued search is attempted before giving up on it")
+
+    parser.add_argument("--retry_delay", action='store', type=float, default=60,
+                        help="Seconds before retrying a failed queued search (doubled on every attempt)")
+
+    parser.add_argument("--report", action='store_true',
+                        help="Regenerate the charts out of the database at the end of the run (see Reports.py)")
+
+    args = parser.parse_args(argv)
+    args.stream_to_db = args.stream_to_db or args.pipeline
 
     logger.info("Parsed successfully")
 
     return args
 
 
+def read_queries(file_path):
+    """
+    Read a file of searches: a CSV file with a job_type,location[,number_of_jobs[,rating_threshold[,priority]]]
+    line per search (empty lines and lines starting with '#' are ignored)
+    """
+    queries = []
+    with open(file_path, newline='', encoding='utf8') as f:
+        for line in csv.reader(f):
+            if not line or not line[0].strip() or line[0].startswith('#'):
+                continue
+            line = [value.strip() for value in line] + [''] * (5 - len(line))
+            queries.append({'job_type': line[0],
+                            'location': line[1] or ' ',
+                            'number_of_jobs': int(line[2]) if line[2] else None,
+                            'rating_threshold': float(line[3]) if line[3] else None,
+                            'priority': int(line[4]) if line[4] else 0})
+
+    return queries
+
+
+def search_slug(job_type, location):
+    """
+    File name friendly identifier of a search
+    """
+    return re.sub(r"\W+", "_", f"{job_type} {location}").strip('_').lower()
+
+
+def get_results_path(configurations, args, slug=None):
+    """
+    Path of the results file, according to the output format (and to the search, in batch mode)
+    """
+    results_path = Path(configurations['Scraping']['results_path'])
+    if slug:
+        results_path = results_path.with_name(f"{results_path.stem}_{slug}{results_path.suffix}")
+    if args.output_format == 'jsonl':
+        results_path = results_path.with_suffix('.jsonl')
+
+    return results_path.as_posix()
+
+
+def make_run_sink(args, configurations, results_path):
+    """
+    Create the sink the scraped jobs are streamed into: the results file, along with the database
+    and the Parquet dataset when requested (through the pipeline when requested)
+    """
+    sinks = [make_sink(results_path, args.output_format)]
+    if args.stream_to_db:
+        from Database import DatabaseSink
+        sinks.append(DatabaseSink(batch_size=args.batch_size))
+    if args.parquet:
+        from Columnar_handler import ParquetSink, DEFAULT_PARQUET_ROOT
+        sinks.append(ParquetSink(configurations['Scraping'].get('parquet_root', DEFAULT_PARQUET_ROOT),
+                                 job_type=args.job_type, location=args.location))
+    sink = TeeSink(*sinks)
+    if args.pipeline:
+        from Pipeline_handler import PipelineSink, DEFAULT_QUEUE_SIZE
+        pipeline_config = configurations.get('Pipeline', {})
+        sink = PipelineSink(sink, normalize_workers=pipeline_config.get('normalize_workers', 1),
+                            queue_size=pipeline_config.get('queue_size', DEFAULT_QUEUE_SIZE))
+
+    return sink
+
+
+def scrape(args, configurations, results_path, known_fingerprints=None, pool=None):
+    """
+    Scrap a search into its sink, returns the amount of jobs written
+    """
+    with make_run_sink(args, configurations, results_path) as sink:
+        if args.http:
+            from Http_fetcher import do_http_scraping
+            return do_http_scraping(args, configurations, sink, known_fingerprints)
+
+        from Scraping_handler import do_scraping
+        return do_scraping(args, configurations, sink, known_fingerprints, pool)
+
+
+def run_search(args, configurations, search, known_fingerprints=None, pool=None):
+    """
+    Scrap a single search of a batch or of the queue (a dictionary holding its job_type and location,
+    and optionally its number_of_jobs and rating_threshold, overriding the CLI ones) into the database.
+    The search gets its own results file and checkpoint. Returns the amount of jobs written
+    """
+    slug = search_slug(search['job_type'], search['location'])
+    search_args = argparse.Namespace(**vars(args))
+    search_args.job_type, search_args.location = search['job_type'], search['location']
+    search_args.number_of_jobs = search.get('number_of_jobs') or args.number_of_jobs
+    if search.get('rating_threshold') is not None:
+        search_args.rating_threshold = search['rating_threshold']
+
+    search_config = dict(configurations)
+    checkpoint_path = Path(configurations['Scraping'].get('checkpoint_path', DEFAULT_CHECKPOINT_PATH))
+    search_config['Scraping'] = dict(configurations['Scraping'], checkpoint_path=checkpoint_path.with_name(
+        f"{checkpoint_path.stem}_{slug}{checkpoint_path.suffix}").as_posix())
+
+    results_path = get_results_path(configurations, args, slug)
+    print(f"Searching {search['job_type']} in {search['location']}")
+    jobs_written = scrape(search_args, search_config, results_path, known_fingerprints, pool)
+    logger.info(f"Saved {jobs_written} jobs into {results_path}")
+
+    if not args.stream_to_db:
+        from Database import insert_values
+        insert_values(batch_size=args.batch_size, data_file=results_path)
+
+    return jobs_written
+
+
+def run_batch(args, configurations, known_fingerprints=None):
+    """
+    Scrap the searches of the args.queries file one after the other, on the same warm drivers
+    (Chrome is launched and the website opened only once, for all the searches).
+    Every search gets its own results file and checkpoint, and all of them are loaded into the same database.
+    A failing search (whatever the error) is reported and skipped, and its drivers are replaced by fresh ones
+    """
+    from Scraping_handler import DriverPool
+    from Database import create_database, create_scarping_tables
+
+    queries = read_queries(args.queries)
+    logger.info(f"Batch of {len(queries)} searches")
+
+    create_database(configurations, drop=not args.incremental)
+    create_scarping_tables()
+
+    pool = DriverPool(configurations, args)
+    failed = []
+    try:
+        for search in queries:
+            try:
+                run_search(args, configurations, search, known_fingerprints, pool)
+            except Exception as e:
+                logger.error(f"===Search {search['job_type']} in {search['location']} failed: {e}===")
+                print(e)
+                failed.append(search)
+                # The drivers may be left in any state, the next search gets fresh ones
+                pool.close()
+    finally:
+        pool.close()
+
+    logger.info(f"Batch done: {len(queries) - len(failed)} searches out of {len(queries)}, "
+                f"{pool.launched} drivers launched")
+    print(f"Batch done: {len(queries) - len(failed)} searches out of {len(queries)}, "
+          f"{pool.launched} drivers launched")
+    for search in failed:
+        print(f"Failed: {search['job_type']} in {search['location']}")
+
+
+def run_queue(args, configurations, known_fingerprints=None):
+    """
+    Scrap the searches of the SQLite search queue at args.queue (after adding the searches of the
+    args.enqueue file to it), by priority, args.queue_workers searches at a time.
+    Every worker keeps its own warm drivers, while the rate limit is global (one throttle shared by all).
+    Failed searches are retried later, and the throughput of every search is recorded in the queue.
+    The database is kept between runs, as the queue may span several runs
+    """
+    from Queue_handler import SearchQueue, Scheduler
+    from Scraping_handler import DriverPool, make_throttle
+    from Database import create_database, create_scarping_tables
+
+    queue = SearchQueue(args.queue, retry_delay=args.retry_delay)
+    if args.enqueue:
+        queries = read_queries(args.enqueue)
+        for search in queries:
+            queue.add(search['job_type'], search['location'], search['number_of_jobs'],
+                      search['rating_threshold'], search['priority'], max_attempts=args.max_attempts)
+        logger.info(f"Queued {len(queries)} searches into {args.queue}")
+
+    create_database(configurations, drop=False)
+    create_scarping_tables()
+
+    throttle = make_throttle(args)
+
+    def search_func(search, pool):
+        try:
+            return run_search(args, configurations, search, known_fingerprints, pool)
+        except Exception:
+            # The drivers may be left in any state, the next search gets fresh ones
+            pool.close()
+            raise
+
+    scheduler = Scheduler(queue, search_func, workers=args.queue_workers,
+                          setup=lambda: DriverPool(configurations, args, throttle),
+                          teardown=lambda pool: pool.close())
+    scheduler.run()
+
+
 def main():
     """
     The scarping begins here!
-    Uses function from the Scraping_handler module (imported above)
+    Uses function from the Scraping_handler module (imported by the command paths using it)
     Exceptions thrown in the craping_handler module module, bubbled and caught here
     """
+    setup_logging()
     logger.info("Scraping began")
     args = parse_args()
     configurations = parse_json()
-    try:
-        general_data, company_tab_data, ratings_tab_data = do_scraping(args, configurations)
-    except IOError as e:
-        print(e)
-        logger.error(f"===Something went wrong: {e}===")
-        sys.exit(1)
-    except ValueError as e:
-        logger.error(f"===Something went wrong: {e}===")
-        print(e)
-        sys.exit(1)
-    except KeyboardInterrupt:
-        logger.critical("Program stopped - User aborted")
-        print(f"Script stack - is that why you aborted?")
-        sys.exit(1)
-
-    # Save Final Result
-    try:
-        create_csv_res_file(company_tab_data, general_data, ratings_tab_data,
-                            configurations['Scraping']['results_path'])
-    except Exception as e:
-        print(e)
-        logger.error(f"===Something went wrong: {e}===")
-        sys.exit(1)
-
-    # Create Database
-    create_database(configurations)
-    create_scarping_tables()
-    insert_values()
+
+    from Database import create_database, create_scarping_tables, create_api_table, insert_values
+    from Database import report_connection_metrics, get_known_fingerprints
+
+    known_fingerprints = get_known_fingerprints() if args.incremental else None
+
+    if args.queries or args.queue:
+        try:
+            if args.queue:
+                run_queue(args, configurations, known_fingerprints)
+            else:
+                run_batch(args, configurations, known_fingerprints)
+        except IOError as e:
+            print(e)
+            logger.error(f"===Something went wrong: {e}===")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            logger.critical("Program stopped - User aborted")
+            print("Run the script again with --resume to continue from the last checkpoints")
+            sys.exit(1)
+
+    else:
+        results_path = get_results_path(configurations, args)
+
+        # Create Database (before scraping, when streaming into it)
+        if args.stream_to_db:
+            create_database(configurations, drop=not args.incremental)
+            create_scarping_tables()
+
+        try:
+            jobs_written = scrape(args, configurations, results_path, known_fingerprints)
+        except IOError as e:
+            print(e)
+            logger.error(f"===Something went wrong: {e}===")
+            sys.exit(1)
+        except ValueError as e:
+            logger.error(f"===Something went wrong: {e}===")
+            print(e)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            logger.critical("Program stopped - User aborted")
+            print(f"Script stack - is that why you aborted?")
+            print("Run the script again with --resume to continue from the last checkpoint")
+            sys.exit(1)
+
+        logger.info(f"Saved {jobs_written} jobs into {results_path}")
+
+        # Create Database
+        if not args.stream_to_db:
+            create_database(configurations, drop=not args.incremental)
+            create_scarping_tables()
+            insert_values(batch_size=args.batch_size, data_file=results_path)
 
     # Enrich with API
     if args.api:
@@ -135,6 +435,18 @@ def main():
             print(e)
             sys.exit(1)
 
+    if args.report:
+        from Reports import generate_reports, DEFAULT_OUTPUT_DIR
+
+        report_params = configurations.get('Reports', {})
+        generate_reports(output_dir=report_params.get('output_dir', DEFAULT_OUTPUT_DIR))
+
+    report_connection_metrics()
+    TIMINGS.report(path=configurations['Scraping'].get('profile_path', DEFAULT_PROFILE_PATH),
+                   run_info={'job_type': args.job_type, 'location': args.location, 'workers': args.workers,
+                             'http': args.http, 'pipeline': args.pipeline, 'replay': bool(args.replay),
+                             'errors': ERRORS.report()})
+
 
 if __name__ == "__main__":
     main()
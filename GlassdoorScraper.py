@@ -1,22 +1,19 @@
-from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException
-from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.common.exceptions import StaleElementReferenceException
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium import webdriver
+from Throttle_handler import Throttle
+from Cache_handler import CompanyCache
+from Browser_handler import launch_chrome, document_ready, get_browser_config
+from Timing_handler import TIMINGS, DEFAULT_PROFILE_PATH, timed
+from Resilience_handler import RETRY_POLICY, RETRYABLE, ERRORS, classify, configure_resilience
+from Record_store import RecordStore, TEXT, NUMBER
+from Results_handler import RATING_FIELDS
+from Extraction_handler import extract_listing, extract_company_tab, extract_rating_tab, CommandCounter
 from pathlib import Path
-from Database import *
-import pandas as pd
-import numpy as np
+import functools
 import argparse
 import pathlib
 import logging
-import random
+import math
 import json
-import time
 import sys
-import os
 import re
 
 logger = logging.getLogger(__name__)
@@ -31,31 +28,35 @@ file_handler.setFormatter(file_format)
 
 logger.addHandler(file_handler)
 
+# selenium, pandas and the database modules are imported where used, so that '-h' and '--api' runs don't load them
+NAN = float('nan')
+
+JOB_COLUMNS = [('Company', TEXT), ('City', TEXT), ('State', TEXT), ('Title', TEXT),
+               ('Min Salary', TEXT), ('Max Salary', TEXT), ('Min Company Size', TEXT), ('Max Company Size', TEXT),
+               ('Revenue', TEXT), ('Industry', TEXT)] + \
+              [(field, NUMBER) for field in RATING_FIELDS if field != 'Overall'] + [('Overall Rating', NUMBER)]
+
 
 def retry(func):
     """
-    Wrap any function that has to interact with the web-site.
-    Handles  selenium's StaleElementExceptions and NoSuchElementException
+    Wrap any method that has to interact with the web-site.
+    Retries it on selenium's stale element, timeout and missing element errors (see Resilience_handler),
+    backing off in between and calling the object's refresh() method (if any) before every retry.
+    Other errors are raised right away
     """
+    attempt = timed(func.__name__)(func)
 
-    def func_wrapper(*args, **kwargs):
-        try_number = 1
-        while try_number <= 3:
-            logger.info(f"Executing {func.__name__}, try number: {try_number}")
-            try:
-                return func(*args, **kwargs)
-            except TimeoutException:
-                logger.warning(f"TimeoutException occurred when executing the function: {func.__name__}")
-            except StaleElementReferenceException:
-                logger.warning(f"StaleElementReferenceException when executing the function: {func.__name__}")
-            except Exception as e:
-                logger.warning(f"Exception was thrown when executing the function {func.__name__}\n"
-                                f"{e}")
-
-            try_number += 1
-        else:
-            logger.error(f"Was trying to execute {func.__name__} {try_number} times but FAILED")
-            raise ValueError("Apparently no such element on page or something is missing")
+    @functools.wraps(func)
+    def func_wrapper(self, *args, **kwargs):
+        logger.info(f"Executing {func.__name__}")
+        try:
+            return RETRY_POLICY.call(attempt, self, *args, refresh=getattr(self, 'refresh', None),
+                                     name=func.__name__, **kwargs)
+        except Exception as e:
+            if classify(e) not in RETRYABLE:
+                raise
+            logger.error(f"Was trying to execute {func.__name__} {RETRY_POLICY.attempts} times but FAILED")
+            raise ValueError("Apparently no such element on page or something is missing") from e
 
     return func_wrapper
 
@@ -63,31 +64,17 @@ def retry(func):
 class ScraperManager:
 
     def __init__(self, path, driver_filename, job_title, job_location, rating_filter, number_of_jobs, headless,
-                 baseurl):
+                 baseurl, throttle=None, browser_config=None):
         """
         Construct ScraperManager instance with user CLI arguments
+        :param throttle: Throttle instance pacing the interaction with the website (a default one if None)
+        :param browser_config: Browser section of the configuration (see Browser_handler), regular profile if None
         """
         logger.info(f"Creating ScraperManager with the following parameters:\n"
                      f"path: {path}, driver: {driver_filename}, job: {job_title},\n"
                      f"loc: {job_location}, rating: {rating_filter}, jobs: {number_of_jobs}")
 
-        self.jobs_data = {'Company': [],
-                          'City': [],
-                          'State': [],
-                          'Title': [],
-                          'Min Salary': [],
-                          'Max Salary': [],
-                          'Min Company Size': [],
-                          'Max Company Size': [],
-                          'Revenue': [],
-                          'Industry': []}
-
-        self._non_rating_keys = ['Company',
-                                 'City', 'State',
-                                 'Title',
-                                 'Min Salary', 'Max Salary',
-                                 'Min Company Size', 'Max Company Size',
-                                 'Revenue', 'Industry']
+        self.records = RecordStore(JOB_COLUMNS)
 
         self._title = job_title if job_title else ' '
         self._location = job_location if job_location else ' '
@@ -95,11 +82,12 @@ class ScraperManager:
         self.rating_filter = rating_filter
         self._headless = headless
         self.base_url = baseurl
+        self.throttle = throttle if throttle is not None else Throttle()
+        self.browser_config = browser_config
 
         self._driver_path = driver_filename
         self.driver = self._init_driver()
         self._input_search_params()
-        time.sleep(random.uniform(0.8, 2.5))
         self._total_jobs_found = self._get_amount(of_what='jobs')
         self._total_pages = self._get_amount(of_what='pages')
         if number_of_jobs is not None:
@@ -111,7 +99,7 @@ class ScraperManager:
                      f"Search total pages: {self._total_pages},\n"
                      f"Search total jobs: {self._num_of_jobs}\n")
 
-        self._df = pd.DataFrame()
+        self._df = None
 
     @property
     def number_of_pages(self):
@@ -127,29 +115,27 @@ class ScraperManager:
         """
         return self._num_of_jobs
 
-    def _init_driver(self) -> webdriver.Chrome:
+    def _init_driver(self):
         """
         Initiating Chromedriver instance for interacting with the website
         Being used as soon as ScraperManager object created (in the __init__ function)
         """
+        from selenium.common.exceptions import WebDriverException
+
         logger.info("Initiating Chromedriver instance")
 
-        options = webdriver.ChromeOptions()
-        options.add_argument('--ignore-certificate-errors')
-        options.add_argument('--incognito')
-        if self._headless:
-            options.add_argument('--headless')
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
         driver_path = Path.cwd().joinpath(self._driver_path)
         if isinstance(driver_path, pathlib.WindowsPath):
             driver_path = driver_path.with_suffix(".exe")
         try:
-            driver = webdriver.Chrome(executable_path=driver_path.as_posix(), options=options)
+            driver = launch_chrome(driver_path.as_posix(), self._headless, self.browser_config)
         except WebDriverException:
             raise IOError("Make sure you are using proper chrome driver\n"
                           "and/or you've inserted its name properly (including the file suffix if needed)")
 
+        self.throttle.pause()
         driver.get(self.base_url)
+        self.throttle.wait_for(driver, document_ready)
 
         logger.info("Successfully created Chromedriver instance")
 
@@ -163,6 +149,8 @@ class ScraperManager:
         Bypass the signup/login pop-up (if present)
         Used as part of the Chromedriver initialization (in the _init_driver() function)
         """
+        from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException
+
         logger.info("Bypassing the 'sign in' pop up")
 
         try:
@@ -182,19 +170,21 @@ class ScraperManager:
         Establishes website interaction for inserting the user's search parameters
         Being used in the __init__() function
         """
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.common.by import By
+
         logger.info(f"Inserting search parameters: \n"
                      f"job: {self._title}, location: {self._location}")
 
         self.driver.find_element_by_xpath('.//input[@name="sc.keyword"]').clear()
         self.driver.find_element_by_xpath('.//input[@name="sc.keyword"]').send_keys(self._title)
 
-        time.sleep(random.uniform(1, 1.5))
-
         self.driver.find_element_by_xpath('.//input[@id="sc.location"]').clear()
         self.driver.find_element_by_xpath('.//input[@id="sc.location"]').send_keys(self._location)
 
-        time.sleep(random.uniform(1, 1.5))
+        self.throttle.pause()
         self.driver.find_element_by_xpath('.//button[@id="HeroSearchButton"]').click()
+        self.throttle.wait_for(self.driver, EC.presence_of_element_located((By.CLASS_NAME, "jl")))
 
         logger.info("Successfully inserted search parameters")
 
@@ -204,6 +194,10 @@ class ScraperManager:
         Scrap the website for finding the total amount of jobs and pages
         matches the user's search criteria
         """
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.common.by import By
+
         if of_what == 'jobs':
             pattern = r"(^\d+)"
             xpath = './/div[@data-test="jobCount-H1title"]'
@@ -238,139 +232,122 @@ class ScraperManager:
 
         return jobs
 
+    def extract_jobs_on_page(self) -> list:
+        """
+        Gets all the jobs listing in a certain search page along with their common parameters,
+        in a single WebDriver command (see Extraction_handler.extract_listing())
+        Used in the main() function
+        """
+        logger.debug("Extracting the jobs of the page")
+        listing = extract_listing(self.driver)
+        logger.debug(f"Found overall {len(listing)} jobs on page")
+
+        return listing
+
     @retry
     def click_tab(self, tab_name):
         """
         Interacts with the website for clicking on given tab_name
         :param tab_name: str - Tab name to click on
         """
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.common.by import By
+
         if tab_name.lower() == 'company':
             xpath = './/div[@class="tab" and @data-tab-type="overview"]'
+            loaded = EC.presence_of_element_located((By.ID, "EmpBasicInfo"))
         elif tab_name.lower() == 'rating':
             xpath = './/div[@class="tab" and @data-tab-type="rating"]'
+            loaded = EC.presence_of_element_located((By.XPATH, './/div[@class="stars"]/ul'))
         elif tab_name.lower() == 'next':
             xpath = './/a[@data-test="pagination-next"]'
+            loaded = EC.staleness_of(self.driver.find_element_by_class_name("jl"))
         else:
             raise ValueError("tab_name should be among [company, rating, next]")
 
         wait = WebDriverWait(self.driver, 2)
-        wait.until(EC.presence_of_element_located(
-            (By.XPATH, xpath))).click()
+        button = wait.until(EC.presence_of_element_located(
+            (By.XPATH, xpath)))
 
-        time.sleep(random.uniform(0.8, 2.2))
+        self.throttle.pause()
+        button.click()
+        self.throttle.wait_for(self.driver, loaded)
 
-    def fill_dict(self, job_obj):
+    def add_job(self, job_obj):
         """
-        Fill the jobs_data data structure with the job information in job_obj
+        Store the job information in job_obj (ratings included), once the job is fully scraped
         Being used in main()
         :param job_obj: Job instance
         """
-        logger.info("Filling the jobs info data structure")
-
-        self.jobs_data['Company'].append(job_obj.company_name)
-        self.jobs_data['City'].append(job_obj.job_city)
-        self.jobs_data['State'].append(job_obj.job_state)
-        self.jobs_data['Title'].append(job_obj.job_title)
-        self.jobs_data['Min Salary'].append(job_obj.job_min_salary)
-        self.jobs_data['Max Salary'].append(job_obj.job_max_salary)
-        self.jobs_data['Min Company Size'].append(job_obj.min_company_size)
-        self.jobs_data['Max Company Size'].append(job_obj.max_company_size)
-        self.jobs_data['Revenue'].append(job_obj.company_revenue)
-        self.jobs_data['Industry'].append(job_obj.company_industry)
-
-        logger.info("Done filling the jobs info data structure")
-
-    def update_nans(self):
-        """
-        This function executed if certain job has no information on its company rating!
-        Updates the jobs_data data structure with nans where needed.
-        Being used in main()
-        """
-        for key in self.jobs_data.keys():
-            if key not in self._non_rating_keys:
-                self.jobs_data[key].append(np.nan)
-
-    def update_jobs_data(self, rating_dict):
-        """
-        Updates the jobs_data data structure according to the job's ratings scores.
-        If the jobs_data doesn't already contains certain rating field,
-        create new key for it and use pad_with_nans() for inserting NaNs at the beginning.
-        Used in main()
-        """
-
-        for rating_label, score in rating_dict.items():
-            if rating_label in self.jobs_data:
-                self.jobs_data[rating_label].append(score)
-            else:
-                self.jobs_data[rating_label] = []
-                self.pad_with_nans(rating_label)
-                self.jobs_data[rating_label].append(score)
-
-        self.update_nans_for_existing(rating_dict)
+        logger.info("Storing the job's information")
 
-    def pad_with_nans(self, field):
-        """
-        Used by update_jobs_data() for padding the beginning of a given list with NaNs
-        """
-        for company in self.jobs_data['Company'][:-1]:
-            self.jobs_data[field].append(np.nan)
+        record = {'Company': job_obj.company_name,
+                  'City': job_obj.job_city,
+                  'State': job_obj.job_state,
+                  'Title': job_obj.job_title,
+                  'Min Salary': job_obj.job_min_salary,
+                  'Max Salary': job_obj.job_max_salary,
+                  'Min Company Size': job_obj.min_company_size,
+                  'Max Company Size': job_obj.max_company_size,
+                  'Revenue': job_obj.company_revenue,
+                  'Industry': job_obj.company_industry}
+        record.update(job_obj.ratings)
+        self.records.append(record)
 
-    def update_nans_for_existing(self, rating_dict):
-        """
-        Append NaNs to a given dictionary key's list.
-        Being used by update_jobs_data()
-        """
-        for field, list_of_vals in self.jobs_data.items():
-            if field not in rating_dict and field not in self._non_rating_keys:
-                self.jobs_data[field].append(np.nan)
+        logger.info("Done storing the job's information")
 
     def create_dataframe(self):
         """
         Create Pandas DataFrame out of the scraping results
         Being used in main()
         """
-
-        self._df = pd.DataFrame(self.jobs_data)
+        self._df = self.records.to_dataframe()
 
     def save_results(self):
         """
         Save scraping result to CSV file
         """
-        if os.path.exists(self._res_path):
-            os.remove(self._res_path)
-
-        with open(self._res_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(self.jobs_data.keys())
-            writer.writerows(zip(*self.jobs_data.values()))
-
-        # self._df.to_csv(self._res_path)
+        self.records.to_csv(self._res_path)
 
 
 class Job:
 
-    def __init__(self, job_tag, driver):
+    def __init__(self, job_tag, driver, index=None):
         """
         Constructing Job instance
         Holds information for a certain job
         :param job_tag: HTML tag
+        :param index: position of the job on the page, for locating its tag again once stale (see refresh())
         """
         self._job_tag = job_tag
         self._driver = driver
-
-        self.company_name = np.nan
-        self.job_city = np.nan
-        self.job_state = np.nan
-        self.job_title = np.nan
-        self.job_min_salary = np.nan
-        self.job_max_salary = np.nan
-        self.min_company_size = np.nan
-        self.max_company_size = np.nan
-        self.company_industry = np.nan
-        self.company_revenue = np.nan
-        self.overall_rating = np.nan
+        self._index = index
+
+        self.company_name = NAN
+        self.job_city = NAN
+        self.job_state = NAN
+        self.job_title = NAN
+        self.job_min_salary = NAN
+        self.job_max_salary = NAN
+        self.min_company_size = NAN
+        self.max_company_size = NAN
+        self.company_industry = NAN
+        self.company_revenue = NAN
+        self.overall_rating = NAN
         self.ratings = {}
 
+    def refresh(self):
+        """
+        Locate the job's tag again (after the page re-rendered the jobs list), before retrying
+        """
+        if self._index is None:
+            return
+
+        jobs = self._driver.find_elements_by_class_name("jl")
+        if self._index < len(jobs):
+            self._job_tag = jobs[self._index]
+
     @retry
     def click(self):
         """
@@ -386,12 +363,14 @@ class Job:
         Extract common job parameters: company name, city, state, job title and salary
         Used in main() function
         """
+        from selenium.common.exceptions import NoSuchElementException
+
         logger.info("Extracting job information")
 
         self.company_name = self._job_tag.find_element_by_class_name("jobHeader").text
         job_location = self._job_tag.find_element_by_class_name('loc').text.split(',')
         self.job_city = job_location[0]
-        self.job_state = job_location[1] if len(job_location) > 1 else np.nan
+        self.job_state = job_location[1] if len(job_location) > 1 else NAN
         self.job_title = self._job_tag.find_element_by_class_name('jobTitle').text
 
         self._get_salary_range()
@@ -401,6 +380,32 @@ class Job:
         except NoSuchElementException:
             pass
 
+        self._log_common_params()
+
+    def load_common_params(self, job_data):
+        """
+        Load the common job parameters out of the job's entry of the listing page, as extracted by
+        ScraperManager.extract_jobs_on_page() (no WebDriver command)
+        Used in main() function
+        """
+        if job_data['company'] is not None:
+            self.company_name = job_data['company']
+        if job_data['location'] is not None:
+            job_location = job_data['location'].split(',')
+            self.job_city = job_location[0]
+            self.job_state = job_location[1] if len(job_location) > 1 else NAN
+        if job_data['title'] is not None:
+            self.job_title = job_data['title']
+        if job_data['salary'] is not None:
+            self._set_salary_range(job_data['salary'])
+        try:
+            self.overall_rating = float(job_data['rating'])
+        except (TypeError, ValueError):
+            pass
+
+        self._log_common_params()
+
+    def _log_common_params(self):
         logger.info(f"Successfully extracted job's information:\n"
                      f"Job: {self.job_title}, Company name: {self.company_name}\n"
                      f"City: {self.job_city}, State: {self.job_state}\n"
@@ -411,14 +416,23 @@ class Job:
         Scrap the job instance for salary range (if present)
         Being used in get_common_params() function
         """
+        from selenium.common.exceptions import NoSuchElementException
 
         try:
             job_salary_estim = self._job_tag.find_element_by_class_name('salaryEstimate').text
-            salary_range = re.findall(r"\$(\d+\w*)\S+\$(\d+\w*)", str(job_salary_estim))
+        except NoSuchElementException:
+            return
+
+        self._set_salary_range(job_salary_estim)
+
+    def _set_salary_range(self, job_salary_estim):
+        """
+        Parse the salary range out of the job's salary estimate text
+        """
+        salary_range = re.findall(r"\$(\d+\w*)\S+\$(\d+\w*)", str(job_salary_estim))
+        if salary_range:
             self.job_min_salary = salary_range[0][0]
             self.job_max_salary = salary_range[0][1]
-        except NoSuchElementException:
-            pass
 
     @retry
     def get_non_common_params(self):
@@ -427,6 +441,8 @@ class Job:
         appears in other job web-page.
         Used in main()
         """
+        from selenium.common.exceptions import NoSuchElementException
+
         logger.info("Extracting more Job's features")
         try:
             company_size = self._driver.find_element_by_xpath(
@@ -455,11 +471,54 @@ class Job:
         except NoSuchElementException:
             pass
 
+        self._log_non_common_params()
+
+    @retry
+    def load_non_common_params(self):
+        """
+        Same as get_non_common_params(), reading the whole opened Company tab
+        in a single WebDriver command (see Extraction_handler.extract_company_tab())
+        Used in main()
+        """
+        logger.info("Extracting more Job's features")
+        entities = extract_company_tab(self._driver)
+
+        if 'Size' in entities:
+            size_range = re.findall(r"(\d+)", entities['Size'])
+            if len(size_range) > 1:
+                self.min_company_size, self.max_company_size = size_range[0], size_range[1]
+            else:
+                logger.warning(f"Unexpected company size: {entities['Size']}")
+                self.min_company_size = '10000'
+                self.max_company_size = '100000'
+        self.company_industry = entities.get('Industry', self.company_industry)
+        self.company_revenue = entities.get('Revenue', self.company_revenue)
+
+        self._log_non_common_params()
+
+    def _log_non_common_params(self):
         logger.info(f"Successfully extracted additional job's info\n"
                      f"Company size: {self.min_company_size} - {self.max_company_size}\n"
                      f"Industry: {self.company_industry}\n"
                      f"Revenue: {self.company_revenue}")
 
+    def company_info(self):
+        """
+        Export the company related information (Company and Rating tabs), for caching it
+        """
+        return {'min_company_size': self.min_company_size,
+                'max_company_size': self.max_company_size,
+                'company_industry': self.company_industry,
+                'company_revenue': self.company_revenue}, self.ratings
+
+    def load_company_info(self, company_data, ratings):
+        """
+        Load the company related information from the cache, instead of scraping the tabs
+        """
+        for field, value in company_data.items():
+            setattr(self, field, value)
+        self.ratings = dict(ratings)
+
     @retry
     def get_ratings_scores(self):
         """
@@ -479,7 +538,22 @@ class Job:
 
         rating_values = tuple(map(lambda item: float(item.text), raw_rating_values))
 
-        self.ratings = dict(zip(rating_parameters, rating_values))
+        self._set_ratings(zip(rating_parameters, rating_values))
+
+    @retry
+    def load_ratings_scores(self):
+        """
+        Same as get_ratings_scores(), reading the whole opened Rating tab
+        in a single WebDriver command (see Extraction_handler.extract_rating_tab())
+        """
+        logger.info("Scraping for Ratings scores")
+        self._set_ratings((rating_type, float(value)) for rating_type, value in extract_rating_tab(self._driver))
+
+    def _set_ratings(self, ratings):
+        """
+        Store the (rating type, score) pairs, along with their average as the overall rating
+        """
+        self.ratings = dict(ratings)
         if len(self.ratings):
             overall_rating = float(round(sum(self.ratings.values()) / len(self.ratings), 2))
 
@@ -506,7 +580,7 @@ def parse_args():
     your glassdoor database exists! 
     """
 
-    usage = """%(prog)s [-h] [-l] [-jt] [-n] [--api] [--headless/-hl] [--verbose/-v] """
+    usage = """%(prog)s [-h] [-l] [-jt] [-n] [--api] [--headless/-hl] [--verbose/-v] [--rate] [--jitter] [--company_cache] [--cache_ttl] [--per_element] """
 
     parser = argparse.ArgumentParser(description=desc,
                                      prog='GlassdoorScraper.py',
@@ -538,6 +612,23 @@ def parse_args():
     parser.add_argument('-v', '--verbose', action='store_true',
                         help="Optional - Choose either printing output to std or not")
 
+    parser.add_argument("--rate", action='store', type=float, default=0.5,
+                        help="Maximal amount of requests per second")
+
+    parser.add_argument("--jitter", action='store', type=float, default=0.5,
+                        help="Maximal random delay (in seconds) added to the interval between requests")
+
+    parser.add_argument("--company_cache", action='store', type=str, default=None,
+                        help="JSON file persisting the companies' tabs data between runs "
+                             "(the companies are cached only for the current run if not given)")
+
+    parser.add_argument("--cache_ttl", action='store', type=float, default=7 * 24 * 3600,
+                        help="Seconds a cached company remains valid")
+
+    parser.add_argument("--per_element", action='store_true',
+                        help="Extract the jobs element by element (a WebDriver command per field) rather than "
+                             "a single command per page and per opened tab, for comparing the commands per job")
+
     args = parser.parse_args()
 
     # args = parser.parse_args(['res.csv', 'chromedriver.exe', '-l', 'San Francisco', '-jt', 'data scientist',
@@ -556,7 +647,8 @@ def check_arguments(args):
     trues = []
     for arg in vars(args):
         arg_val = getattr(args, arg)
-        if arg_val and arg not in ['headless', 'verbose']:
+        if arg_val and arg not in ['headless', 'verbose', 'rate', 'jitter', 'company_cache', 'cache_ttl',
+                                   'per_element']:
             trues.append(arg)
     return trues
 
@@ -571,6 +663,8 @@ def main():
     args = parse_args()
     trues_args = check_arguments(args)
 
+    from Database import create_database, create_scarping_tables, create_api_table, insert_values
+
     # In case only the --api flag was passed
     if len(trues_args) == 1 and trues_args[0] == 'api':
         create_api_table()
@@ -580,6 +674,7 @@ def main():
 
         with open('config.json') as config_file:
             configurations = json.load(config_file)
+        configure_resilience(configurations.get('Resilience'))
 
         chromedriver_path = configurations['Scraping']['chromedriver']
         results_path = configurations['Scraping']['results_path']
@@ -589,7 +684,10 @@ def main():
             sm = ScraperManager(path=results_path, driver_filename=chromedriver_path,
                                 job_title=args.job_type, job_location=args.location,
                                 rating_filter=args.rating_threshold, number_of_jobs=args.number_of_jobs,
-                                headless=args.headless, baseurl=base_url)
+                                headless=args.headless, baseurl=base_url,
+                                throttle=Throttle(min_interval=1 / args.rate if args.rate else 0,
+                                                  jitter=args.jitter),
+                                browser_config=get_browser_config(configurations))
         except IOError as e:
             logger.error(f"Failed due to: {e}")
             sys.exit(1)
@@ -601,28 +699,37 @@ def main():
             logger.error(f"Failed due to: {e}")
             sys.exit(1)
 
+        company_cache = CompanyCache(args.company_cache, ttl=args.cache_ttl)
+        commands = CommandCounter(sm.driver)
+
         job_id = 0
         while job_id < sm.num_of_jobs:
 
-            jobs = sm.find_jobs_on_page()
+            if args.per_element:
+                jobs = sm.find_jobs_on_page()
+            else:
+                listing = sm.extract_jobs_on_page()
+                jobs = [job_data['element'] for job_data in listing]
 
-            for job in jobs:
+            for index, job in enumerate(jobs):
 
-                job_obj = Job(job, sm.driver)
-                job_obj.click()
+                job_obj = Job(job, sm.driver, index)
 
                 if job_id >= sm.num_of_jobs:
                     break
 
                 try:
-                    job_obj.get_common_params()
+                    if args.per_element:
+                        job_obj.get_common_params()
+                    else:
+                        job_obj.load_common_params(listing[index])
                 except Exception as e:
                     print(f"Failed due to {e}")
                     sm.driver.close()
                     sys.exit(1)
 
                 if (job_obj.overall_rating >= args.rating_threshold) or \
-                        (np.isnan(job_obj.overall_rating) and args.rating_threshold == 0):
+                        (math.isnan(job_obj.overall_rating) and args.rating_threshold == 0):
 
                     logger.info(f"Scraping job number {job_id + 1} out of {sm.num_of_jobs}")
 
@@ -635,28 +742,43 @@ def main():
                               f"\tState: {job_obj.job_state}\n"
                               f"\tSalary: {job_obj.job_min_salary}-{job_obj.job_max_salary}")
 
-                    try:
-                        sm.click_tab('company')
-                    except ValueError:
-                        pass
-                    finally:
-                        job_obj.get_non_common_params()
+                    cached = company_cache.get(job_obj.company_name)
+                    # Only the tabs data scraped successfully is cached
+                    complete = True
+                    if cached is not None:
+                        job_obj.load_company_info(*cached)
+                    else:
+                        job_obj.click()
+                        try:
+                            sm.click_tab('company')
+                        except ValueError:
+                            complete = False
+                        finally:
+                            if args.per_element:
+                                job_obj.get_non_common_params()
+                            else:
+                                job_obj.load_non_common_params()
 
                     if args.verbose:
                         print(f"\tCompany Size: {job_obj.min_company_size} to {job_obj.max_company_size}")
                         print(f"\tIndustry: {job_obj.company_industry}\n")
 
-                    sm.fill_dict(job_obj)
-
                     logger.info("Generating the Ratings dict")
-                    try:
-                        sm.click_tab('rating')
-                    except ValueError:
-                        sm.update_nans()
-                    else:
-                        job_obj.get_ratings_scores()
-                        sm.update_jobs_data(job_obj.ratings)
+                    if cached is None:
+                        try:
+                            sm.click_tab('rating')
+                        except ValueError:
+                            job_obj.ratings = {}
+                        else:
+                            if args.per_element:
+                                job_obj.get_ratings_scores()
+                            else:
+                                job_obj.load_ratings_scores()
+                        if complete:
+                            company_cache.put(job_obj.company_name, *job_obj.company_info())
+
                     logger.info("Done generate the ratings dict")
+                    sm.add_job(job_obj)
 
                     job_id += 1
 
@@ -664,6 +786,10 @@ def main():
 
         sm.create_dataframe()
         sm.save_results()
+        sm.throttle.report()
+        command_counts = commands.report(len(sm.records), 'per element' if args.per_element else 'batched')
+        company_cache.save()
+        company_cache.report()
         logger.info("Done Scraping!")
 
         """Creating the Database"""
@@ -675,6 +801,10 @@ def main():
             create_api_table()
             insert_values(where_from='api')
 
+        TIMINGS.report(path=configurations['Scraping'].get('profile_path', DEFAULT_PROFILE_PATH),
+                       run_info={'job_type': args.job_type, 'location': args.location,
+                                 'errors': ERRORS.report(), 'webdriver_commands': command_counts})
+
 
 if __name__ == "__main__":
     main()
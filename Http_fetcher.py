@@ -0,0 +1,328 @@
+from Scraping_handler import get_common_data, extract_company_data, extract_rating_data, get_num_of_matched_jobs
+from Scraping_handler import get_num_of_pages, get_page_url, get_chromedriver_path, initiate_driver, set_html_parser
+from Scraping_handler import start_run, close_run, report_run, do_scraping, make_throttle, JOBS_LIST_ID, BASE_URL
+from Scraping_handler import launch_driver
+import Scraping_handler
+from Throttle_handler import BLOCK_MARKERS
+from Browser_handler import get_browser_config
+from Timing_handler import timed
+from Resilience_handler import BlockedPage, retrying, configure_resilience, ERRORS
+from Results_handler import job_fingerprint
+from Session_handler import make_session
+from Pipeline_handler import Pipeline, Stage, DEFAULT_QUEUE_SIZE
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.by import By
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+import threading
+import requests
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                         "Chrome/87.0.4280.88 Safari/537.36",
+           'Accept': "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+           'Accept-Language': "en-US,en;q=0.9",
+           'Accept-Encoding': "gzip, deflate"}
+BLOCK_STATUS_CODES = (403, 429, 503)
+GONE_STATUS_CODES = (404, 410)
+
+
+class JavaScriptRequired(ValueError):
+    """
+    Raised when a page fetched over HTTP lacks the content the scraper needs (rendered by JavaScript,
+    or replaced by a block page)
+    """
+    pass
+
+
+def make_http_session(pool_size, cookies=None):
+    """
+    Create a pooled Session (up to pool_size connections kept alive, gzip responses),
+    looking like the Chrome browser the website is used to
+    """
+    session = make_session(pool_size)
+    session.headers.update(HEADERS)
+    for cookie in cookies or []:
+        session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'))
+
+    return session
+
+
+@retrying()
+@timed('http_fetch')
+def fetch(session, url, throttle):
+    """
+    GET a page of the website (respecting the throttle) and parse it.
+    Slow responses and block pages make the throttle back off, and block pages are retried
+    after a longer delay (see Resilience_handler)
+    """
+    throttle.pause()
+    start = time.monotonic()
+    response = session.get(url, timeout=throttle.timeout)
+    elapsed = time.monotonic() - start
+
+    page_content = BeautifulSoup(response.text, Scraping_handler.HTML_PARSER)
+    title = page_content.title.text.lower() if page_content.title else ''
+    blocked = response.status_code in BLOCK_STATUS_CODES or any(marker in title for marker in BLOCK_MARKERS)
+    if blocked:
+        throttle.report_block(f"{response.status_code} {url}")
+    throttle.report_response(elapsed, blocked=blocked)
+    if blocked:
+        raise BlockedPage(f"Block page served for {url} ({response.status_code})")
+    response.raise_for_status()
+
+    return page_content
+
+
+def get_search_url(args, configurations, throttle):
+    """
+    Run the search in a Chrome driver once, for getting the search URL and the session cookies
+    (the search form is filled by JavaScript), then close the driver
+    """
+    driver_path = get_chromedriver_path(configurations)
+    driver = initiate_driver(driver_path, configurations['Scraping']['Platform'], args, throttle,
+                             get_browser_config(configurations))
+    try:
+        return driver.current_url, driver.get_cookies()
+    finally:
+        driver.close()
+
+
+def extract_job_tabs(detail_content, bs_job):
+    """
+    Extract the Company and Rating tabs data out of a job's detail page (empty when missing)
+    """
+    job_company = {}
+    tab_content = detail_content.find("div", attrs={"id": "EmpBasicInfo"})
+    if tab_content is not None:
+        job_company = extract_company_data(tab_content)
+
+    job_ratings = {}
+    tab_content = detail_content.find("ul", attrs={"class": "ratings"})
+    overall_rating = bs_job.find("span", class_="compactStars")
+    if tab_content is not None and overall_rating is not None:
+        job_ratings = extract_rating_data(tab_content, overall_rating.text)
+
+    return job_company, job_ratings
+
+
+class ChromeFallback:
+    """
+    Chrome driver rendering the job detail pages whose tabs are rendered by JavaScript, one page at a time.
+    Launched on the first such page only, and given up on (for the rest of the run) if it can't be launched
+    """
+
+    def __init__(self, args, configurations, throttle):
+        self.args = args
+        self.configurations = configurations
+        self.throttle = throttle
+        self.pages = 0
+        self._driver = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def get_job_tabs_data(self, url, bs_job):
+        """
+        Render the job's detail page in Chrome and extract its Company and Rating tabs data
+        """
+        with self._lock:
+            if self._failed:
+                return {}, {}
+            if self._driver is None:
+                try:
+                    self._driver = launch_driver(get_chromedriver_path(self.configurations),
+                                                 self.configurations['Scraping']['Platform'], self.args,
+                                                 self.throttle, get_browser_config(self.configurations))
+                except Exception as e:
+                    logger.error(f"Could not launch Chrome for the detail pages needing JavaScript: {e}")
+                    self._failed = True
+                    return {}, {}
+
+            self.throttle.pause()
+            self._driver.get(url)
+            self.throttle.wait_for(self._driver, EC.presence_of_element_located((By.ID, "EmpBasicInfo")))
+            detail_content = BeautifulSoup(self._driver.page_source, Scraping_handler.HTML_PARSER)
+            self.pages += 1
+
+        return extract_job_tabs(detail_content, bs_job)
+
+    def close(self):
+        if self._driver is not None:
+            logger.info(f"Rendered {self.pages} detail pages in Chrome")
+            self._driver.close()
+            self._driver = None
+
+
+def get_job_tabs_data(session, bs_job, throttle, fallback=None):
+    """
+    Fetch the job's detail page and extract its Company and Rating tabs data.
+    When the Company tab is missing from the server rendered page (the tabs are rendered by JavaScript),
+    the page is rendered by the fallback (a ChromeFallback) if given - a missing Rating tab alone is usually
+    a company without ratings. Tabs still missing are returned empty (and counted as 'tabs_missing' errors),
+    so they aren't cached (see CompanyCache.put()).
+    A detail page failing to load (HTTP error, or block pages out of retries) is rendered by the fallback too,
+    rather than failing the run. Returns None when the job posting is gone (404/410), for skipping the job
+    """
+    link = bs_job.find('a', attrs={"class": "jobTitle"})
+    if link is None or not link.get('href'):
+        logger.warning("Job has no detail page link")
+        ERRORS.add('tabs_missing')
+        return {}, {}
+
+    url = urljoin(BASE_URL, link['href'])
+    try:
+        job_company, job_ratings = extract_job_tabs(fetch(session, url, throttle), bs_job)
+    except (requests.HTTPError, BlockedPage) as e:
+        response = getattr(e, 'response', None)
+        if response is not None and response.status_code in GONE_STATUS_CODES:
+            logger.warning(f"Job posting gone, skipping it: {e}")
+            ERRORS.add('job_gone')
+            return None
+        logger.warning(f"Could not fetch the detail page: {e}")
+        ERRORS.add('detail_page_failed')
+        job_company, job_ratings = {}, {}
+
+    if not job_company and fallback is not None:
+        logger.info("The detail page tabs need JavaScript, rendering it in Chrome")
+        ERRORS.add('tabs_rendered')
+        job_company, job_ratings = fallback.get_job_tabs_data(url, bs_job)
+
+    if not job_company or not job_ratings:
+        ERRORS.add('tabs_missing')
+
+    return job_company, job_ratings
+
+
+def scrape_page_http(session, page, page_content, context, fallback=None):
+    """
+    Scrap all the jobs listed on a result page fetched over HTTP (see Scraping_handler.scrape_page),
+    rendering the detail pages needing JavaScript with the fallback (a ChromeFallback) if given
+    """
+    jobs_list = page_content.find(id=JOBS_LIST_ID) or page_content
+    for idx, bs_job in enumerate(jobs_list.find_all("li", class_="jl"), start=1):
+        if context.done():
+            break
+
+        if (page, idx) in context.checkpoint.done_jobs:
+            logger.debug(f"Page: {page}, Job Number: {idx} already checkpointed")
+            continue
+
+        logger.info(f"Page: {page}, Job Number: {idx}")
+        common_data = get_common_data(bs_job)
+
+        fingerprint = job_fingerprint(common_data['Company_Name'], common_data['Job_Title'], common_data['City'],
+                                      common_data['State'], common_data['Min_Salary'], common_data['Max_Salary'])
+        if context.known_fingerprints and fingerprint in context.known_fingerprints:
+            logger.info("Job already in the database, skipping it")
+            context.collected.skip()
+            continue
+
+        cached = context.company_cache.get(common_data['Company_Name'])
+        if cached is not None:
+            logger.info("Company found in cache, skipping its detail page")
+            job_company, job_ratings = cached
+        else:
+            tabs_data = get_job_tabs_data(session, bs_job, context.throttle, fallback)
+            if tabs_data is None:
+                context.checkpoint.skip_job(page, idx)
+                continue
+            job_company, job_ratings = tabs_data
+            context.company_cache.put(common_data['Company_Name'], job_company, job_ratings)
+
+        context.add_job(page, idx, common_data, job_company, job_ratings)
+
+
+def fetch_page(session, page, context):
+    """
+    Fetch stage: fetch a result page (unless enough jobs were already collected)
+    """
+    if context.done():
+        return None
+
+    return page, fetch(session, get_page_url(context.search_url, page), context.throttle)
+
+
+def extract_page(session, fetched, context, fallback=None):
+    """
+    Extract stage: scrap all the jobs of a fetched result page (fetching their detail pages)
+    """
+    page, page_content = fetched
+    if not page_content.find("li", class_="jl"):
+        raise JavaScriptRequired(f"Result page {page} lists no jobs when fetched over HTTP\n"
+                                 "Run the scraper again without --http and with --resume to continue in Chrome")
+
+    scrape_page_http(session, page, page_content, context, fallback)
+    if context.stopped.is_set():
+        return
+    context.checkpoint.page_done(page)
+    context.writer.page_done(page)
+
+
+def do_http_scraping(args, configurations, sink, known_fingerprints=None):
+    """
+    Same as Scraping_handler.do_scraping(), fetching the result pages and the job detail pages
+    over plain HTTP (a pooled Session) rather than rendering them in Chrome.
+    The result pages are fetched (args.workers at a time) and their jobs extracted (the configured
+    Pipeline extract_workers at a time) by two pipeline stages, overlapping each other.
+    Chrome is started only once, for running the search, unless args.search_url is given.
+    Falls back to do_scraping() when the result pages need JavaScript for listing the jobs,
+    and to a Chrome driver (see ChromeFallback) for the job detail pages needing JavaScript for their tabs
+    """
+    set_html_parser(configurations['Scraping'].get('parser', Scraping_handler.HTML_PARSER))
+    configure_resilience(configurations.get('Resilience'))
+    throttle = make_throttle(args)
+
+    cookies = None
+    search_url = args.search_url
+    if not search_url:
+        search_url, cookies = get_search_url(args, configurations, throttle)
+
+    session = make_http_session(args.workers, cookies)
+    page_content = fetch(session, get_page_url(search_url, 1), throttle)
+    if not page_content.find("li", class_="jl"):
+        logger.warning("The result page lists no jobs without JavaScript, falling back to Chrome")
+        return do_scraping(args, configurations, sink, known_fingerprints)
+
+    try:
+        jobs_found = get_num_of_matched_jobs(None, page_content)
+    except ValueError as e:
+        logger.error(e)
+        raise ValueError(e)
+
+    jobs_to_scrap = min(args.number_of_jobs, jobs_found) if args.number_of_jobs else jobs_found
+    total_pages = get_num_of_pages(page_content)
+
+    context = start_run(args, configurations, sink, throttle, search_url, jobs_to_scrap, total_pages,
+                        known_fingerprints)
+
+    pages_left = [page for page in range(1, total_pages + 1) if page not in context.checkpoint.done_pages]
+    workers = max(1, min(args.workers, len(pages_left)))
+    pipeline_config = configurations.get('Pipeline', {})
+    queue_size = pipeline_config.get('queue_size', DEFAULT_QUEUE_SIZE)
+    logger.info(f"Fetching {len(pages_left)} pages over HTTP, {workers} at a time")
+
+    fallback = ChromeFallback(args, configurations, throttle)
+
+    def fetch_stage(page):
+        return (page, page_content) if page == 1 else fetch_page(session, page, context)
+
+    pipeline = Pipeline([Stage('fetch', fetch_stage, workers, queue_size),
+                         Stage('extract', lambda fetched: extract_page(session, fetched, context, fallback),
+                               pipeline_config.get('extract_workers', 2), queue_size)],
+                        name="HTTP scraping pipeline")
+    try:
+        for page in pages_left:
+            pipeline.submit(page)
+        pipeline.close()
+    finally:
+        close_run(context)
+        session.close()
+        fallback.close()
+
+    pipeline.report()
+    report_run(context, workers)
+
+    return context.writer.written
@@ -0,0 +1,210 @@
+from Results_handler import RecordSink
+import threading
+import logging
+import queue
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 100
+_STOP = object()
+_DROPPED = object()
+
+
+class Stage:
+    """
+    A pipeline stage: `workers` threads taking items from the stage's bounded input queue,
+    applying func to them and handing the results over to the next stage.
+    func returning None drops the item.
+    An ordered stage (a single worker) processes the items in the order they entered the pipeline.
+    Once a stage fails, the items still flowing through the pipeline are dropped.
+    Keeps track of the time its workers spent working, starving (waiting for input) and blocked by
+    the next stage (waiting for room in its full queue - the backpressure)
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=DEFAULT_QUEUE_SIZE, ordered=False):
+        self.name = name
+        self.func = func
+        self.workers = 1 if ordered else max(1, workers)
+        self.ordered = ordered
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self.processed = 0
+        self.busy_time = 0.0
+        self.starved_time = 0.0
+        self.blocked_time = 0.0
+        self.max_queued = 0
+
+        self._next = None
+        self._threads = []
+        self._pending = {}
+        self._next_seq = 0
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+        self.error = None
+
+    def put(self, seq, item):
+        """
+        Hand an item over to the stage, blocking while its queue is full.
+        Returns the time spent blocked
+        """
+        start = time.perf_counter()
+        self.queue.put((seq, item))
+        blocked = time.perf_counter() - start
+
+        with self._lock:
+            self.max_queued = max(self.max_queued, self.queue.qsize())
+
+        return blocked
+
+    def start(self, next_stage=None, failed=None):
+        self._next = next_stage
+        self._failed = failed or self._failed
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Let the workers finish the queued items, and wait for them
+        """
+        for _ in self._threads:
+            self.queue.put((None, _STOP))
+        for thread in self._threads:
+            thread.join()
+
+    def _ready_items(self, seq, item):
+        """
+        Items the worker may process now: the item itself, or for an ordered stage,
+        the items following the last processed one (held until their turn)
+        """
+        if not self.ordered:
+            return [(seq, item)]
+
+        self._pending[seq] = item
+        ready = []
+        while self._next_seq in self._pending:
+            ready.append((self._next_seq, self._pending.pop(self._next_seq)))
+            self._next_seq += 1
+
+        return ready
+
+    def _work(self):
+        while True:
+            start = time.perf_counter()
+            seq, item = self.queue.get()
+            starved = time.perf_counter() - start
+            if item is _STOP:
+                break
+
+            busy = blocked = 0.0
+            for ready_seq, ready_item in self._ready_items(seq, item):
+                start = time.perf_counter()
+                result = _DROPPED
+                if ready_item is not _DROPPED and not self._failed.is_set():
+                    try:
+                        result = self.func(ready_item)
+                    except Exception as e:
+                        logger.error(f"===Stage {self.name} failed: {e}===")
+                        self.error = e
+                        self._failed.set()
+                busy += time.perf_counter() - start
+
+                if self._next is not None:
+                    blocked += self._next.put(ready_seq, _DROPPED if result is None else result)
+
+            with self._lock:
+                self.processed += 1
+                self.busy_time += busy
+                self.starved_time += starved
+                self.blocked_time += blocked
+
+    def summary(self):
+        return {'workers': self.workers, 'processed': self.processed, 'busy_time': self.busy_time,
+                'starved_time': self.starved_time, 'blocked_time': self.blocked_time,
+                'max_queued': self.max_queued, 'queue_size': self.queue.maxsize}
+
+
+class Pipeline:
+    """
+    Chain of stages connected by bounded queues, so the stages overlap instead of running one after
+    another, and a stage running ahead of a slower one is held back (backpressure) instead of
+    piling items up in memory
+    """
+
+    def __init__(self, stages, name="Pipeline"):
+        self.name = name
+        self.stages = stages
+        self.blocked_time = 0.0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+
+        for stage, next_stage in zip(stages, stages[1:] + [None]):
+            stage.start(next_stage, self._failed)
+
+    def submit(self, item):
+        """
+        Feed an item into the first stage, blocking while its queue is full
+        """
+        with self._lock:
+            seq = self._seq
+            self._seq += 1
+            blocked = self.stages[0].put(seq, item)
+            self.blocked_time += blocked
+
+    def close(self):
+        """
+        Drain the stages one after the other, and raise the first error a stage ran into
+        """
+        for stage in self.stages:
+            stage.stop()
+
+        for stage in self.stages:
+            if stage.error is not None:
+                raise stage.error
+
+    def report(self):
+        """
+        Log and print every stage's work, starvation and backpressure times, at the end of a run
+        """
+        lines = [f"{self.name}: producers blocked {self.blocked_time:.1f}s"]
+        for stage in self.stages:
+            stats = stage.summary()
+            lines.append(f"\t{stage.name:<10} {stats['workers']} workers, {stats['processed']} items, "
+                         f"busy {stats['busy_time']:.1f}s, starved {stats['starved_time']:.1f}s, "
+                         f"blocked {stats['blocked_time']:.1f}s, "
+                         f"queue peak {stats['max_queued']}/{stats['queue_size']}")
+        message = '\n'.join(lines)
+        logger.info(message)
+        print(message)
+
+        return {stage.name: stage.summary() for stage in self.stages}
+
+
+class PipelineSink(RecordSink):
+    """
+    Stream the records into a sink through a two stages pipeline: 'normalize' (the sink's prepare(),
+    normalize_workers threads) and 'persist' (the sink's write_prepared(), a single thread, in the
+    records' order), so the scraper doesn't wait for the files and the database
+    """
+
+    def __init__(self, sink, normalize_workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        self.sink = sink
+        self.pipeline = Pipeline([Stage('normalize', sink.prepare, normalize_workers, queue_size),
+                                  Stage('persist', self._persist, queue_size=queue_size, ordered=True)],
+                                 name="Results pipeline")
+
+    def _persist(self, item):
+        self.sink.write_prepared(item)
+
+    def write(self, record):
+        self.pipeline.submit(record)
+
+    def close(self):
+        try:
+            self.pipeline.close()
+        finally:
+            self.sink.close()
+        self.pipeline.report()
@@ -0,0 +1,249 @@
+from contextlib import contextmanager
+import threading
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = "search_queue.sqlite"
+DEFAULT_RETRY_DELAY = 60
+IDLE_POLL = 5
+
+QUEUE_TABLE = '''CREATE TABLE IF NOT EXISTS searches (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 job_type TEXT NOT NULL,
+                 location TEXT NOT NULL,
+                 number_of_jobs INTEGER,
+                 rating_threshold REAL,
+                 priority INTEGER NOT NULL DEFAULT 0,
+                 status TEXT NOT NULL DEFAULT 'pending',
+                 attempts INTEGER NOT NULL DEFAULT 0,
+                 max_attempts INTEGER NOT NULL DEFAULT 3,
+                 not_before REAL NOT NULL DEFAULT 0,
+                 last_error TEXT,
+                 jobs_written INTEGER,
+                 elapsed REAL,
+                 created REAL NOT NULL,
+                 started REAL,
+                 finished REAL)'''
+QUEUE_INDEX = "CREATE INDEX IF NOT EXISTS searches_by_status ON searches (status, priority DESC, id)"
+
+
+class SearchQueue:
+    """
+    Persistent queue of searches, in a local SQLite database.
+    Searches are claimed by priority (highest first, then oldest first). A failed search goes back to
+    the queue until it used up its attempts, waiting retry_delay seconds (doubled on every attempt) first.
+    The jobs written and the time spent are recorded for every search
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, retry_delay=DEFAULT_RETRY_DELAY):
+        self.path = path
+        self.retry_delay = retry_delay
+        with self._connect() as connection:
+            connection.execute(QUEUE_TABLE)
+            self._migrate(connection)
+            connection.execute(QUEUE_INDEX)
+
+    @staticmethod
+    def _migrate(connection):
+        """
+        Make the rating_threshold column of a queue created with a NOT NULL one (0 by default) nullable,
+        the former 0 thresholds becoming unset ones (the search uses the CLI's rating threshold)
+        """
+        columns = {column['name']: column for column in connection.execute("PRAGMA table_info(searches)")}
+        if not columns['rating_threshold']['notnull']:
+            return
+
+        logger.info("Migrating the search queue: rating thresholds become optional")
+        names = ', '.join(columns)
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("ALTER TABLE searches RENAME TO searches_old")
+        connection.execute(QUEUE_TABLE)
+        connection.execute(f"INSERT INTO searches ({names}) SELECT {names} FROM searches_old")
+        connection.execute("UPDATE searches SET rating_threshold = NULL WHERE rating_threshold = 0")
+        connection.execute("DROP TABLE searches_old")
+        connection.execute("COMMIT")
+
+    @contextmanager
+    def _connect(self):
+        """
+        An autocommit connection to the queue, for the duration of the with block
+        """
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def add(self, job_type, location, number_of_jobs=None, rating_threshold=None, priority=0, max_attempts=3):
+        """
+        Queue a search, returns its id.
+        Its number_of_jobs and rating_threshold override the CLI ones, unless None
+        """
+        with self._connect() as connection:
+            cursor = connection.execute('''INSERT INTO searches (job_type, location, number_of_jobs, rating_threshold,
+                                                                 priority, max_attempts, created)
+                                           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                                        (job_type, location, number_of_jobs, rating_threshold, priority or 0,
+                                         max_attempts, time.time()))
+            return cursor.lastrowid
+
+    def claim(self):
+        """
+        Take the next search due (marking it as running), None if no search is due
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            search = connection.execute('''SELECT * FROM searches
+                                           WHERE status = 'pending' AND not_before <= ?
+                                           ORDER BY priority DESC, id
+                                           LIMIT 1''', (time.time(),)).fetchone()
+            if search is not None:
+                connection.execute('''UPDATE searches SET status = 'running', attempts = attempts + 1, started = ?
+                                      WHERE id = ?''', (time.time(), search['id']))
+            connection.execute("COMMIT")
+
+        return dict(search) if search is not None else None
+
+    def next_due(self):
+        """
+        Seconds until the next pending search is due (0 if one is due already), None if none is pending
+        """
+        with self._connect() as connection:
+            not_before = connection.execute("SELECT MIN(not_before) FROM searches "
+                                            "WHERE status = 'pending'").fetchone()[0]
+
+        return None if not_before is None else max(0.0, not_before - time.time())
+
+    def complete(self, search_id, jobs_written, elapsed):
+        """
+        Mark a search as done, recording its throughput
+        """
+        with self._connect() as connection:
+            connection.execute('''UPDATE searches SET status = 'done', jobs_written = ?, elapsed = ?, finished = ?,
+                                                      last_error = NULL
+                                  WHERE id = ?''', (jobs_written, elapsed, time.time(), search_id))
+
+    def fail(self, search_id, error, elapsed=None):
+        """
+        Put a failed search back into the queue (with a delay), or mark it as failed once out of attempts
+        """
+        with self._connect() as connection:
+            search = connection.execute("SELECT attempts, max_attempts FROM searches WHERE id = ?",
+                                        (search_id,)).fetchone()
+            if search['attempts'] >= search['max_attempts']:
+                connection.execute('''UPDATE searches SET status = 'failed', last_error = ?, elapsed = ?, finished = ?
+                                      WHERE id = ?''', (str(error), elapsed, time.time(), search_id))
+                logger.error(f"Search {search_id} failed for good after {search['attempts']} attempts: {error}")
+            else:
+                delay = self.retry_delay * 2 ** (search['attempts'] - 1)
+                connection.execute('''UPDATE searches SET status = 'pending', last_error = ?, not_before = ?
+                                      WHERE id = ?''', (str(error), time.time() + delay, search_id))
+                logger.warning(f"Search {search_id} failed ({error}), retrying in {delay:.0f}s")
+
+    def recover(self):
+        """
+        Put back into the queue the searches left running by an interrupted run
+        """
+        with self._connect() as connection:
+            recovered = connection.execute("UPDATE searches SET status = 'pending' WHERE status = 'running'").rowcount
+        if recovered:
+            logger.info(f"Recovered {recovered} searches left running by a previous run")
+
+        return recovered
+
+    def searches(self, status=None):
+        """
+        Get the queued searches (of the given status, all of them if None), by priority
+        """
+        with self._connect() as connection:
+            if status is None:
+                rows = connection.execute("SELECT * FROM searches ORDER BY priority DESC, id").fetchall()
+            else:
+                rows = connection.execute("SELECT * FROM searches WHERE status = ? ORDER BY priority DESC, id",
+                                          (status,)).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def report(self):
+        """
+        Log and print the throughput of every finished search, and the amount of searches per status
+        """
+        lines = []
+        counts = {}
+        for search in self.searches():
+            counts[search['status']] = counts.get(search['status'], 0) + 1
+            if search['status'] not in ('done', 'failed'):
+                continue
+
+            line = f"\t[{search['status']:<6}] {search['job_type']} in {search['location']}: "
+            if search['status'] == 'done':
+                rate = search['jobs_written'] / search['elapsed'] * 60 if search['elapsed'] else 0
+                line += f"{search['jobs_written']} jobs in {search['elapsed']:.0f}s ({rate:.1f} jobs/min)"
+            else:
+                line += f"{search['attempts']} attempts, {search['last_error']}"
+            lines.append(line)
+
+        lines.insert(0, "Search queue: " + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+        message = '\n'.join(lines)
+        logger.info(message)
+        print(message)
+
+        return counts
+
+
+class Scheduler:
+    """
+    Spread the queued searches over a pool of worker threads.
+    Every worker gets its own state out of setup() (e.g. its warm drivers), released by teardown() once
+    the queue is empty, and runs search_func(search, state) for every search it claims.
+    Workers stop once no search is pending anymore (waiting for the searches due later)
+    """
+
+    def __init__(self, queue, search_func, workers=1, setup=None, teardown=None):
+        self.queue = queue
+        self.search_func = search_func
+        self.workers = max(1, workers)
+        self.setup = setup
+        self.teardown = teardown
+
+    def run(self):
+        self.queue.recover()
+        threads = [threading.Thread(target=self._work, name=f"search-worker-{number}", daemon=True)
+                   for number in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return self.queue.report()
+
+    def _work(self):
+        state = self.setup() if self.setup else None
+        try:
+            while True:
+                search = self.queue.claim()
+                if search is None:
+                    due = self.queue.next_due()
+                    if due is None:
+                        break
+                    time.sleep(min(max(due, 0.1), IDLE_POLL))
+                    continue
+
+                logger.info(f"Search {search['id']}: {search['job_type']} in {search['location']} "
+                            f"(attempt {search['attempts'] + 1})")
+                start = time.monotonic()
+                try:
+                    jobs_written = self.search_func(search, state)
+                except Exception as e:
+                    logger.error(f"===Search {search['id']} failed: {e}===")
+                    self.queue.fail(search['id'], e, time.monotonic() - start)
+                    continue
+
+                self.queue.complete(search['id'], jobs_written, time.monotonic() - start)
+        finally:
+            if self.teardown:
+                self.teardown(state)
@@ -0,0 +1,184 @@
+from array import array
+import logging
+import sys
+import csv
+
+logger = logging.getLogger(__name__)
+
+TEXT = 'text'
+NUMBER = 'number'
+EXPORT_CHUNK = 4096
+NAN = float('nan')
+
+
+class Column:
+    """
+    A typed column: numbers in a packed array of doubles, texts (interned) in a list, and a bitmap of the null rows
+    (a set bit per null row). The null rows hold a placeholder (NaN or None), so exporting a column
+    doesn't have to go through the bitmap bit by bit.
+    A column registered after rows were already stored starts at that row - the rows before it are null
+    without being back-filled
+    """
+
+    __slots__ = ('name', 'kind', 'start', 'values', 'nulls', '_null_value')
+
+    def __init__(self, name, kind=TEXT, start=0):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.values = array('d') if kind == NUMBER else []
+        self.nulls = bytearray()
+        self._null_value = NAN if kind == NUMBER else None
+
+    def append(self, value):
+        row = len(self.values)
+        if not row & 7:
+            self.nulls.append(0)
+
+        # value != value: NaN
+        if value is None or value != value:
+            self.nulls[row >> 3] |= 1 << (row & 7)
+            self.values.append(self._null_value)
+        elif self.kind == NUMBER:
+            self.values.append(float(value))
+        else:
+            # Interned: the same company, city or title is held once however many jobs repeat it
+            self.values.append(sys.intern(value if isinstance(value, str) else str(value)))
+
+    def is_null(self, row):
+        if row < self.start:
+            return True
+        row -= self.start
+        return bool(self.nulls[row >> 3] & (1 << (row & 7)))
+
+    def get(self, row):
+        """
+        The value of the given row, None if null
+        """
+        return None if self.is_null(row) else self.values[row - self.start]
+
+    def slice(self, begin, end, null=None):
+        """
+        The values of the rows begin to end (excluded), null for the nulls
+        """
+        first = max(begin, self.start) - self.start
+        last = min(end - self.start, len(self.values))
+        if last <= first:
+            return [null] * (end - begin)
+
+        values = self.values[first:last]
+        if self.kind == NUMBER:
+            # v != v: the NaN placeholder of a null row
+            values = [null if v != v else v for v in values.tolist()]
+        elif null is not None:
+            values = [null if v is None else v for v in values]
+
+        return [null] * (first + self.start - begin) + values + [null] * (end - self.start - last)
+
+    def nbytes(self):
+        """
+        Memory held by the column's values and bitmap (the texts themselves excluded)
+        """
+        if self.kind == NUMBER:
+            return self.values.itemsize * len(self.values) + len(self.nulls)
+        return 8 * len(self.values) + len(self.nulls)
+
+
+class RecordStore:
+    """
+    Compact, column oriented store of the scraped jobs, with a fixed registry of columns.
+    Appending a job costs one append per column, whatever the amount of jobs already stored,
+    and the results are exported (CSV file or DataFrame) in a single pass.
+    Fields missing from the registry are registered on first sight (see register())
+    """
+
+    def __init__(self, columns):
+        """
+        :param columns: list of (name, kind) pairs, kind is TEXT or NUMBER
+        """
+        self._columns = {}
+        self._rows = 0
+        for name, kind in columns:
+            self.register(name, kind)
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def register(self, name, kind=TEXT):
+        """
+        Add a column, null for all the rows already stored
+        """
+        if name not in self._columns:
+            if self._rows:
+                logger.warning(f"Registering the new column '{name}' after {self._rows} rows")
+            self._columns[name] = Column(name, kind, start=self._rows)
+
+        return self._columns[name]
+
+    def append(self, record, new_kind=NUMBER):
+        """
+        Store a record (dict of column name to value), missing columns are null.
+        Columns unknown to the registry are registered as new_kind columns
+        """
+        for name in record:
+            if name not in self._columns:
+                self.register(name, new_kind)
+
+        get = record.get
+        for name, column in self._columns.items():
+            column.append(get(name))
+        self._rows += 1
+
+    def column(self, name):
+        """
+        The values of a column, None for the null rows
+        """
+        return self._columns[name].slice(0, self._rows)
+
+    def rows(self, null=None, chunk_size=EXPORT_CHUNK):
+        """
+        Iterate over the stored records, as tuples in the columns order (null for the nulls),
+        a chunk of rows at a time
+        """
+        columns = list(self._columns.values())
+        for begin in range(0, self._rows, chunk_size):
+            end = min(begin + chunk_size, self._rows)
+            yield from zip(*(column.slice(begin, end, null) for column in columns))
+
+    def to_csv(self, file_path):
+        """
+        Write the stored records into a CSV file (empty cells for the nulls)
+        """
+        with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(self.rows(null=''))
+
+    def to_dataframe(self):
+        """
+        Build a pandas DataFrame out of the stored records (NaN for the nulls), the number columns
+        straight out of their packed arrays
+        """
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for name, column in self._columns.items():
+            if column.kind == NUMBER:
+                values = np.full(self._rows, np.nan)
+                stored = np.frombuffer(column.values, dtype=np.float64) if len(column.values) else np.empty(0)
+                nulls = np.unpackbits(np.frombuffer(bytes(column.nulls), dtype=np.uint8),
+                                      bitorder='little')[:len(stored)].astype(bool)
+                values[column.start:] = np.where(nulls, np.nan, stored)
+                data[name] = values
+            else:
+                data[name] = self.column(name)
+
+        return pd.DataFrame(data, columns=self.columns)
+
+    def nbytes(self):
+        return sum(column.nbytes() for column in self._columns.values())
@@ -0,0 +1,281 @@
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from bs4 import BeautifulSoup
+import threading
+import logging
+import json
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+XPATH_PATTERN = re.compile(r"^\.//(\w+)\[(.+)\]$")
+XPATH_ATTRIBUTE_PATTERN = re.compile(r'@([\w.-]+)="([^"]*)"')
+PAGE_PATTERN = re.compile(r"_IP(\d+)\.htm")
+
+
+def fixture_name(kind, page, idx=None):
+    """
+    File name of the snapshot of a given DOM state:
+    'listing' (a result page), 'job' (a job clicked), 'company' or 'rating' (a job's tab clicked)
+    """
+    if idx is None:
+        return f"{kind}_{page}.html"
+
+    return f"{kind}_{page}_{idx}.html"
+
+
+class Recorder:
+    """
+    Save the HTML of every DOM state the scraper reads during a live run (the result pages,
+    and for every job its detail pane and its Company and Rating tabs), along with a manifest,
+    so the run can be replayed offline by ReplayDriver
+    """
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+        self.saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def start(self, search_url, total_pages):
+        """
+        Save the manifest of the recorded search
+        """
+        with open(os.path.join(self.fixture_dir, MANIFEST), 'w', encoding='utf8') as f:
+            json.dump({'search_url': search_url, 'total_pages': total_pages}, f)
+
+    def record(self, driver, kind, page, idx=None):
+        """
+        Save the current page source as the snapshot of the given DOM state
+        """
+        path = os.path.join(self.fixture_dir, fixture_name(kind, page, idx))
+        with open(path, 'w', encoding='utf8') as f:
+            f.write(driver.page_source)
+
+        with self._lock:
+            self.saved += 1
+
+
+def xpath_to_css(xpath):
+    """
+    Translate the simple XPath expressions used by the scraper ('.//tag[@attr="value" and ...]')
+    into CSS selectors
+    """
+    match = XPATH_PATTERN.match(xpath)
+    if match is None:
+        raise ValueError(f"Unsupported XPath expression: {xpath}")
+
+    tag, conditions = match.groups()
+    attributes = ''.join(f'[{name}="{value}"]' for name, value in XPATH_ATTRIBUTE_PATTERN.findall(conditions))
+
+    return tag + attributes
+
+
+def to_css(by, value):
+    """
+    Translate a Selenium locator into a CSS selector
+    """
+    if by == By.CLASS_NAME:
+        return f".{value}"
+    elif by == By.ID:
+        return f'[id="{value}"]'
+    elif by == By.CSS_SELECTOR:
+        return value
+    elif by == By.XPATH:
+        return xpath_to_css(value)
+    elif by == By.TAG_NAME:
+        return value
+
+    raise ValueError(f"Unsupported locator: {by}")
+
+
+class ReplayElement:
+    """
+    Fake WebElement, backed by a tag of a recorded snapshot
+    """
+
+    def __init__(self, driver, tag, job_index=None):
+        self._driver = driver
+        self._tag = tag
+        self._version = driver.page_version
+        self.job_index = job_index
+
+    def _check_stale(self):
+        if self._version != self._driver.page_version:
+            raise StaleElementReferenceException("The result page has changed")
+
+    @property
+    def text(self):
+        self._check_stale()
+        return self._tag.get_text()
+
+    def get_attribute(self, name):
+        self._check_stale()
+        value = self._tag.get(name)
+        return ' '.join(value) if isinstance(value, list) else value
+
+    def is_enabled(self):
+        self._check_stale()
+        return True
+
+    def is_displayed(self):
+        self._check_stale()
+        return True
+
+    def click(self):
+        self._check_stale()
+        self._driver.on_click(self)
+
+    def clear(self):
+        pass
+
+    def send_keys(self, *value):
+        pass
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"No element matches {by}: {value}")
+        return elements[0]
+
+    def find_elements(self, by=By.ID, value=None):
+        self._check_stale()
+        return [ReplayElement(self._driver, tag, self.job_index) for tag in self._tag.select(to_css(by, value))]
+
+    def find_element_by_class_name(self, name):
+        return self.find_element(By.CLASS_NAME, name)
+
+    def find_elements_by_class_name(self, name):
+        return self.find_elements(By.CLASS_NAME, name)
+
+    def find_element_by_xpath(self, xpath):
+        return self.find_element(By.XPATH, xpath)
+
+
+class ReplayDriver:
+    """
+    Fake Chrome driver serving the snapshots saved by a Recorder, without any browser or network.
+    Tracks the DOM state the same way the website does: clicking a job, a tab or the 'Next' button,
+    or loading a result page URL, moves to the matching snapshot
+    """
+
+    def __init__(self, fixture_dir, parser="html.parser"):
+        self.fixture_dir = fixture_dir
+        self.parser = parser
+        with open(os.path.join(fixture_dir, MANIFEST), encoding='utf8') as f:
+            self.manifest = json.load(f)
+
+        self.page = 1
+        self.job = None
+        self.tab = None
+        self.page_version = 0
+        self.title = "Glassdoor (replay)"
+        self._soups = {}
+
+    def _state_files(self):
+        """
+        Snapshot files of the current state, most specific first
+        """
+        files = []
+        if self.job is not None:
+            if self.tab is not None:
+                files.append(fixture_name(self.tab, self.page, self.job))
+            files.append(fixture_name('job', self.page, self.job))
+        files.append(fixture_name('listing', self.page))
+
+        return files
+
+    def _current_file(self):
+        for file_name in self._state_files():
+            path = os.path.join(self.fixture_dir, file_name)
+            if os.path.exists(path):
+                return path
+
+        raise NoSuchElementException(f"No snapshot recorded for page {self.page}")
+
+    @property
+    def page_source(self):
+        with open(self._current_file(), encoding='utf8') as f:
+            return f.read()
+
+    def _soup(self):
+        path = self._current_file()
+        if path not in self._soups:
+            self._soups[path] = BeautifulSoup(self.page_source, self.parser)
+        return self._soups[path]
+
+    @property
+    def current_url(self):
+        url = self.manifest['search_url']
+        if self.page == 1:
+            return url
+        return PAGE_PATTERN.sub(".htm", url).replace(".htm", f"_IP{self.page}.htm", 1)
+
+    def _move_to_page(self, page):
+        self.page = page
+        self.job = None
+        self.tab = None
+        self.page_version += 1
+
+    def get(self, url):
+        match = PAGE_PATTERN.search(url)
+        self._move_to_page(int(match.group(1)) if match else 1)
+
+    def on_click(self, element):
+        """
+        Move to the DOM state following a click on the given element
+        """
+        tab_type = element.get_attribute('data-tab-type')
+        if tab_type == 'overview':
+            self.tab = 'company'
+        elif tab_type == 'rating':
+            self.tab = 'rating'
+        elif element.get_attribute('data-test') == 'pagination-next':
+            self._move_to_page(self.page + 1)
+        elif element.job_index is not None:
+            self.job = element.job_index
+            self.tab = None
+
+    def execute_script(self, script, *args):
+        if 'click()' in script:
+            args[0].click()
+        elif 'outerHTML' in script:
+            tag = self._soup().find(id=args[0])
+            return str(tag) if tag is not None else None
+        elif 'readyState' in script:
+            return "complete"
+
+        return None
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"No element matches {by}: {value}")
+        return elements[0]
+
+    def find_elements(self, by=By.ID, value=None):
+        tags = self._soup().select(to_css(by, value))
+        if by == By.CLASS_NAME and value == 'jl':
+            return [ReplayElement(self, tag, job_index) for job_index, tag in enumerate(tags, start=1)]
+
+        return [ReplayElement(self, tag) for tag in tags]
+
+    def find_element_by_class_name(self, name):
+        return self.find_element(By.CLASS_NAME, name)
+
+    def find_elements_by_class_name(self, name):
+        return self.find_elements(By.CLASS_NAME, name)
+
+    def find_element_by_xpath(self, xpath):
+        return self.find_element(By.XPATH, xpath)
+
+    def find_elements_by_xpath(self, xpath):
+        return self.find_elements(By.XPATH, xpath)
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
@@ -0,0 +1,199 @@
+from Timing_handler import span
+import argparse
+import hashlib
+import logging
+import json
+import time
+import sys
+import re
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_DIR = "."
+DIGESTS_FILE = ".report_digests.json"
+TOP_INDUSTRIES = 10
+NULL_LABEL = "null"
+SIZE_PATTERN = re.compile(r"(\d[\d,]*)")
+
+
+def read_summaries():
+    """
+    The job posts and companies per industry (a DataFrame) and the average overall rating per company size
+    (a Series), read from the summary tables the loaders create and keep up to date (see Analytics_handler),
+    the missing industries and sizes labelled NULL_LABEL.
+    Only reads the database: raises a ValueError if the summary tables are missing
+    """
+    import pandas as pd
+    from Analytics_handler import missing_summaries, jobs_per_industry, ratings_per_size
+
+    missing = missing_summaries()
+    if missing:
+        raise ValueError(f"The database lacks the summary tables {', '.join(missing)}\n"
+                         "Load scraped jobs into it first (Gg_scrap.py), for creating them")
+
+    industries = pd.DataFrame.from_records(jobs_per_industry(), columns=['Industry', 'Jobs', 'Companies'])
+    industries = industries.assign(Industry=industries['Industry'].replace('', NULL_LABEL)).set_index('Industry')
+    size_ratings = pd.Series({row['Size'] or NULL_LABEL: row['Avg_Overall'] for row in ratings_per_size()},
+                             dtype='float64')
+
+    return industries, size_ratings
+
+
+def top_industries(industry_jobs, top=TOP_INDUSTRIES):
+    """
+    The job posts of the top industries (most job posts first), the other industries summed up as 'Other'
+    """
+    jobs = industry_jobs.sort_values(ascending=False, kind='stable')
+    other = jobs.iloc[top:].sum()
+    jobs = jobs.iloc[:top]
+    if other:
+        jobs['Other'] = other
+
+    return jobs
+
+
+def jobs_per_company(industries, top=TOP_INDUSTRIES):
+    """
+    The average amount of job posts per company in the top industries (most job posts first, NULL_LABEL aside)
+    """
+    industries = industries.drop(NULL_LABEL, errors='ignore').sort_values('Jobs', ascending=False, kind='stable')
+    industries = industries.iloc[:top]
+
+    return industries['Jobs'] / industries['Companies']
+
+
+def size_order(size):
+    """
+    Sort key of a company size label ("1 to 50 Employees"), by its lower bound, the unknown sizes last
+    """
+    match = SIZE_PATTERN.search(size)
+    return (0, int(match.group(1).replace(',', ''))) if match else (1, size)
+
+
+def average_ratings(size_ratings):
+    """
+    The average overall rating per company size (smallest sizes first), NaN if none of its companies is rated
+    """
+    return size_ratings.reindex(sorted(size_ratings.index, key=size_order))
+
+
+def draw_donut(jobs, title, path):
+    """
+    Draw a donut chart of the given amounts (a pandas Series) into path
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(11, 4.5))
+    ax.pie(jobs.values, autopct='%1.1f%%', startangle=90, counterclock=False, pctdistance=0.7,
+           wedgeprops={'width': 0.6}, textprops={'color': 'white'})
+    ax.legend(jobs.index, loc='center left', bbox_to_anchor=(1, 0.5), frameon=False)
+    ax.set_title(title)
+    ax.axis('equal')
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def draw_bars(averages, title, path):
+    """
+    Draw a bar chart of the given values (a pandas Series) into path
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(11, 4.5))
+    ax.bar(averages.index, averages.fillna(0).values, label=title)
+    ax.tick_params(axis='x', labelrotation=30)
+    ax.legend(loc='center left', bbox_to_anchor=(1, 0.9), frameon=False)
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+CHARTS = {'Number_of_jobs_plot.png': lambda industries, size_ratings: (
+              draw_donut, top_industries(industries['Jobs']), "Number_of_Jobs"),
+          'Positions_vs_Industry.png': lambda industries, size_ratings: (
+              draw_bars, jobs_per_company(industries), "Positions per company"),
+          'Ratings_vs_Size.png': lambda industries, size_ratings: (
+              draw_bars, average_ratings(size_ratings), "avg(r.Overall)")}
+
+
+def digest(values):
+    """
+    Digest of the values a chart is drawn from (a pandas Series)
+    """
+    return hashlib.sha1(values.to_json().encode('utf8')).hexdigest()
+
+
+def generate_reports(output_dir=DEFAULT_OUTPUT_DIR, redraw=False):
+    """
+    Regenerate the charts out of the summary tables of the database. A chart whose values didn't change since
+    it was drawn (the digests of the drawn values are kept in DIGESTS_FILE) isn't drawn again, unless redraw.
+    Returns the charts drawn
+    """
+    start = time.perf_counter()
+    with span('report_read'):
+        industries, size_ratings = read_summaries()
+
+    digests_path = os.path.join(output_dir, DIGESTS_FILE)
+    digests = {}
+    if not redraw and os.path.exists(digests_path):
+        with open(digests_path, encoding='utf8') as f:
+            digests = json.load(f)
+
+    drawn = []
+    with span('report_draw'):
+        os.makedirs(output_dir, exist_ok=True)
+        for file_name, chart in CHARTS.items():
+            draw, values, title = chart(industries, size_ratings)
+            path = os.path.join(output_dir, file_name)
+            values_digest = digest(values)
+            if digests.get(file_name) != values_digest or not os.path.exists(path):
+                draw(values, title, path)
+                digests[file_name] = values_digest
+                drawn.append(file_name)
+
+    with open(digests_path, 'w', encoding='utf8') as f:
+        json.dump(digests, f)
+
+    message = (f"Reports updated in {time.perf_counter() - start:.3f}s: {industries['Jobs'].sum()} job posts in "
+               f"{len(industries)} industries, {len(size_ratings)} company sizes, "
+               f"drew {', '.join(drawn) if drawn else 'no chart'}")
+    logger.info(message)
+    print(message)
+
+    return drawn
+
+
+def parse_args():
+    """
+    Parse CLI user arguments.
+    Being used in main()
+    """
+    parser = argparse.ArgumentParser(description="Regenerate the charts (jobs per industry, positions per company "
+                                                 "per industry, ratings per company size) out of the summary "
+                                                 "tables of the Glassdoor database",
+                                     prog='Reports.py')
+    parser.add_argument('-o', '--output_dir', action='store', default=DEFAULT_OUTPUT_DIR,
+                        help="Directory the charts are drawn into")
+    parser.add_argument('--redraw', action='store_true',
+                        help="Draw every chart, even the ones whose values didn't change")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        generate_reports(args.output_dir, args.redraw)
+    except Exception as e:
+        logger.error(f"===Something went wrong: {e}===")
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
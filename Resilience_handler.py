@@ -0,0 +1,267 @@
+import functools
+import threading
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESILIENCE_CONFIG = {'attempts': 3, 'base_delay': 0.5, 'max_delay': 30.0, 'block_delay': 30.0,
+                             'breaker_threshold': 5, 'breaker_cooldown': 60.0}
+RETRYABLE = ('stale', 'timeout', 'block', 'missing', 'intercepted', 'webdriver', 'connection')
+
+
+class BlockedPage(Exception):
+    """
+    Raised when the website served a block/captcha page instead of the requested one
+    """
+    pass
+
+
+def classify(error):
+    """
+    Get the kind of an error: 'stale', 'timeout', 'block', 'missing', 'intercepted', 'webdriver',
+    'connection' (all worth retrying) or 'other' (a bug, not worth retrying)
+    """
+    from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, NoSuchElementException
+    from selenium.common.exceptions import ElementClickInterceptedException, WebDriverException
+    import requests
+
+    if isinstance(error, StaleElementReferenceException):
+        return 'stale'
+    if isinstance(error, (TimeoutException, requests.Timeout)):
+        return 'timeout'
+    if isinstance(error, BlockedPage):
+        return 'block'
+    if isinstance(error, NoSuchElementException):
+        return 'missing'
+    if isinstance(error, ElementClickInterceptedException):
+        return 'intercepted'
+    if isinstance(error, WebDriverException):
+        return 'webdriver'
+    if isinstance(error, requests.ConnectionError):
+        return 'connection'
+    if isinstance(error, requests.HTTPError) and error.response is not None \
+            and error.response.status_code in (403, 429, 503):
+        return 'block'
+
+    return 'other'
+
+
+class ErrorCounters:
+    """
+    Thread safe counters of the errors met during a run, by kind (see classify()),
+    along with the amount of retries, recoveries (success after a retry), give-ups and circuit breaker trips
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def summary(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def report(self):
+        """
+        Log and print the error counters, at the end of a run
+        """
+        counts = self.summary()
+        message = "Errors: " + (', '.join(f"{name} {count}" for name, count in sorted(counts.items())) or "none")
+        logger.info(message)
+        print(message)
+
+        return counts
+
+
+ERRORS = ErrorCounters()
+
+
+class CircuitBreaker:
+    """
+    Pause a worker once its calls failed threshold times in a row: the breaker opens, and the next call
+    waits for the cooldown to end first. The first call after the cooldown is a trial - a failure opens
+    the breaker again (with the cooldown doubled, up to 8 times), a success closes it
+    """
+
+    def __init__(self, threshold=5, cooldown=60.0, counters=ERRORS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.counters = counters
+        self.failures = 0
+        self.trips = 0
+        self._open_until = None
+
+    @property
+    def is_open(self):
+        return self._open_until is not None
+
+    def before_call(self):
+        """
+        Wait for the cooldown to end, if the breaker is open
+        """
+        if self._open_until is None:
+            return
+
+        remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            logger.warning(f"Circuit open, pausing the worker for {remaining:.0f}s")
+            time.sleep(remaining)
+
+    def success(self):
+        if self._open_until is not None:
+            logger.info("Circuit closed")
+        self.failures = 0
+        self.trips = 0
+        self._open_until = None
+
+    def failure(self):
+        self.failures += 1
+        if self._open_until is not None or self.failures >= self.threshold:
+            cooldown = self.cooldown * 2 ** min(self.trips, 3)
+            self.trips += 1
+            self._open_until = time.monotonic() + cooldown
+            self.counters.add('breaker_trips')
+            logger.error(f"{self.failures} failures in a row, opening the circuit for {cooldown:.0f}s")
+
+
+_BREAKERS = threading.local()
+
+
+def current_breaker():
+    """
+    Get the circuit breaker of the calling worker (thread), created on first use
+    """
+    breaker = getattr(_BREAKERS, 'breaker', None)
+    if breaker is None:
+        breaker = CircuitBreaker(_CONFIG['breaker_threshold'], _CONFIG['breaker_cooldown'])
+        _BREAKERS.breaker = breaker
+
+    return breaker
+
+
+class RetryPolicy:
+    """
+    Retry the calls failing with a retryable error (see classify()), sleeping an exponential backoff with jitter
+    in between (base_delay, doubled on every attempt up to max_delay - block_delay instead of base_delay after
+    a block page), and refreshing the caller's state (e.g. re-reading the page) before trying again.
+    Every call goes through the calling worker's circuit breaker
+    """
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=30.0, block_delay=30.0, retry_on=RETRYABLE,
+                 counters=ERRORS):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.block_delay = block_delay
+        self.retry_on = retry_on
+        self.counters = counters
+
+    def delay(self, attempt, kind=None):
+        """
+        Seconds to sleep after the given (1-based) failed attempt: half the backoff, plus up to as much jitter
+        """
+        base = self.block_delay if kind == 'block' else self.base_delay
+        backoff = min(base * 2 ** (attempt - 1), max(self.max_delay, base))
+
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def call(self, func, *args, refresh=None, name=None, breaker=None, **kwargs):
+        """
+        Call func(*args, **kwargs), retrying it on retryable errors.
+        refresh - optional callable, called before every retry for re-fetching the state func works on
+        Re-raises the last error once out of attempts, and the non-retryable errors right away
+        """
+        name = name or getattr(func, '__name__', 'call')
+        breaker = breaker or current_breaker()
+
+        for attempt in range(1, self.attempts + 1):
+            breaker.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                kind = classify(e)
+                self.counters.add(kind)
+                if kind not in self.retry_on:
+                    raise
+                breaker.failure()
+                if attempt == self.attempts:
+                    self.counters.add('gave_up')
+                    logger.error(f"===Giving up {name} after {attempt} attempts ({kind}): {e}===")
+                    raise
+
+                self._backoff(name, attempt, kind, e)
+                if refresh is not None:
+                    refresh()
+                continue
+
+            breaker.success()
+            if attempt > 1:
+                self.counters.add('recovered')
+            return result
+
+    def poll(self, fetch, name='poll'):
+        """
+        Call fetch() until it returns something else than None, backing off in between.
+        fetch has to re-read the state it looks into on every call (a stale parse never changes).
+        Returns None if it still returned None on the last attempt
+        """
+        for attempt in range(1, self.attempts + 1):
+            result = fetch()
+            if result is not None:
+                if attempt > 1:
+                    self.counters.add('recovered')
+                return result
+
+            self.counters.add('missing')
+            if attempt < self.attempts:
+                self._backoff(name, attempt, 'missing')
+
+        self.counters.add('gave_up')
+        return None
+
+    def _backoff(self, name, attempt, kind, error=None):
+        delay = self.delay(attempt, kind)
+        self.counters.add('retries')
+        logger.warning(f"{name} failed ({kind}{f': {error}' if error else ''}), "
+                       f"attempt {attempt}/{self.attempts}, retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+
+_CONFIG = dict(DEFAULT_RESILIENCE_CONFIG)
+RETRY_POLICY = RetryPolicy()
+
+
+def configure_resilience(resilience_config=None):
+    """
+    Set up the default retry policy and circuit breakers out of the Resilience section of the configuration
+    (completed with the default values)
+    """
+    _CONFIG.update(resilience_config or {})
+    RETRY_POLICY.attempts = max(1, _CONFIG['attempts'])
+    RETRY_POLICY.base_delay = _CONFIG['base_delay']
+    RETRY_POLICY.max_delay = _CONFIG['max_delay']
+    RETRY_POLICY.block_delay = _CONFIG['block_delay']
+
+    return RETRY_POLICY
+
+
+def retrying(name=None, refresh=None):
+    """
+    Decorator calling the decorated function through the default retry policy (see RetryPolicy.call()).
+    refresh - optional callable, given the same arguments as the function, called before every retry
+    """
+    def decorator(func):
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            refresh_state = functools.partial(refresh, *args, **kwargs) if refresh else None
+            return RETRY_POLICY.call(func, *args, refresh=refresh_state, name=name or func.__name__, **kwargs)
+
+        return inner
+
+    return decorator
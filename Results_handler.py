@@ -1,39 +1,170 @@
-import pandas as pd
+import hashlib
+import json
 import csv
-import os
 
+COMMON_FIELDS = ['Company_Name', 'Job_Title', 'City', 'State', 'Min_Salary', 'Max_Salary']
+COMPANY_FIELDS = ['Size', 'Founded', 'Type', 'Industry', 'Sector', 'Revenue']
+RATING_FIELDS = ['Overall', 'Culture & Values', 'Diversity & Inclusion', 'Work/Life Balance',
+                 'Senior Management', 'Comp & Benefits', 'Career Opportunities']
+RESULT_FIELDS = COMMON_FIELDS + COMPANY_FIELDS + RATING_FIELDS
 
-def save_to_csv(file_path, data, exp_fieldnames):
 
-    with open(file_path, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=exp_fieldnames)
-        writer.writeheader()
-        writer.writerows(data)
+def assemble_record(common_data, company_data, ratings_data):
+    """
+    Assemble a job's full result record out of its common, company tab and rating tab data
+    (fields that weren't scraped are None)
+    """
+    record = {field: common_data.get(field) for field in COMMON_FIELDS}
+    record.update({field: company_data.get(field) for field in COMPANY_FIELDS})
+    record.update({field: ratings_data.get(field) for field in RATING_FIELDS})
 
+    return record
 
-def merge_csvs(filepath):
 
-    files = ["common.csv", "comp.csv",  "ratings.csv"]
-    combined_df = pd.concat([pd.read_csv(f, encoding="ISO-8859-1") for f in files], axis=1)
-    combined_df.to_csv(filepath, encoding='utf-8')
+def record_to_row(index, record):
+    """
+    Convert a result record into a row of the results CSV file layout (index column first)
+    """
+    return [index] + ['' if record.get(field) is None else record.get(field) for field in RESULT_FIELDS]
 
-    for file in files:
-        os.remove(file)
 
+class RecordSink:
+    """
+    Interface of a results destination: receives the fully assembled job records one by one,
+    as soon as they are scraped.
+    Writing a record is split in two: prepare() converts the record into what the sink stores
+    (pure computation, safe to run from any thread), and write_prepared() stores it
+    """
 
-def create_csv_res_file(company_tab_data, general_data, ratings_tab_data, file_name):
+    def prepare(self, record):
+        """
+        Convert a record into what the sink stores
+        """
+        return record
+
+    def write_prepared(self, item):
+        """
+        Store a record already converted by prepare()
+        """
+        raise NotImplementedError
+
+    def write(self, record):
+        self.write_prepared(self.prepare(record))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CsvSink(RecordSink):
+    """
+    Stream the records into a CSV file (same layout as the results file: index column first)
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([''] + RESULT_FIELDS)
+        self._index = 0
+
+    def prepare(self, record):
+        return record_to_row('', record)
+
+    def write_prepared(self, row):
+        row[0] = self._index
+        self._writer.writerow(row)
+        self._index += 1
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlSink(RecordSink):
+    """
+    Stream the records into a JSON lines file, a record per line
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, 'w', encoding='utf-8')
 
-    save_to_csv('comp.csv', company_tab_data, ['Size', 'Founded', 'Type', 'Industry', 'Sector', 'Revenue'])
+    def prepare(self, record):
+        return json.dumps(record) + '\n'
 
-    save_to_csv('common.csv', general_data, ['Company_Name', 'Job_Title', 'City', 'State',
-                                             'Min_Salary', 'Max_Salary'])
+    def write_prepared(self, line):
+        self._file.write(line)
 
-    save_to_csv('ratings.csv', ratings_tab_data, ['Overall', 'Culture & Values', 'Diversity & Inclusion',
-                                                  'Work/Life Balance', 'Senior Management', 'Comp & Benefits',
-                                                  'Career Opportunities'])
+    def close(self):
+        self._file.close()
 
-    if os.path.exists(file_name):
-        os.remove(file_name)
 
-    merge_csvs(file_name)
+class TeeSink(RecordSink):
+    """
+    Stream the same records into several sinks
+    """
 
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def prepare(self, record):
+        return [sink.prepare(record) for sink in self.sinks]
+
+    def write_prepared(self, items):
+        for sink, item in zip(self.sinks, items):
+            sink.write_prepared(item)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def make_sink(file_path, output_format='csv'):
+    """
+    Create a file sink according to the output format ('csv' or 'jsonl')
+    """
+    if output_format == 'csv':
+        return CsvSink(file_path)
+    elif output_format == 'jsonl':
+        return JsonlSink(file_path)
+
+    raise ValueError("output_format should be among [csv, jsonl]")
+
+
+def read_result_rows(file_path):
+    """
+    Read a results file (CSV or JSON lines) back, row by row, in the results CSV file layout
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if file_path.endswith('.jsonl'):
+            for index, line in enumerate(f):
+                yield record_to_row(str(index), json.loads(line))
+        else:
+            reader = csv.reader(f)
+            next(reader)
+            yield from reader
+
+
+def job_fingerprint(company_name, job_title, city, state, min_salary, max_salary):
+    """
+    Fingerprint of a job posting (company, title, location and salary), used for recognizing
+    postings already stored in the database
+    """
+    fields = [company_name, job_title, city, state, min_salary, max_salary]
+    normalized = '|'.join('' if field is None else str(field).strip().lower() for field in fields)
+
+    return hashlib.sha1(normalized.encode('utf8')).hexdigest()
+
+
+def create_csv_res_file(company_tab_data, general_data, ratings_tab_data, file_name):
+    """
+    Write already scraped jobs data into the results CSV file
+    """
+    with CsvSink(file_name) as sink:
+        for common_data, company_data, ratings_data in zip(general_data, company_tab_data, ratings_tab_data):
+            sink.write(assemble_record(common_data, company_data, ratings_data))
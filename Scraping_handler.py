@@ -4,14 +4,21 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
-from pyvirtualdisplay import Display
-from selenium import webdriver
+from Throttle_handler import Throttle, element_html_changed, OUTER_HTML_SCRIPT
+from Checkpoint_handler import Checkpoint, DEFAULT_CHECKPOINT_PATH
+from Cache_handler import CompanyCache
+from Results_handler import job_fingerprint, assemble_record
+from Replay_handler import Recorder, ReplayDriver
+from Browser_handler import launch_chrome, document_ready, get_browser_config
+from Timing_handler import span, timed
+from Resilience_handler import RETRY_POLICY, configure_resilience
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
+import functools
+import threading
 import pathlib
 import logging
-import random
-import time
 import re
 
 logger = logging.getLogger(__name__)
@@ -21,25 +28,72 @@ COMPANY_TAG = {"data-tab-type": "overview"}
 RATING_TAG = {"data-tab-type": "rating"}
 COMPANY_ERRORS = []
 RATING_ERRORS = []
+PAGE_URL_PATTERN = re.compile(r"(_IP\d+)?\.htm")
+JOBS_LIST_ID = "MainCol"
+DETAIL_PANE_ID = "JDCol"
+HTML_PARSER = "html.parser"
+JOB_TAG = (By.CLASS_NAME, "jl")
 
 
-def insert_search_criteria(driver, job_type, location):
+def set_html_parser(parser_name):
+    """
+    Choose the BeautifulSoup parser backend ('html.parser', 'lxml' or 'html5lib').
+    Falls back to the built-in 'html.parser' if the requested backend is not installed
+    """
+    global HTML_PARSER
+
+    try:
+        BeautifulSoup("<html></html>", parser_name)
+    except Exception as e:
+        logger.warning(f"Parser {parser_name} is not available ({e}), using html.parser instead")
+        parser_name = "html.parser"
+
+    logger.info(f"Using {parser_name} for parsing pages")
+    HTML_PARSER = parser_name
+
+
+def get_page_soup(driver):
+    """
+    Parse the whole page the driver is currently at
+    """
+    page_source = driver.page_source
+    with span('parse'):
+        return BeautifulSoup(page_source, HTML_PARSER)
+
+
+def get_element_soup(driver, element_id):
+    """
+    Parse only the outerHTML of the element with the given id, rather than the whole page source.
+    Falls back to the whole page if the element is not present
+    """
+    html = driver.execute_script(OUTER_HTML_SCRIPT, element_id)
+    if html is None:
+        logger.debug(f"No element with id {element_id}, parsing the whole page")
+        return get_page_soup(driver)
+
+    with span('parse'):
+        return BeautifulSoup(html, HTML_PARSER)
+
+
+def insert_search_criteria(driver, job_type, location, throttle):
     """
     Establishes website interaction for inserting the user's search parameters
     Being used as part of the driver initialization
     """
     logger.info(f"Inserting search parameters: Job Type: {job_type}, Location: {location}")
+    throttle.wait_for(driver, EC.presence_of_element_located((By.XPATH, './/input[@name="sc.keyword"]')))
     driver.find_element_by_xpath('.//input[@name="sc.keyword"]').clear()
     driver.find_element_by_xpath('.//input[@name="sc.keyword"]').send_keys(job_type)
 
-    time.sleep(random.uniform(1, 1.5))
-
     driver.find_element_by_xpath('.//input[@id="sc.location"]').clear()
     driver.find_element_by_xpath('.//input[@id="sc.location"]').send_keys(location)
 
-    time.sleep(random.uniform(1, 1.5))
-
+    previous_jobs = driver.find_elements(*JOB_TAG)
+    throttle.pause()
     driver.find_element_by_xpath('.//button[@id="HeroSearchButton"]').click()
+    if previous_jobs:
+        throttle.wait_for(driver, EC.staleness_of(previous_jobs[0]))
+    throttle.wait_for(driver, EC.presence_of_element_located(JOB_TAG))
 
     logger.info("Successfully inserted search parameters")
 
@@ -60,13 +114,12 @@ def bypass_login(driver):
         pass
 
 
-def get_num_of_matched_jobs(driver):
+def get_num_of_matched_jobs(driver, page_content):
     """
     Find the total amount of jobs presence, according to the user's search criteria
     Being used at do_scraping() function
     """
     logger.info("Extracting total number of jobs")
-    page_content = BeautifulSoup(driver.page_source, "html.parser")
     raw = page_content.find('div', attrs={"data-test": "jobCount-H1title"})
 
     if raw:
@@ -74,12 +127,41 @@ def get_num_of_matched_jobs(driver):
         logger.info(f"Found {int(match.group())} jobs in total")
         return int(match.group())
     else:
-        driver.close()
+        if driver:
+            driver.close()
         logger.error("===Something went wrong===")
         raise ValueError("Your search criteria yield no results\n"
                          "Consider changing your search")
 
 
+def get_num_of_pages(page_content):
+    """
+    Find the total amount of result pages, according to the user's search criteria
+    Being used at do_scraping() function for splitting the pages among the workers
+    """
+    logger.info("Extracting total number of pages")
+    raw = page_content.find('div', attrs={"data-test": "page-x-of-y"})
+
+    if raw:
+        match = re.search(r"(\d+)\s*$", raw.text.strip())
+        if match:
+            logger.info(f"Found {int(match.group(1))} pages in total")
+            return int(match.group(1))
+
+    logger.warning("Could not find the number of pages, assuming a single page")
+    return 1
+
+
+def get_page_url(search_url, page):
+    """
+    Construct the URL of a given result page out of the search URL (Glassdoor uses an '_IP<page>' suffix)
+    """
+    if page == 1:
+        return PAGE_URL_PATTERN.sub(".htm", search_url, count=1)
+
+    return PAGE_URL_PATTERN.sub(f"_IP{page}.htm", search_url, count=1)
+
+
 def get_common_data(bs_job):
     """
     Scrap data from the mainCol jobs list (regardless of the job's tabs)
@@ -132,46 +214,41 @@ def get_job_salary(bs_job):
     return min_sal, max_sal
 
 
-def get_company_data(driver):
+@timed()
+def get_company_data(driver, pane_content, throttle, record=None):
     """
     This function interacts with the web, clicking this specific job's company tab (if present)
     and extract pre-defined data.
+    pane_content is the parsed job-detail pane, as it was right after clicking the job
+    record - optional callable, called with the tab name once the tab is loaded (recording fixtures)
     """
     logger.info("Extracting job's company tab data")
-    page_content = BeautifulSoup(driver.page_source, "html.parser")
 
-    if page_content.find('div', COMPANY_TAG):
+    if pane_content.find('div', COMPANY_TAG):
 
         xpath = './/div[@class="tab" and @data-tab-type="overview"]'
         wait = WebDriverWait(driver, 3)
         button = wait.until(EC.presence_of_element_located((By.XPATH,
                                                             xpath)))
 
+        throttle.pause()
         driver.execute_script("arguments[0].click();", button)
         driver.execute_script("arguments[0].click();", button)
 
-        time.sleep(2)
-
-        page_content = BeautifulSoup(driver.page_source, "html.parser")
-        tab_content = page_content.find("div", attrs={"id": "EmpBasicInfo"})
-
-        retries = 3
-        while tab_content is None:
-            if retries == 0:
-                COMPANY_ERRORS.append(1)
-                logger.error("For some reason, could not scrap the tab content")
-                return {}
-            tab_content = page_content.find("div", attrs={"id": "EmpBasicInfo"})
-            retries -= 1
-
-        entities = tab_content.find_all("div", attrs={"class": "infoEntity"})
-
-        job_company = {}
+        throttle.wait_for(driver, EC.presence_of_element_located((By.ID, "EmpBasicInfo")))
+        if record:
+            record('company')
+
+        # Re-read the pane on every attempt, the tab may still be rendering
+        tab_content = RETRY_POLICY.poll(
+            lambda: get_element_soup(driver, DETAIL_PANE_ID).find("div", attrs={"id": "EmpBasicInfo"}),
+            name="company tab")
+        if tab_content is None:
+            COMPANY_ERRORS.append(1)
+            logger.error("For some reason, could not scrap the tab content")
+            return {}
 
-        for ent in entities:
-            field = ent.find('label').text
-            value = ent.find('span').text
-            job_company.update({field: value})
+        job_company = extract_company_data(tab_content)
 
     else:
         logger.info("Has no 'Company' tab")
@@ -181,51 +258,62 @@ def get_company_data(driver):
     return job_company
 
 
-def get_rating_data(driver, bs_job):
+def extract_company_data(tab_content):
+    """
+    Extract the company fields out of a parsed company tab (the EmpBasicInfo div)
+    """
+    entities = tab_content.find_all("div", attrs={"class": "infoEntity"})
+
+    job_company = {}
+
+    for ent in entities:
+        field = ent.find('label').text
+        value = ent.find('span').text
+        job_company.update({field: value})
+
+    return job_company
+
+
+@timed()
+def get_rating_data(driver, bs_job, pane_content, throttle, record=None):
     """
     This function interacts with the web, clicking this specific job's rating tab (if present)
     and extract pre-defined data.
+    pane_content is the parsed job-detail pane, as it was right after clicking the job
+    record - optional callable, called with the tab name once the tab is loaded (recording fixtures)
     """
     logger.info("Extracting job's rating tab data")
-    page_content = BeautifulSoup(driver.page_source, "html.parser")
 
-    if page_content.find('div', RATING_TAG):
+    if pane_content.find('div', RATING_TAG):
 
         xpath = './/div[@class="tab" and @data-tab-type="rating"]'
         wait = WebDriverWait(driver, 3)
         button = wait.until(EC.presence_of_element_located((By.XPATH,
                                                             xpath)))
 
+        throttle.pause()
         driver.execute_script("arguments[0].click();", button)
         driver.execute_script("arguments[0].click();", button)
 
-        time.sleep(random.uniform(1, 3))
+        throttle.wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, "ul.ratings")))
+        if record:
+            record('rating')
 
         try:
             overall_rating = bs_job.find("span", class_="compactStars").text
         except AttributeError as e:
             logger.error(f"===Could not get Overall Rating: {e}===")
             return {}
-        page_content = BeautifulSoup(driver.page_source, "html.parser")
-        tab_content = page_content.find("ul", attrs={"class": "ratings"})
-
-        retries = 3
-        while tab_content is None:
-            if retries == 0:
-                RATING_ERRORS.append(1)
-                logger.error("For some reason, could not scrap the tab content")
-                return {}
-            tab_content = page_content.find("ul", attrs={"class": "ratings"})
-            retries -= 1
-
-        entities = tab_content.find_all("li")
-
-        job_ratings = {"Overall": overall_rating}
-
-        for ent in entities:
-            field = ent.find("span", attrs={"class": "ratingType"}).text
-            value = ent.find("span", attrs={"class": "ratingNum"}).text
-            job_ratings.update({field: value})
+        # Re-read the pane on every attempt, the tab may still be rendering
+        tab_content = RETRY_POLICY.poll(
+            lambda: get_element_soup(driver, DETAIL_PANE_ID).find("ul", attrs={"class": "ratings"}),
+            name="rating tab")
+        if tab_content is None:
+            RATING_ERRORS.append(1)
+            logger.error("For some reason, could not scrap the tab content")
+            return {}
+
+        job_ratings = extract_rating_data(tab_content, overall_rating)
     else:
         logger.info("Has no Rating tab")
         return {}
@@ -234,32 +322,46 @@ def get_rating_data(driver, bs_job):
     return job_ratings
 
 
-def initiate_driver(chromedriver_path, platform, args):
+def extract_rating_data(tab_content, overall_rating):
     """
-    Initiating Chromedriver instance for interacting with the website
+    Extract the rating fields out of a parsed rating tab (the ratings ul)
     """
+    entities = tab_content.find_all("li")
+
+    job_ratings = {"Overall": overall_rating}
+
+    for ent in entities:
+        field = ent.find("span", attrs={"class": "ratingType"}).text
+        value = ent.find("span", attrs={"class": "ratingNum"}).text
+        job_ratings.update({field: value})
+
+    return job_ratings
+
+
+@timed()
+def launch_driver(chromedriver_path, platform, args, throttle, browser_config=None):
+    """
+    Start a Chromedriver instance, open the website and get rid of the sign-up pop up, ready for searching
+    browser_config - the Browser section of the configuration (see Browser_handler), the regular profile if None
+    When args.replay is set, a ReplayDriver serving the recorded fixtures is returned instead
+    """
+    if args.replay:
+        logger.info(f"Replaying the fixtures recorded in {args.replay}")
+        return ReplayDriver(args.replay, HTML_PARSER)
+
     logger.info("Initiating Chrome Driver")
     print("Initiating Google Chrome Driver")
     if platform.lower() == 'linux':
+        from pyvirtualdisplay import Display
         display = Display(visible=0, size=(800, 800))
         display.start()
 
-    options = webdriver.ChromeOptions()
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--incognito')
-    if args.headless:
-        options.add_argument('--headless')
-
-    options.add_experimental_option('excludeSwitches', ['enable-logging'])
-
-    driver = webdriver.Chrome(executable_path=chromedriver_path,
-                              options=options)
+    driver = launch_chrome(chromedriver_path, args.headless, browser_config)
 
+    throttle.pause()
     driver.get(BASE_URL)
-    time.sleep(random.uniform(1, 1.5))
+    throttle.wait_for(driver, document_ready)
     bypass_login(driver)
-    time.sleep(random.uniform(1, 2))
-    insert_search_criteria(driver, args.job_type, args.location)
 
     logger.info("Chrome Driver has been initiated successfully")
     print("Done")
@@ -267,6 +369,78 @@ def initiate_driver(chromedriver_path, platform, args):
     return driver
 
 
+@timed()
+def start_search(driver, args, throttle):
+    """
+    Run the search of args.job_type in args.location on a launched driver
+    (a replay driver is already at its recorded search)
+    """
+    if args.replay:
+        driver.get(get_page_url(driver.current_url, 1))
+        return
+
+    insert_search_criteria(driver, args.job_type, args.location, throttle)
+
+
+def initiate_driver(chromedriver_path, platform, args, throttle, browser_config=None):
+    """
+    Initiating Chromedriver instance for interacting with the website, at the first page of the search results
+    """
+    driver = launch_driver(chromedriver_path, platform, args, throttle, browser_config)
+    start_search(driver, args, throttle)
+
+    return driver
+
+
+def make_throttle(args):
+    """
+    Create the throttle of a run, out of the requests rate and jitter CLI arguments (no throttling when replaying)
+    """
+    if args.replay:
+        return Throttle(min_interval=0, jitter=0)
+
+    return Throttle(min_interval=1 / args.rate if args.rate else 0, jitter=args.jitter)
+
+
+class DriverPool:
+    """
+    Warm drivers (launched once, see launch_driver()), kept open from one search to the next in batch mode,
+    along with the throttle they share (a throttle of their own, unless one shared with other pools is given)
+    """
+
+    def __init__(self, configurations, args, throttle=None):
+        self.args = args
+        self.platform = configurations['Scraping']['Platform']
+        self.browser_config = get_browser_config(configurations)
+        self.driver_path = None if args.replay else get_chromedriver_path(configurations)
+        self.throttle = throttle if throttle is not None else make_throttle(args)
+        self.drivers = []
+        self.launched = 0
+
+    def get(self, amount):
+        """
+        Get amount drivers, launching the missing ones.
+        If a launch fails, the drivers already launched stay in the pool, to be closed by close()
+        """
+        while len(self.drivers) < amount:
+            self.drivers.append(launch_driver(self.driver_path, self.platform, self.args, self.throttle,
+                                              self.browser_config))
+            self.launched += 1
+
+        return self.drivers[:amount]
+
+    def close(self):
+        """
+        Close all the drivers launched (a driver failing to close doesn't keep the others open)
+        """
+        for driver in self.drivers:
+            try:
+                driver.close()
+            except Exception as e:
+                logger.warning(f"Could not close a driver: {e}")
+        self.drivers = []
+
+
 def get_chromedriver_path(configurations):
 
     # Get Driver Path
@@ -290,90 +464,413 @@ def get_chromedriver_path(configurations):
     return driver_path
 
 
-def do_scraping(args, configurations):
+@timed()
+def go_to_page(driver, search_url, current_page, page, throttle):
     """
-    The main function of this module.
-    This function called by the main() function in the Gg_scrap.py script file
+    Move the driver from current_page to page.
+    Clicks the 'Next' button when moving forward by one page, otherwise loads the page URL directly
     """
-    general_data = []
-    company_tab_data = []
-    ratings_tab_data = []
+    if page == current_page:
+        return
 
-    try:
-        driver_path = get_chromedriver_path(configurations)
-    except IOError as e:
-        logger.error(e)
-        raise IOError(e)
-
-    platform = configurations['Scraping']['Platform']
-    driver = initiate_driver(driver_path, platform, args)
+    first_job = driver.find_element(*JOB_TAG)
+    throttle.pause()
+    if page == current_page + 1:
+        logger.info("Moving to next page")
+        xpath = './/a[@data-test="pagination-next"]'
+        wait = WebDriverWait(driver, 3)
+        next_button = wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
+        next_button.click()
+    else:
+        logger.info(f"Loading page number {page}")
+        driver.get(get_page_url(search_url, page))
 
-    try:
-        jobs_found = get_num_of_matched_jobs(driver)
-    except ValueError as e:
-        logger.error(e)
-        raise ValueError(e)
-
-    jobs_to_scrap = min(args.number_of_jobs, jobs_found) if args.number_of_jobs else jobs_found
-    job_id = 1
-    pbar = tqdm(total=jobs_to_scrap, desc="Scraping progress", ncols=100)
-    while len(general_data) < jobs_to_scrap:
-        logger.debug("Inside the While loop")
-        # Jobs on specific page
-        logger.info("")
-        jobs_list = driver.find_elements_by_class_name("jl")
-        page_content = BeautifulSoup(driver.page_source, "html.parser")
-        bs_jobs_list = page_content.find_all("li", class_="jl")
-        for idx, job in enumerate(jobs_list, start=1):
-            logger.debug("Inside the For loop")
-            if len(general_data) == jobs_to_scrap:
-                break
+    throttle.wait_for(driver, EC.staleness_of(first_job))
+    throttle.wait_for(driver, EC.presence_of_element_located(JOB_TAG))
 
-            logger.info(f"Job Number: {job_id}")
-            bs_job = bs_jobs_list[idx - 1]
-            common_data = get_common_data(bs_job)
-            general_data.append(common_data)
 
-            # Click Job
+def scrape_page(driver, page, context):
+    """
+    Scrap all the jobs listed on the page the driver is currently at,
+    handing every scraped job over to the context as soon as it is scraped.
+    Stops as soon as the overall amount of collected jobs (shared between the workers) reaches jobs_to_scrap
+    Jobs whose fingerprint is in known_fingerprints (already in the database) are skipped without clicking,
+    and so are the jobs already checkpointed by a previous (resumed) run.
+    Jobs of a company found in the company cache reuse its tabs data, without clicking
+    """
+    throttle = context.throttle
+
+    jobs_list = driver.find_elements_by_class_name("jl")
+    page_content = get_element_soup(driver, JOBS_LIST_ID)
+    bs_jobs_list = page_content.find_all("li", class_="jl")
+    for idx, job in enumerate(jobs_list, start=1):
+        logger.debug("Inside the For loop")
+        if context.done():
+            break
+
+        if (page, idx) in context.checkpoint.done_jobs:
+            logger.debug(f"Page: {page}, Job Number: {idx} already checkpointed")
+            continue
+
+        logger.info(f"Page: {page}, Job Number: {idx}")
+        bs_job = bs_jobs_list[idx - 1]
+        common_data = get_common_data(bs_job)
+
+        fingerprint = job_fingerprint(common_data['Company_Name'], common_data['Job_Title'], common_data['City'],
+                                      common_data['State'], common_data['Min_Salary'], common_data['Max_Salary'])
+        if context.known_fingerprints and fingerprint in context.known_fingerprints:
+            logger.info("Job already in the database, skipping it")
+            context.collected.skip()
+            continue
+
+        cached = context.company_cache.get(common_data['Company_Name'])
+        if cached is not None:
+            logger.info("Company found in cache, skipping its tabs")
+            job_company, job_ratings = cached
+            context.add_job(page, idx, common_data, job_company, job_ratings)
+            continue
+
+        # Click Job
+        with span('job_click'):
             try:
                 logger.debug("Clicking the job tag")
                 button = job.find_element_by_class_name("jobInfoItem")
+                # The job already selected (the first one of a page) is already displayed in the pane,
+                # which won't change on click: wait for the pane itself rather than for a change of it
+                already_selected = 'selected' in (bs_job.get('class') or [])
+                previous_pane = None if already_selected else driver.execute_script(OUTER_HTML_SCRIPT,
+                                                                                   DETAIL_PANE_ID)
+                throttle.pause()
                 driver.execute_script("arguments[0].click();", button)
                 logger.debug("Succesfully Clicked")
             except StaleElementReferenceException as e:
                 logger.error(f"===Encountered a problem: {e}===")
                 continue
 
-            time.sleep(random.uniform(1, 3))
+            pane_html = throttle.wait_for(driver, element_html_changed(DETAIL_PANE_ID, previous_pane))
+
+        # One parse of the job-detail pane, shared by both tabs
+        if pane_html:
+            with span('parse'):
+                pane_content = BeautifulSoup(pane_html, HTML_PARSER)
+        else:
+            pane_content = get_element_soup(driver, DETAIL_PANE_ID)
+        context.record(driver, 'job', page, idx)
+        record_tab = functools.partial(context.record, driver, page=page, idx=idx)
+
+        # Get Company Data
+        job_company = RETRY_POLICY.call(get_company_data, driver, pane_content, throttle, record_tab)
+
+        # Get Rating Data
+        job_ratings = RETRY_POLICY.call(get_rating_data, driver, bs_job, pane_content, throttle, record_tab)
+        context.company_cache.put(common_data['Company_Name'], job_company, job_ratings)
+
+        context.add_job(page, idx, common_data, job_company, job_ratings)
 
-            # Get Company Data
-            job_company = get_company_data(driver)
-            logger.info("Updating company_tab_data")
-            company_tab_data.append(job_company)
 
-            # Get Rating Data
-            overall_rating = 0
-            job_ratings = get_rating_data(driver, bs_job)
-            logger.info("Updating ratings_tab_data")
-            ratings_tab_data.append(job_ratings)
-            if str(overall_rating) < str(args.rating_threshold):
-                general_data.pop()
-                ratings_tab_data.pop()
-                company_tab_data.pop()
+class JobsCounter:
+    """
+    Thread safe counter of the jobs collected by all the workers
+    """
+
+    def __init__(self, value=0):
+        self.value = value
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def increment(self, limit):
+        """
+        Count one more job, unless the limit was already reached
+        Returns whether the job has been counted
+        """
+        with self._lock:
+            if self.value >= limit:
+                return False
+            self.value += 1
+            return True
+
+    def skip(self):
+        """
+        Count one more job skipped (already in the database)
+        """
+        with self._lock:
+            self.skipped += 1
+
+
+class OrderedWriter:
+    """
+    Thread safe writer, streaming the records into a sink in a stable order (by page and by position on page).
+    Records of the earliest page not completed yet are written right away, whereas records of later pages
+    (scraped meanwhile by other workers) are held until all the pages before them are completed
+    """
 
+    def __init__(self, sink, pages):
+        self.sink = sink
+        self.written = 0
+        self._pages = list(pages)
+        self._head = 0
+        self._pending = {}
+        self._completed = set()
+        self._lock = threading.Lock()
+
+    def add(self, page, idx, common_data, job_company, job_ratings):
+        """
+        Write (or hold) a scraped job
+        """
+        with self._lock:
+            if self._head < len(self._pages) and page == self._pages[self._head]:
+                self._write(common_data, job_company, job_ratings)
             else:
-                job_id += 1
-                logger.info("Updating Progress Bar")
-                pbar.update(1)
+                self._pending.setdefault(page, []).append((idx, common_data, job_company, job_ratings))
+
+    def page_done(self, page):
+        """
+        Mark a page as completed, writing the records held for the pages following it
+        """
+        with self._lock:
+            self._completed.add(page)
+            while self._head < len(self._pages) and self._pages[self._head] in self._completed:
+                self._head += 1
+                self._release_head()
+
+    def close(self):
+        """
+        Write all the records still held (pages left uncompleted, once enough jobs were collected)
+        """
+        with self._lock:
+            while self._head < len(self._pages):
+                self._head += 1
+                self._release_head()
+
+    def _release_head(self):
+        if self._head < len(self._pages):
+            for record in sorted(self._pending.pop(self._pages[self._head], []), key=lambda item: item[0]):
+                self._write(*record[1:])
+
+    def _write(self, common_data, job_company, job_ratings):
+        self.sink.write(assemble_record(common_data, job_company, job_ratings))
+        self.written += 1
+
+
+class ScrapingContext:
+    """
+    State of a scraping run, shared by all the workers
+    """
 
-        # Click 'Next' Button
-        logger.info("Moving to next page")
-        xpath = './/a[@data-test="pagination-next"]'
-        wait = WebDriverWait(driver, 3)
-        next_button = wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
-        next_button.click()
-        time.sleep(random.uniform(1, 2))
+    def __init__(self, args, search_url, throttle, jobs_to_scrap, checkpoint, company_cache, writer,
+                 known_fingerprints=None, recorder=None):
+        self.args = args
+        self.search_url = search_url
+        self.throttle = throttle
+        self.jobs_to_scrap = jobs_to_scrap
+        self.checkpoint = checkpoint
+        self.company_cache = company_cache
+        self.writer = writer
+        self.known_fingerprints = known_fingerprints
+        self.recorder = recorder
+        self.collected = JobsCounter(len(checkpoint.records))
+        self.stopped = threading.Event()
+        self.pbar = tqdm(total=jobs_to_scrap, initial=self.collected.value, desc="Scraping progress", ncols=100)
+
+    def done(self):
+        """
+        Whether the workers have collected enough jobs, or have been stopped
+        """
+        return self.stopped.is_set() or self.collected.value >= self.jobs_to_scrap
+
+    def stop(self):
+        """
+        Stop the workers, after the job each one is at (the run was interrupted)
+        """
+        self.stopped.set()
+
+    def record(self, driver, kind, page, idx=None):
+        """
+        Save the current DOM state as a replay fixture (when recording)
+        """
+        if self.recorder:
+            self.recorder.record(driver, kind, page, idx)
+
+    def meets_threshold(self, job_ratings):
+        """
+        Whether the job's overall company rating reaches the rating threshold
+        (an unrated job only passes when there is no threshold)
+        """
+        threshold = self.args.rating_threshold or 0
+        try:
+            overall_rating = float(job_ratings.get('Overall'))
+        except (TypeError, ValueError):
+            return threshold <= 0
+
+        return overall_rating >= threshold
+
+    def add_job(self, page, idx, common_data, job_company, job_ratings):
+        """
+        Hand a scraped job over to the writer (and to the checkpoint),
+        unless it is filtered out by the rating threshold or enough jobs were already collected
+        """
+        if not self.meets_threshold(job_ratings):
+            self.checkpoint.skip_job(page, idx)
+            return
+
+        if self.collected.increment(self.jobs_to_scrap):
+            self.writer.add(page, idx, common_data, job_company, job_ratings)
+            self.checkpoint.add_job(page, idx, common_data, job_company, job_ratings)
+            logger.info("Updating Progress Bar")
+            self.pbar.update(1)
 
-    driver.close()
 
-    return general_data, company_tab_data, ratings_tab_data
\ No newline at end of file
+def scraping_worker(driver, pages, context, close=True):
+    """
+    Scrap the given pages (in ascending order) with a single driver instance,
+    and close it (unless close is False - a warm driver of a DriverPool).
+    Being used by do_scraping(), one call for each worker
+    """
+    current_page = 1
+    try:
+        for page in pages:
+            if context.done():
+                break
+            go_to_page(driver, context.search_url, current_page, page, context.throttle)
+            current_page = page
+            context.record(driver, 'listing', page)
+            scrape_page(driver, page, context)
+            if context.stopped.is_set():
+                # Not completed: its remaining jobs are scraped on resume
+                break
+            context.checkpoint.page_done(page)
+            context.writer.page_done(page)
+    finally:
+        if close:
+            driver.close()
+
+
+def start_run(args, configurations, sink, throttle, search_url, jobs_to_scrap, total_pages,
+              known_fingerprints=None, recorder=None):
+    """
+    Set up the state of a scraping run: its checkpoint (resumed if args.resume is set), company cache
+    and ordered writer, with the jobs checkpointed by a previous run written first, in order
+    """
+    checkpoint = Checkpoint(configurations['Scraping'].get('checkpoint_path', DEFAULT_CHECKPOINT_PATH),
+                            every=args.checkpoint_every)
+    checkpoint.start(args, search_url, resume=args.resume)
+    company_cache = CompanyCache(args.company_cache, ttl=args.cache_ttl)
+
+    writer = OrderedWriter(sink, range(1, total_pages + 1))
+    for record in sorted(checkpoint.records, key=lambda record: (record[0], record[1])):
+        writer.add(*record)
+    for page in sorted(checkpoint.done_pages):
+        writer.page_done(page)
+
+    return ScrapingContext(args, search_url, throttle, jobs_to_scrap, checkpoint, company_cache, writer,
+                           known_fingerprints, recorder)
+
+
+def close_run(context):
+    """
+    Flush the writer and the checkpoint of a scraping run (also when the run was interrupted)
+    """
+    context.writer.close()
+    context.checkpoint.close()
+    context.pbar.close()
+
+
+def report_run(context, workers):
+    """
+    Report the throttling, the company cache and the skipped jobs of a completed scraping run
+    """
+    context.throttle.report(workers)
+    context.company_cache.save()
+    context.company_cache.report()
+    if context.known_fingerprints:
+        logger.info(f"Skipped {context.collected.skipped} jobs already in the database")
+        print(f"Skipped {context.collected.skipped} jobs already in the database")
+
+
+def do_scraping(args, configurations, sink, known_fingerprints=None, pool=None):
+    """
+    The main function of this module.
+    This function called by the main() function in the Gg_scrap.py script file
+    Every scraped job is streamed into the sink (a Results_handler.RecordSink) as soon as it is scraped,
+    and the amount of jobs written is returned.
+    When args.workers > 1, the result pages are split among several Chrome driver instances
+    and the results are written according to their page and position on page
+    known_fingerprints - fingerprints of the job posts already in the database (incremental mode), to be skipped
+    The scraped jobs are checkpointed along the way, when args.resume is set the run continues
+    from the last checkpoint
+    When args.record is set, every DOM state read is saved as a fixture into that directory,
+    when args.replay is set, the run is served offline from such fixtures (without throttling)
+    pool - a DriverPool of warm drivers to search with, left open for the next searches (batch mode).
+    When None, the drivers are launched for this search only, and closed at its end (also when it fails)
+    With several workers, args.number_of_jobs is filled by whichever jobs the workers collect first,
+    so which jobs make the cut depends on timing (the written jobs are ordered, though)
+    """
+    warm = pool is not None
+    if not warm:
+        try:
+            pool = DriverPool(configurations, args)
+        except IOError as e:
+            logger.error(e)
+            raise IOError(e)
+
+    try:
+        set_html_parser(configurations['Scraping'].get('parser', HTML_PARSER))
+        configure_resilience(configurations.get('Resilience'))
+        throttle = pool.throttle
+        driver = pool.get(1)[0]
+        start_search(driver, args, throttle)
+
+        page_content = get_page_soup(driver)
+        try:
+            jobs_found = get_num_of_matched_jobs(None, page_content)
+        except ValueError as e:
+            logger.error(e)
+            raise ValueError(e)
+
+        jobs_to_scrap = min(args.number_of_jobs, jobs_found) if args.number_of_jobs else jobs_found
+        total_pages = get_num_of_pages(page_content)
+        search_url = driver.current_url
+
+        recorder = None
+        if args.record:
+            recorder = Recorder(args.record)
+            recorder.start(search_url, total_pages)
+
+        context = start_run(args, configurations, sink, throttle, search_url, jobs_to_scrap, total_pages,
+                            known_fingerprints, recorder)
+
+        pages_left = [page for page in range(1, total_pages + 1) if page not in context.checkpoint.done_pages]
+        workers = max(1, min(args.workers, len(pages_left)))
+        pages_per_worker = [pages_left[first::workers] for first in range(workers)]
+        logger.info(f"Scraping {len(pages_left)} pages using {workers} workers")
+
+        drivers = pool.get(workers)
+        for worker_driver in drivers[1:]:
+            start_search(worker_driver, args, throttle)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(scraping_worker, worker_driver, pages, context, False)
+                           for worker_driver, pages in zip(drivers, pages_per_worker)]
+                try:
+                    for future in futures:
+                        future.result()
+                except KeyboardInterrupt:
+                    # Leaving the executor waits for the workers: stop them after their current job
+                    logger.critical("Interrupted, stopping the workers")
+                    context.stop()
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            close_run(context)
+
+        report_run(context, workers)
+        if recorder:
+            logger.info(f"Recorded {recorder.saved} fixtures into {args.record}")
+    finally:
+        # The drivers launched for this search only (the ones launched before a failing launch included)
+        if not warm:
+            pool.close()
+
+    return context.writer.written
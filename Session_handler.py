@@ -0,0 +1,14 @@
+from requests.adapters import HTTPAdapter
+import requests
+
+
+def make_session(pool_size=10):
+    """
+    Create a requests Session keeping up to pool_size connections alive per host
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
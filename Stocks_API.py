@@ -1,50 +1,164 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from Session_handler import make_session
+from tqdm import tqdm
+import threading
 import logging
 import json
+import time
+import os
 
 logger = logging.getLogger(__name__)
-SEARCH = "https://stock-exchange-dot-full-stack-course-services.ew.r.appspot.com/api/v3/search"
-PROFILE = "https://stock-exchange-dot-full-stack-course-services.ew.r.appspot.com/api/v3/profile/"
+API_BASE = "https://stock-exchange-dot-full-stack-course-services.ew.r.appspot.com/api/v3"
+STOCK_MARKETS = ['NYSE', 'NASDAQ', 'AMEX', 'EURONEX', 'TSX',
+                 'INDEXES', 'ETFs', 'MUTUAL FUNDS', 'FOREX', 'CRYPTO']
+NOT_FOUND = (None, None, None, None, None)
+DEFAULT_CACHE_PATH = "stocks_cache.json"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 24 * 3600
 
+_SESSION = None
 
-def extract_info_API(company_name):
+
+def get_session():
+    """
+    Get the module's shared Session (created on first use)
+    """
+    global _SESSION
+
+    if _SESSION is None:
+        _SESSION = make_session()
+
+    return _SESSION
+
+
+def extract_info_API(company_name, session=None, api_base=API_BASE):
     """ The function takes the company_name as a parameter and returns information from the Stock Exchange
     platform regarding the stock price, market capitalization, currency and website of the company """
 
-    # Extracting the symbol from the company name
-    stock_markets = ['NYSE', 'NASDAQ', 'AMEX', 'EURONEX', 'TSX',
-                     'INDEXES', 'ETFs', 'MUTUAL FUNDS', 'FOREX', 'CRYPTO']
+    session = session or get_session()
 
-    for market in stock_markets:
+    # Extracting the symbol from the company name, market by market
+    for market in STOCK_MARKETS:
         parameters = {'query': company_name,
                       'limit': '1', 'exchange': market}
 
-        response_symbol = requests.get(SEARCH, params=parameters)
+        response_symbol = session.get(api_base + "/search", params=parameters, timeout=10)
+        response_symbol.raise_for_status()
         response_json_symbol = response_symbol.json()
 
-        if len(response_json_symbol):
+        if not len(response_json_symbol):
+            continue
+
+        try:
+            symbol = response_json_symbol[0]['symbol']
+        except Exception as e:
+            logger.warning(f"Unexpected search response for {company_name}: {e}")
+            continue
+
+        # Extracting the company_info from the symbol
+        api_profile = api_base + "/profile/" + str(symbol)
+
+        response_comp = session.get(api_profile, timeout=10)
+        response_comp.raise_for_status()
+        response_json_comp = response_comp.json()
+        stock_price = response_json_comp[0]['price']
+        market_cap = response_json_comp[0]['mktCap']
+        currency = response_json_comp[0]['currency']
+        website = response_json_comp[0]['website']
+        exchange_market = response_json_comp[0]['exchangeShortName']
+
+        return stock_price, market_cap, currency, website, exchange_market
+
+    return NOT_FOUND
+
+
+class StocksEnricher:
+    """
+    Concurrent stocks enrichment engine.
+    Looks companies up with a bounded pool of threads sharing a pooled Session, and memoizes the results
+    per company in a disk cache. Companies the API doesn't know are cached as well, for a shorter time
+    (negative_ttl), so they are not looked up again on every run. Failed lookups (network or server errors)
+    aren't cached, so they are tried again on the next run
+    """
+
+    def __init__(self, max_workers=8, cache_path=DEFAULT_CACHE_PATH, api_base=API_BASE,
+                 ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.max_workers = max_workers
+        self.cache_path = cache_path
+        self.api_base = api_base
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.session = make_session(max_workers)
+
+        self._cache = {}
+        self._lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, encoding='utf8') as f:
+                self._cache = json.load(f)
+
+    def _cached(self, company_name):
+        entry = self._cache.get(company_name)
+        if entry is None:
+            return None
+
+        ttl = self.ttl if entry['found'] else self.negative_ttl
+        if time.time() - entry['time'] > ttl:
+            return None
+
+        return tuple(entry['info'])
+
+    def lookup(self, company_name):
+        """
+        Get the stock information of a single company (from the cache if possible),
+        NOT_FOUND if the API doesn't know it or the lookup failed
+        """
+        with self._lock:
+            cached = self._cached(company_name)
+        if cached is not None:
+            return cached
+
+        try:
+            info = extract_info_API(company_name, session=self.session, api_base=self.api_base)
+        except Exception as e:
+            logger.warning(f"Stocks lookup of {company_name} failed: {e}")
+            return NOT_FOUND
+
+        with self._lock:
+            self._cache[company_name] = {'time': time.time(), 'found': info != NOT_FOUND, 'info': list(info)}
+
+        return info
+
+    def enrich(self, company_names):
+        """
+        Look up all the given companies concurrently.
+        Returns a dictionary of company name -> (stock price, market cap, currency, website, exchange market)
+        """
+        names = list(dict.fromkeys(company_names))
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.lookup, name): name for name in names}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Extracting Stocks Data", ncols=100):
+                results[futures[future]] = future.result()
+
+        self.save()
 
-            try:
-                symbol = response_json_symbol[0]['symbol']
-            except Exception as e:
-                print(e)
-                continue
+        found = sum(info != NOT_FOUND for info in results.values())
+        logger.info(f"Found stocks data for {found} out of {len(results)} companies")
 
-            # Extracting the company_info from the symbol
-            api_profile = PROFILE + str(symbol)
+        return results
 
-            response_comp = requests.get(api_profile)
-            response_json_comp = response_comp.json()
-            stock_price = response_json_comp[0]['price']
-            market_cap = response_json_comp[0]['mktCap']
-            currency = response_json_comp[0]['currency']
-            website = response_json_comp[0]['website']
-            exchange_market = response_json_comp[0]['exchangeShortName']
+    def save(self):
+        """
+        Persist the cache on disk (if the enricher has a cache path)
+        """
+        if not self.cache_path:
+            return
 
-            return stock_price, market_cap, currency, website, exchange_market
-        else:
-            return None, None, None, None, None
+        with self._lock:
+            with open(self.cache_path, 'w', encoding='utf8') as f:
+                json.dump(self._cache, f)
 
 
 if __name__ == "__main__":
-    print(extract_info_API('Apple'))
\ No newline at end of file
+    print(extract_info_API('Apple'))
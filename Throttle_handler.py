@@ -0,0 +1,170 @@
+from Timing_handler import TIMINGS
+import threading
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+BLOCK_MARKERS = ("captcha", "access denied", "pardon our interruption", "security | glassdoor",
+                 "are you a human")
+OUTER_HTML_SCRIPT = "var el = document.getElementById(arguments[0]); return el ? el.outerHTML : null;"
+
+
+def element_html_changed(element_id, previous_html):
+    """
+    Selenium expected condition: the outerHTML of the element with the given id is present
+    and differs from previous_html (just present if previous_html is None). Returns the new outerHTML once it does.
+    """
+    def condition(driver):
+        html = driver.execute_script(OUTER_HTML_SCRIPT, element_id)
+        if html is not None and html != previous_html:
+            return html
+        return False
+
+    return condition
+
+
+class Throttle:
+    """
+    Central throttling component, shared by all the drivers of a run.
+    - Enforces a minimum interval (with jitter) between two requests to the website.
+    - Waits on explicit DOM conditions rather than sleeping a fixed amount of time.
+    - Backs off automatically on slow responses and block pages, and recovers gradually afterwards.
+    - Keeps track of the time spent sleeping versus the time spent working.
+    """
+
+    def __init__(self, min_interval=2.0, jitter=0.5, max_interval=60.0, backoff_factor=2.0,
+                 slow_response=5.0, timeout=10.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.slow_response = slow_response
+        self.timeout = timeout
+
+        self._interval = min_interval
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._started = time.monotonic()
+        self.sleep_time = 0.0
+        self.wait_time = 0.0
+        self.backoffs = 0
+        self.blocks = 0
+
+    @property
+    def interval(self):
+        """
+        Getter function - get the current (adaptive) interval between requests
+        """
+        return self._interval
+
+    def pause(self):
+        """
+        Block until the caller is allowed to send the next request to the website
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self._interval + random.uniform(0, self.jitter)
+
+        if slot > now:
+            self._sleep(slot - now)
+
+    def wait_for(self, driver, condition, timeout=None):
+        """
+        Wait until the given Selenium condition is satisfied and return its value.
+        The response time is used for adapting the interval between requests:
+        a timeout counts as a slow response, only an actual block page counts as a block.
+        Returns None if the condition wasn't satisfied within the timeout
+        """
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        start = time.monotonic()
+        try:
+            result = WebDriverWait(driver, timeout or self.timeout, poll_frequency=0.1).until(condition)
+        except TimeoutException:
+            result = None
+        elapsed = time.monotonic() - start
+
+        with self._lock:
+            self.wait_time += elapsed
+        TIMINGS.add('page_wait', elapsed)
+
+        if result is None:
+            logger.warning(f"Condition not satisfied within {timeout or self.timeout}s")
+        self.report_response(elapsed, blocked=self.is_blocked(driver))
+
+        return result
+
+    def report_response(self, elapsed, blocked=False):
+        """
+        Adapt the interval between requests according to the last response
+        """
+        with self._lock:
+            if blocked or elapsed > self.slow_response:
+                self._interval = min(self._interval * self.backoff_factor, self.max_interval)
+                self.backoffs += 1
+                logger.warning(f"Slow response or block page ({elapsed:.2f}s), "
+                               f"backing off to {self._interval:.2f}s between requests")
+            else:
+                self._interval = max(self._interval * 0.9, self.min_interval)
+
+    def is_blocked(self, driver):
+        """
+        Check whether the website served a block/captcha page instead of the requested one
+        """
+        try:
+            title = driver.title.lower()
+        except Exception:
+            return False
+
+        if any(marker in title for marker in BLOCK_MARKERS):
+            self.report_block(driver.title)
+            return True
+
+        return False
+
+    def report_block(self, description):
+        """
+        Count a block page served by the website
+        """
+        with self._lock:
+            self.blocks += 1
+        logger.error(f"Block page detected: {description}")
+
+    def _sleep(self, seconds):
+        time.sleep(seconds)
+        TIMINGS.add('throttle_sleep', seconds)
+        with self._lock:
+            self.sleep_time += seconds
+
+    def summary(self, workers=1):
+        """
+        Summarize the time spent sleeping against the time spent working (over all workers)
+        """
+        wall_time = time.monotonic() - self._started
+        total_time = wall_time * workers
+        return {'wall_time': wall_time,
+                'sleep_time': self.sleep_time,
+                'wait_time': self.wait_time,
+                'work_time': max(total_time - self.sleep_time - self.wait_time, 0),
+                'backoffs': self.backoffs,
+                'blocks': self.blocks,
+                'final_interval': self._interval}
+
+    def report(self, workers=1):
+        """
+        Log and print the throttling summary, at the end of a run
+        """
+        stats = self.summary(workers)
+        message = (f"Throttling summary: wall time {stats['wall_time']:.1f}s, "
+                   f"slept {stats['sleep_time']:.1f}s, waited on page {stats['wait_time']:.1f}s, "
+                   f"worked {stats['work_time']:.1f}s, "
+                   f"{stats['backoffs']} back-offs, {stats['blocks']} block pages")
+        logger.info(message)
+        print(message)
+
+        return stats
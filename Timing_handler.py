@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+import functools
+import threading
+import datetime
+import logging
+import json
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_PATH = "run_profiles.jsonl"
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of already sorted values
+    """
+    if not sorted_values:
+        return None
+
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Timings:
+    """
+    Thread safe collection of the durations of the timed stages of a run (see span() and timed())
+    """
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        """
+        Record a duration of the given stage
+        """
+        with self._lock:
+            self._samples.setdefault(name, []).append(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._samples = {}
+
+    def summary(self):
+        """
+        Summarize every stage: count, total, mean, p50, p95 and max durations (seconds)
+        """
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+
+        return {name: {'count': len(values),
+                       'total': sum(values),
+                       'mean': sum(values) / len(values),
+                       'p50': percentile(values, 0.5),
+                       'p95': percentile(values, 0.95),
+                       'max': values[-1]}
+                for name, values in samples.items()}
+
+    def report(self, path=DEFAULT_PROFILE_PATH, run_info=None):
+        """
+        Log and print the run profile (stages by total time), and append it as a JSON line to path
+        (one line per run, for tracking the trends), along with run_info
+        """
+        summary = self.summary()
+        lines = [f"{'Stage':<28}{'count':>8}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, stats in sorted(summary.items(), key=lambda item: item[1]['total'], reverse=True):
+            lines.append(f"{name:<28}{stats['count']:>8}{stats['total']:>10.2f}{stats['mean'] * 1000:>10.1f}"
+                         f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}")
+        message = "Run profile:\n" + '\n'.join(lines)
+        logger.info(message)
+        print(message)
+
+        if path:
+            with open(path, 'a', encoding='utf8') as f:
+                f.write(json.dumps({'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                                    'run': run_info or {}, 'stages': summary}) + '\n')
+            logger.info(f"Run profile appended to {path}")
+
+        return summary
+
+
+TIMINGS = Timings()
+
+
+@contextmanager
+def span(name, timings=TIMINGS):
+    """
+    Time the with block as a sample of the given stage
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed(name=None):
+    """
+    Time every call of the decorated function as a sample of the given stage (the function's name if None)
+    """
+    def decorator(func):
+        stage = name or func.__name__
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+
+        return inner
+
+    return decorator
@@ -0,0 +1,66 @@
+import json
+import sys
+import os
+
+import pytest
+
+# The modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEARCH_URL = "https://www.glassdoor.com/Job/new-york-data-scientist-jobs-SRCH_IL.0,8_IC1132348_KO9,23.htm"
+
+# Two result pages of two jobs each: (company, title, location, salary, overall rating, size, culture rating)
+JOBS = {1: [("Acme", "Data Scientist", "New York, NY", "$100K-$150K (Glassdoor est.)", "4.2",
+             "51 to 200 Employees", "4.0"),
+            ("Globex", "Data Analyst", "Brooklyn, NY", "$80K-$95K (Glassdoor est.)", "3.1",
+             "1 to 50 Employees", "3.5")],
+        2: [("Initech", "ML Engineer", "New York, NY", "$120K-$160K (Glassdoor est.)", "3.9",
+             "201 to 500 Employees", "3.8"),
+            ("Acme", "Data Engineer", "Remote", None, "4.2", "51 to 200 Employees", "4.0")]}
+
+TABS = ('<div class="tab" data-tab-type="overview">Company</div>'
+        '<div class="tab" data-tab-type="rating">Rating</div>')
+
+
+def listing_html(page, pane):
+    """
+    A result page, the job-detail pane (JDCol) holding pane
+    """
+    jobs = []
+    for idx, (company, title, location, salary, overall, size, culture) in enumerate(JOBS[page], start=1):
+        salary_tag = f'<span class="css-18034rf">{salary}</span>' if salary else ''
+        jobs.append(f'<li class="jl{" selected" if idx == 1 else ""}"><div class="jobContainer">'
+                    f'<div class="jobHeader">{company}</div><a class="jobTitle" href="/job/{page}-{idx}">{title}</a>'
+                    f'<span class="loc">{location}</span>{salary_tag}<span class="compactStars">{overall}</span>'
+                    f'<div class="jobInfoItem">Details</div></div></li>')
+
+    return (f'<html><head><title>Jobs</title></head><body>'
+            f'<div data-test="jobCount-H1title">{sum(len(jobs) for jobs in JOBS.values())} Jobs</div>'
+            f'<div id="MainCol"><ul>{"".join(jobs)}</ul></div>'
+            f'<div data-test="page-x-of-y">Page {page} of {len(JOBS)}</div>'
+            f'<a data-test="pagination-next">Next</a>'
+            f'<div id="JDCol">{pane}</div></body></html>')
+
+
+@pytest.fixture
+def replay_fixture(tmp_path):
+    """
+    A recorded run (see Replay_handler.Recorder) of a two pages search, returns its directory
+    """
+    fixture_dir = tmp_path / 'fixture'
+    fixture_dir.mkdir()
+    (fixture_dir / 'manifest.json').write_text(json.dumps({'search_url': SEARCH_URL, 'total_pages': len(JOBS)}))
+
+    for page, jobs in JOBS.items():
+        (fixture_dir / f'listing_{page}.html').write_text(listing_html(page, '<div>Select a job</div>'))
+        for idx, (company, title, location, salary, overall, size, culture) in enumerate(jobs, start=1):
+            job_pane = f'<div class="jobDescription">{title} at {company}</div>{TABS}'
+            company_tab = (f'<div id="EmpBasicInfo"><div class="infoEntity"><label>Size</label><span>{size}</span>'
+                           f'</div><div class="infoEntity"><label>Industry</label><span>IT</span></div></div>')
+            rating_tab = (f'<ul class="ratings"><li><span class="ratingType">Culture &amp; Values</span>'
+                          f'<span class="ratingNum">{culture}</span></li></ul>')
+            (fixture_dir / f'job_{page}_{idx}.html').write_text(listing_html(page, job_pane))
+            (fixture_dir / f'company_{page}_{idx}.html').write_text(listing_html(page, job_pane + company_tab))
+            (fixture_dir / f'rating_{page}_{idx}.html').write_text(listing_html(page, job_pane + rating_tab))
+
+    return str(fixture_dir)
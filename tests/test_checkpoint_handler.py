@@ -0,0 +1,89 @@
+from argparse import Namespace
+
+import pytest
+
+from Checkpoint_handler import Checkpoint
+
+SEARCH_URL = "https://www.glassdoor.com/Job/jobs.htm"
+
+
+def search_args(job_type='Data Scientist', location='New York'):
+    return Namespace(job_type=job_type, location=location, number_of_jobs=10)
+
+
+def interrupted_run(path):
+    """
+    A run interrupted after two jobs and a skipped one of page 1, page 1 completed, and a job of page 2
+    """
+    checkpoint = Checkpoint(path, every=2)
+    checkpoint.start(search_args(), SEARCH_URL)
+    checkpoint.add_job(1, 1, {'Company_Name': 'Acme'}, {'Size': '1 to 50 Employees'}, {'Overall': '4.2'})
+    checkpoint.skip_job(1, 2)
+    checkpoint.add_job(1, 3, {'Company_Name': 'Globex'}, {}, {})
+    checkpoint.page_done(1)
+    checkpoint.add_job(2, 1, {'Company_Name': 'Initech'}, {}, {})
+    checkpoint.close()
+
+
+def test_resume_restores_the_run(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    interrupted_run(path)
+
+    resumed = Checkpoint(path)
+    resumed.start(search_args(), SEARCH_URL, resume=True)
+    resumed.close()
+
+    assert resumed.header['search_url'] == SEARCH_URL
+    assert resumed.done_jobs == {(1, 1), (1, 2), (1, 3), (2, 1)}
+    assert resumed.done_pages == {1}
+    assert [record[:3] for record in resumed.records] == [(1, 1, {'Company_Name': 'Acme'}),
+                                                          (1, 3, {'Company_Name': 'Globex'}),
+                                                          (2, 1, {'Company_Name': 'Initech'})]
+
+
+def test_resume_ignores_a_truncated_line(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    interrupted_run(str(path))
+    with open(path, 'a', encoding='utf8') as f:
+        f.write('{"type": "job", "page": 2, "ind')
+
+    resumed = Checkpoint(str(path))
+    resumed.load()
+
+    assert len(resumed.records) == 3
+
+
+def test_resume_refuses_another_search(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    interrupted_run(path)
+
+    with pytest.raises(ValueError):
+        Checkpoint(path).start(search_args(location='Boston'), SEARCH_URL, resume=True)
+
+
+def test_new_run_starts_a_new_checkpoint(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    interrupted_run(path)
+
+    checkpoint = Checkpoint(path)
+    checkpoint.start(search_args(location='Boston'), SEARCH_URL)
+    checkpoint.close()
+
+    reloaded = Checkpoint(path)
+    reloaded.load()
+    assert reloaded.header['location'] == 'Boston'
+    assert not reloaded.done_jobs
+
+
+def test_jobs_are_buffered_until_every(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    checkpoint = Checkpoint(str(path), every=3)
+    checkpoint.start(search_args(), SEARCH_URL)
+    checkpoint.add_job(1, 1, {}, {}, {})
+    checkpoint.add_job(1, 2, {}, {}, {})
+    lines_before = len(path.read_text().splitlines())
+    checkpoint.add_job(1, 3, {}, {}, {})
+    lines_after = len(path.read_text().splitlines())
+    checkpoint.close()
+
+    assert (lines_before, lines_after) == (1, 4)
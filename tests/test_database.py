@@ -0,0 +1,102 @@
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from Database import KeyCache, KEY_CACHE, bulk_insert_rows, replace_nans  # noqa: E402
+from Results_handler import assemble_record, record_to_row  # noqa: E402
+
+
+class FakeCursor:
+    """
+    Cursor of an empty database, recording the statements sent to it
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.staged = []
+        self.rowcount = 0
+        self._query = ''
+
+    def execute(self, query, params=None):
+        self._query = query
+        self.statements.append(query)
+
+    def executemany(self, query, rows):
+        self.staged.extend(rows)
+
+    def fetchone(self):
+        if 'DATABASE()' in self._query:
+            return ('glassdoor',)
+        return (0,)
+
+    def fetchall(self):
+        if 'is_new_company' in self._query:
+            return [(row[1], row[0]) for row in self.staged if row[-3]]
+        return []
+
+
+class FakeConnection:
+    def __init__(self, fail_commit=False):
+        self.fail_commit = fail_commit
+        self.commits = 0
+
+    def commit(self):
+        if self.fail_commit:
+            raise RuntimeError("Lost connection to the database")
+        self.commits += 1
+
+
+@pytest.fixture(autouse=True)
+def empty_key_cache():
+    KEY_CACHE.clear()
+    yield
+    KEY_CACHE.clear()
+
+
+def result_rows():
+    records = [assemble_record({'Company_Name': 'Acme', 'Job_Title': 'Data Scientist', 'City': 'New York'}, {}, {}),
+               assemble_record({'Company_Name': 'Acme', 'Job_Title': 'Data Scientist', 'City': 'New York'}, {}, {}),
+               assemble_record({'Company_Name': 'Globex', 'Job_Title': 'Data Analyst'}, {}, {}),
+               assemble_record({'Job_Title': 'No company'}, {}, {})]
+
+    return [record_to_row(str(index), record) for index, record in enumerate(records)]
+
+
+def test_bulk_loader_stages_new_jobs_once():
+    cursor = FakeCursor()
+    staged = bulk_insert_rows(FakeConnection(), cursor, result_rows())
+
+    # The repeated job and the job without a company aren't staged
+    assert staged == 2
+    assert len(KEY_CACHE.fingerprints) == 2
+    assert set(KEY_CACHE.companies) == {'Acme', 'Globex'}
+
+    # Loading the same rows again: every job is already stored
+    assert bulk_insert_rows(FakeConnection(), FakeCursor(), result_rows()) == 0
+
+
+def test_rolled_back_load_caches_no_keys():
+    with pytest.raises(RuntimeError):
+        bulk_insert_rows(FakeConnection(fail_commit=True), FakeCursor(), result_rows())
+
+    assert not KEY_CACHE.fingerprints and not KEY_CACHE.companies
+
+    # The retry loads the jobs
+    assert bulk_insert_rows(FakeConnection(), FakeCursor(), result_rows()) == 2
+
+
+def test_key_cache_merge():
+    keys = KeyCache()
+    keys.companies['Acme'] = 1
+    keys.locations[('New York', 'NY')] = 2
+    keys.fingerprints.add('f' * 40)
+
+    cache = KeyCache()
+    cache.merge(keys)
+
+    assert (cache.companies, cache.locations, cache.fingerprints) == \
+        ({'Acme': 1}, {('New York', 'NY'): 2}, {'f' * 40})
+
+
+def test_replace_nans():
+    assert replace_nans(['Acme', '', None, '4.2']) == ['Acme', None, None, '4.2']
@@ -0,0 +1,90 @@
+import sqlite3
+import time
+
+import pytest
+
+from Queue_handler import SearchQueue, QUEUE_TABLE
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SearchQueue(str(tmp_path / 'queue.sqlite'), retry_delay=60)
+
+
+def test_claims_by_priority_then_age(queue):
+    low = queue.add('Data Analyst', 'Boston')
+    high = queue.add('Data Scientist', 'New York', priority=5)
+    other_low = queue.add('ML Engineer', 'Austin')
+
+    assert [queue.claim()['id'] for _ in range(3)] == [high, low, other_low]
+    assert queue.claim() is None
+
+
+def test_claim_marks_the_search_running(queue):
+    search_id = queue.add('Data Scientist', 'New York', number_of_jobs=20, rating_threshold=3.5)
+    search = queue.claim()
+
+    assert (search['id'], search['number_of_jobs'], search['rating_threshold']) == (search_id, 20, 3.5)
+    assert queue.searches('running')[0]['attempts'] == 1
+
+
+def test_unset_rating_threshold_stays_null(queue):
+    queue.add('Data Scientist', 'New York')
+
+    assert queue.claim()['rating_threshold'] is None
+
+
+def test_failed_search_is_retried_with_backoff(queue):
+    search_id = queue.add('Data Scientist', 'New York', max_attempts=3)
+
+    queue.fail(queue.claim()['id'], "timeout")
+    search = queue.searches()[0]
+    assert search['status'] == 'pending'
+    assert search['not_before'] == pytest.approx(time.time() + 60, abs=5)
+    assert queue.claim() is None
+    assert queue.next_due() == pytest.approx(60, abs=5)
+
+    # Second failure: the delay doubles
+    with sqlite3.connect(queue.path) as connection:
+        connection.execute("UPDATE searches SET not_before = 0 WHERE id = ?", (search_id,))
+    queue.fail(queue.claim()['id'], "timeout")
+    assert queue.searches()[0]['not_before'] == pytest.approx(time.time() + 120, abs=5)
+
+
+def test_search_fails_for_good_out_of_attempts(queue):
+    search_id = queue.add('Data Scientist', 'New York', max_attempts=1)
+    queue.fail(queue.claim()['id'], "blocked")
+
+    search = queue.searches()[0]
+    assert (search['id'], search['status'], search['last_error']) == (search_id, 'failed', 'blocked')
+    assert queue.next_due() is None
+
+
+def test_complete_records_the_throughput(queue):
+    queue.add('Data Scientist', 'New York')
+    queue.complete(queue.claim()['id'], jobs_written=30, elapsed=60.0)
+
+    assert queue.report() == {'done': 1}
+    assert queue.searches('done')[0]['jobs_written'] == 30
+
+
+def test_recover_puts_running_searches_back(queue):
+    queue.add('Data Scientist', 'New York')
+    queue.claim()
+
+    assert queue.recover() == 1
+    assert queue.claim() is not None
+
+
+def test_migrates_not_null_rating_thresholds(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    with sqlite3.connect(path) as connection:
+        connection.execute(QUEUE_TABLE.replace("rating_threshold REAL,", "rating_threshold REAL NOT NULL DEFAULT 0,"))
+        connection.execute("INSERT INTO searches (job_type, location, created) VALUES ('Data Scientist', 'Boston', 0)")
+        connection.execute("INSERT INTO searches (job_type, location, rating_threshold, created) "
+                           "VALUES ('Data Analyst', 'Boston', 4, 0)")
+
+    queue = SearchQueue(path)
+    queue.add('ML Engineer', 'Austin')
+
+    assert [search['rating_threshold'] for search in queue.searches()] == [None, 4.0, None]
@@ -0,0 +1,57 @@
+import csv
+
+from Record_store import RecordStore, TEXT, NUMBER
+
+
+def make_store():
+    store = RecordStore([('Company', TEXT), ('Overall', NUMBER)])
+    store.append({'Company': 'Acme', 'Overall': 4.2})
+    store.append({'Company': None, 'Overall': '3.5'})
+    store.append({'Company': 'Globex', 'Overall': float('nan')})
+
+    return store
+
+
+def test_columns_keep_values_and_nulls():
+    store = make_store()
+
+    assert len(store) == 3
+    assert store.column('Company') == ['Acme', None, 'Globex']
+    assert store.column('Overall') == [4.2, 3.5, None]
+
+
+def test_late_column_is_null_before_its_registration():
+    store = make_store()
+    store.append({'Company': 'Initech', 'Size': 200}, new_kind=NUMBER)
+
+    assert store.columns == ['Company', 'Overall', 'Size']
+    assert store.column('Size') == [None, None, None, 200.0]
+    assert store.column('Overall')[-1] is None
+
+
+def test_rows_are_exported_in_chunks():
+    store = RecordStore([('Index', NUMBER)])
+    for index in range(10):
+        store.append({'Index': index if index % 3 else None})
+
+    assert list(store.rows(chunk_size=4)) == [(None,), (1.0,), (2.0,), (None,), (4.0,), (5.0,), (None,), (7.0,),
+                                              (8.0,), (None,)]
+
+
+def test_to_csv_writes_empty_cells_for_nulls(tmp_path):
+    file_path = tmp_path / 'store.csv'
+    make_store().to_csv(str(file_path))
+
+    with open(file_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+
+    assert rows == [['Company', 'Overall'], ['Acme', '4.2'], ['', '3.5'], ['Globex', '']]
+
+
+def test_texts_are_interned():
+    store = RecordStore([('Company', TEXT)])
+    store.append({'Company': ''.join(['Ac', 'me'])})
+    store.append({'Company': ''.join(['A', 'cme'])})
+
+    first, second = store.column('Company')
+    assert first is second
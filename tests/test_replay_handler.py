@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+
+from Replay_handler import ReplayDriver, Recorder, xpath_to_css, fixture_name
+from Results_handler import RecordSink
+import Scraping_handler
+from Gg_scrap import parse_args
+
+
+class ListSink(RecordSink):
+    def __init__(self):
+        self.records = []
+
+    def write_prepared(self, record):
+        self.records.append(record)
+
+
+def test_xpath_to_css():
+    assert xpath_to_css('.//div[@class="tab" and @data-tab-type="overview"]') == \
+        'div[class="tab"][data-tab-type="overview"]'
+    with pytest.raises(ValueError):
+        xpath_to_css('//div/span')
+
+
+def test_recorder_saves_the_page_source(tmp_path):
+    class Page:
+        page_source = "<html><body>listing</body></html>"
+
+    recorder = Recorder(str(tmp_path))
+    recorder.start("https://www.glassdoor.com/Job/jobs.htm", 3)
+    recorder.record(Page(), 'listing', 2)
+
+    assert recorder.saved == 1
+    assert (tmp_path / fixture_name('listing', 2)).read_text() == Page.page_source
+    assert json.loads((tmp_path / 'manifest.json').read_text())['total_pages'] == 3
+
+
+def test_replay_driver_follows_the_clicks(replay_fixture):
+    driver = ReplayDriver(replay_fixture)
+    jobs = driver.find_elements(By.CLASS_NAME, 'jl')
+    assert len(jobs) == 2
+
+    jobs[1].find_element_by_class_name('jobInfoItem').click()
+    assert 'Data Analyst at Globex' in driver.page_source
+
+    driver.find_element(By.XPATH, './/div[@class="tab" and @data-tab-type="overview"]').click()
+    assert 'EmpBasicInfo' in driver.page_source
+
+    driver.find_element(By.XPATH, './/a[@data-test="pagination-next"]').click()
+    assert driver.page == 2
+    assert '_IP2.htm' in driver.current_url
+    with pytest.raises(StaleElementReferenceException):
+        jobs[0].is_enabled()
+
+
+def replay_args(fixture_dir, *argv):
+    return parse_args(['--replay', fixture_dir, *argv])
+
+
+@pytest.fixture
+def configurations(tmp_path):
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')) as config_file:
+        configurations = json.load(config_file)
+    configurations['Scraping']['checkpoint_path'] = str(tmp_path / 'checkpoint.jsonl')
+    configurations['Scraping']['parser'] = 'html.parser'
+
+    return configurations
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_do_scraping_replays_a_run_in_order(replay_fixture, configurations, workers):
+    sink = ListSink()
+    written = Scraping_handler.do_scraping(replay_args(replay_fixture, '--workers', str(workers)),
+                                           configurations, sink)
+
+    assert written == 4
+    assert [(record['Company_Name'], record['Job_Title']) for record in sink.records] == \
+        [('Acme', 'Data Scientist'), ('Globex', 'Data Analyst'), ('Initech', 'ML Engineer'),
+         ('Acme', 'Data Engineer')]
+    first = sink.records[0]
+    assert (first['City'], first['Min_Salary'], first['Max_Salary']) == ('New York', '100K', '150K')
+    assert (first['Size'], first['Overall'], first['Culture & Values']) == ('51 to 200 Employees', '4.2', '4.0')
+
+
+def test_do_scraping_applies_the_rating_threshold(replay_fixture, configurations):
+    sink = ListSink()
+    Scraping_handler.do_scraping(replay_args(replay_fixture, '-rt', '3.5'), configurations, sink)
+
+    assert [record['Company_Name'] for record in sink.records] == ['Acme', 'Initech', 'Acme']
+
+
+def test_do_scraping_skips_known_jobs(replay_fixture, configurations):
+    from Results_handler import job_fingerprint
+
+    sink = ListSink()
+    known = {job_fingerprint('Globex', 'Data Analyst', 'Brooklyn', 'NY', '80K', '95K')}
+    Scraping_handler.do_scraping(replay_args(replay_fixture), configurations, sink, known_fingerprints=known)
+
+    assert 'Globex' not in [record['Company_Name'] for record in sink.records]
+
+
+def test_do_scraping_resumes_from_the_checkpoint(replay_fixture, configurations):
+    first_run = ListSink()
+    Scraping_handler.do_scraping(replay_args(replay_fixture, '-n', '2', '--checkpoint_every', '1'),
+                                 configurations, first_run)
+    assert len(first_run.records) == 2
+
+    resumed = ListSink()
+    written = Scraping_handler.do_scraping(replay_args(replay_fixture, '--resume'), configurations, resumed)
+
+    # The checkpointed jobs are written first, then the jobs scraped on resume
+    assert written == 4
+    assert [record['Job_Title'] for record in resumed.records] == \
+        ['Data Scientist', 'Data Analyst', 'ML Engineer', 'Data Engineer']
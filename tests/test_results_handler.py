@@ -0,0 +1,43 @@
+from Results_handler import job_fingerprint, assemble_record, make_sink, read_result_rows, RESULT_FIELDS
+
+
+def test_fingerprint_ignores_case_whitespace_and_missing_fields():
+    assert job_fingerprint('Acme', 'Data Scientist', 'New York', 'NY', '100K', None) == \
+        job_fingerprint(' acme ', 'DATA SCIENTIST', 'New York', ' NY', '100K', '')
+
+
+def test_fingerprint_tells_postings_apart():
+    fingerprint = job_fingerprint('Acme', 'Data Scientist', 'New York', 'NY', '100K', '150K')
+
+    assert fingerprint != job_fingerprint('Acme', 'Data Scientist', 'New York', 'NY', '100K', '160K')
+    assert fingerprint != job_fingerprint('Acme', 'Data Scientist', 'Boston', 'MA', '100K', '150K')
+    # Fields are separated: moving text from one field to the next changes the fingerprint
+    assert job_fingerprint('Acme', 'Data', None, None, None, None) != \
+        job_fingerprint('Acm', 'eData', None, None, None, None)
+
+
+def test_assemble_record_fills_missing_fields():
+    record = assemble_record({'Company_Name': 'Acme', 'Job_Title': 'Data Scientist'}, {'Size': '1 to 50 Employees'},
+                             {'Overall': '4.2'})
+
+    assert list(record) == RESULT_FIELDS
+    assert (record['Company_Name'], record['Size'], record['Overall'], record['City']) == \
+        ('Acme', '1 to 50 Employees', '4.2', None)
+
+
+def test_sinks_read_back_in_the_results_layout(tmp_path):
+    records = [assemble_record({'Company_Name': 'Acme', 'Job_Title': 'Data Scientist', 'City': 'New York'}, {},
+                               {'Overall': '4.2'}),
+               assemble_record({'Company_Name': 'Globex', 'Job_Title': 'Data Analyst'}, {}, {})]
+
+    rows = {}
+    for output_format in ('csv', 'jsonl'):
+        file_path = str(tmp_path / f'results.{output_format}')
+        with make_sink(file_path, output_format) as sink:
+            for record in records:
+                sink.write(record)
+        rows[output_format] = list(read_result_rows(file_path))
+
+    assert rows['csv'] == rows['jsonl']
+    assert rows['csv'][0][:4] == ['0', 'Acme', 'Data Scientist', 'New York']
+    assert rows['csv'][1][RESULT_FIELDS.index('Overall') + 1] == ''
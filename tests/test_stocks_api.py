@@ -0,0 +1,100 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import threading
+import json
+
+import pytest
+
+from Stocks_API import StocksEnricher, NOT_FOUND
+
+PROFILES = {'AAPL': {'price': 150.0, 'mktCap': 2.5e12, 'currency': 'USD', 'website': 'https://apple.com',
+                     'exchangeShortName': 'NASDAQ'}}
+SYMBOLS = {('Apple', 'NASDAQ'): 'AAPL'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    The stock exchange API: /api/v3/search and /api/v3/profile/<symbol>, a 500 for the 'Flaky' company
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.requests.append(url.path)
+
+        if url.path == '/api/v3/search':
+            if query['query'][0] == 'Flaky':
+                return self.reply(500, {'error': 'unavailable'})
+            symbol = SYMBOLS.get((query['query'][0], query['exchange'][0]))
+            return self.reply(200, [{'symbol': symbol}] if symbol else [])
+
+        symbol = url.path.rsplit('/', 1)[-1]
+        self.reply(200, [PROFILES[symbol]])
+
+    def reply(self, status, body):
+        content = json.dumps(body).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}/api/v3"
+    server.shutdown()
+    server.server_close()
+
+
+def test_found_company_is_cached(stub_api, tmp_path):
+    server, api_base = stub_api
+    enricher = StocksEnricher(max_workers=2, cache_path=str(tmp_path / 'stocks.json'), api_base=api_base)
+
+    assert enricher.lookup('Apple') == (150.0, 2.5e12, 'USD', 'https://apple.com', 'NASDAQ')
+    requests_made = len(server.requests)
+    enricher.lookup('Apple')
+
+    assert len(server.requests) == requests_made
+
+
+def test_unknown_company_is_negatively_cached(stub_api):
+    server, api_base = stub_api
+    enricher = StocksEnricher(max_workers=2, cache_path=None, api_base=api_base)
+
+    assert enricher.lookup('Nobody') == NOT_FOUND
+    requests_made = len(server.requests)
+    assert enricher.lookup('Nobody') == NOT_FOUND
+
+    assert len(server.requests) == requests_made
+
+
+def test_failed_lookup_is_not_cached(stub_api):
+    server, api_base = stub_api
+    enricher = StocksEnricher(max_workers=2, cache_path=None, api_base=api_base)
+
+    assert enricher.lookup('Flaky') == NOT_FOUND
+    requests_made = len(server.requests)
+    enricher.lookup('Flaky')
+
+    assert len(server.requests) > requests_made
+
+
+def test_enrich_persists_the_cache(stub_api, tmp_path):
+    server, api_base = stub_api
+    cache_path = str(tmp_path / 'stocks.json')
+    results = StocksEnricher(max_workers=4, cache_path=cache_path,
+                             api_base=api_base).enrich(['Apple', 'Nobody', 'Flaky', 'Apple'])
+
+    assert set(results) == {'Apple', 'Nobody', 'Flaky'}
+    assert results['Apple'][-1] == 'NASDAQ'
+
+    with open(cache_path, encoding='utf8') as f:
+        assert set(json.load(f)) == {'Apple', 'Nobody'}